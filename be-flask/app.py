@@ -1,36 +1,85 @@
+import hmac
 import logging
-from flask import Flask, request, jsonify
+import os
+import random
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
 
+from client_ip import CLIENT_IP_HEADER, resolve_client_ip
+from log_config import configure_logging
+from response_cache import CACHE_CONTROL, RESPONSE_CACHE_ENABLED, etag_matches, get_response_cache
+
 app = Flask(__name__)
 CORS(app)  # Enable CORS for your app
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+# Configure logging (queued, written by a background thread)
+configure_logging()
 logger = logging.getLogger(__name__)
 
+# Fraction of successful requests that get an access log line (0 disables, 1 logs all)
+ACCESS_LOG_SAMPLE_RATE = float(os.getenv('ACCESS_LOG_SAMPLE_RATE', '1.0'))
+
+# Bearer token for the diagnostics endpoints; they return 404 while it is unset
+ADMIN_TOKEN = os.getenv('ADMIN_TOKEN', '')
+
+# WSGI environ key of the forwarding header our proxies append to
+CLIENT_IP_ENVIRON_KEY = 'HTTP_' + CLIENT_IP_HEADER.upper().replace('-', '_')
+
+
+def admin_status(authorization):
+    """None if the Authorization header carries the admin token, else the status to return"""
+    if not ADMIN_TOKEN:
+        return 404
+    supplied = (authorization or '')[len('Bearer '):] if (authorization or '').startswith('Bearer ') else ''
+    return None if hmac.compare_digest(supplied.encode(), ADMIN_TOKEN.encode()) else 403
+
+
+def should_log_access():
+    """Sample access logging so it stays cheap under load"""
+    if ACCESS_LOG_SAMPLE_RATE <= 0 or not logger.isEnabledFor(logging.INFO):
+        return False
+    return ACCESS_LOG_SAMPLE_RATE >= 1 or random.random() < ACCESS_LOG_SAMPLE_RATE
+
+
+def build_ip_data(forwarded, remote_addr, user_agent, method):
+    """Client IP information from already-read request values"""
+    # Walk the forwarding header back through our trusted proxies (when behind a load balancer)
+    return {
+        "ip": resolve_client_ip(remote_addr, forwarded),
+        "user_agent": 'Unknown' if user_agent is None else user_agent,
+        "method": method
+    }
+
+
+def cached_response(ip_data, if_none_match):
+    """Precomputed success response, or 304 when the client already has it"""
+    cache = get_response_cache()
+    body, etag = cache.render(ip_data)
+    headers = {'ETag': etag, 'Cache-Control': CACHE_CONTROL}
+    if etag_matches(if_none_match, etag):
+        cache.record_not_modified()
+        return Response(status=304, headers=headers)
+    return Response(body, status=200, mimetype='application/json', headers=headers)
+
+
 @app.route('/')
 def get_ip():
     try:
-        # Get client IP address
-        # Check for X-Forwarded-For header (when behind a proxy/load balancer)
-        if request.headers.get('X-Forwarded-For'):
-            client_ip = request.headers.get('X-Forwarded-For').split(',')[0].strip()
-        else:
-            client_ip = request.remote_addr
-
-        # Get user agent
-        user_agent = request.headers.get('User-Agent', 'Unknown')
-
-        ip_data = {
-            "ip": client_ip,
-            "user_agent": user_agent,
-            "method": request.method
-        }
+        # Read each header once straight from the WSGI environ
+        environ = request.environ
+        ip_data = build_ip_data(
+            environ.get(CLIENT_IP_ENVIRON_KEY),
+            environ.get('REMOTE_ADDR'),
+            environ.get('HTTP_USER_AGENT'),
+            environ.get('REQUEST_METHOD')
+        )
 
         # Log success
-        logger.info(f"Successfully retrieved IP information: {client_ip}")
+        if should_log_access():
+            logger.info("Successfully retrieved IP information: %s", ip_data["ip"])
 
+        if RESPONSE_CACHE_ENABLED:
+            return cached_response(ip_data, environ.get('HTTP_IF_NONE_MATCH'))
         return jsonify({"message": "Success", "data": ip_data}), 200
     except Exception as e:
         # Log exception
@@ -38,5 +87,13 @@ def get_ip():
 
         return jsonify({"message": "Error", "error": str(e)}), 500
 
+
+@app.route('/cache/stats')
+def cache_stats():
+    status = admin_status(request.headers.get('Authorization'))
+    if status is not None:
+        return Response(status=status)
+    return jsonify(get_response_cache().stats()), 200
+
 if __name__ == '__main__':
     app.run()
@@ -0,0 +1,108 @@
+# Async implementation of the / endpoint for ASGI servers: uvicorn asgi_app:app
+# Same response as app.py without going through Flask's WSGI stack.
+import json
+import logging
+
+from app import admin_status, build_ip_data, should_log_access
+from client_ip import CLIENT_IP_HEADER
+from response_cache import CACHE_CONTROL, RESPONSE_CACHE_ENABLED, dumps, etag_matches, get_response_cache
+
+logger = logging.getLogger(__name__)
+
+CLIENT_IP_HEADER_NAME = CLIENT_IP_HEADER.encode()
+CORS_HEADERS = [(b'access-control-allow-origin', b'*')]
+NOT_FOUND = json.dumps({"message": "Error", "error": "Not Found"}, separators=(',', ':'), sort_keys=True).encode()
+METHOD_NOT_ALLOWED = json.dumps(
+    {"message": "Error", "error": "Method Not Allowed"}, separators=(',', ':'), sort_keys=True).encode()
+# Same as the Flask route, which only registers GET (HEAD and OPTIONS are implied)
+ALLOWED_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+async def _send_json(send, status, body, extra_headers=()):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())]
+        + CORS_HEADERS + list(extra_headers),
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def _send_cached(send, ip_data, if_none_match):
+    cache = get_response_cache()
+    body, etag = cache.render(ip_data)
+    headers = [(b'etag', etag.encode()), (b'cache-control', CACHE_CONTROL.encode())]
+    if etag_matches(if_none_match, etag):
+        cache.record_not_modified()
+        await send({'type': 'http.response.start', 'status': 304, 'headers': CORS_HEADERS + headers})
+        await send({'type': 'http.response.body', 'body': b''})
+        return
+    await _send_json(send, 200, body, headers)
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    if scope['type'] != 'http':
+        return
+
+    if scope['path'] == '/cache/stats':
+        authorization = next((value.decode('latin-1') for name, value in scope['headers'] if name == b'authorization'), None)
+        status = admin_status(authorization)
+        if status is not None:
+            await send({'type': 'http.response.start', 'status': status, 'headers': CORS_HEADERS + [(b'content-length', b'0')]})
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+        await _send_json(send, 200, dumps(get_response_cache().stats()))
+        return
+    if scope['path'] != '/':
+        await _send_json(send, 404, NOT_FOUND)
+        return
+
+    if scope['method'] not in ALLOWED_METHODS:
+        await _send_json(send, 405, METHOD_NOT_ALLOWED, [(b'allow', ', '.join(ALLOWED_METHODS).encode())])
+        return
+
+    if scope['method'] == 'OPTIONS':
+        # CORS preflight
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': CORS_HEADERS + [(b'access-control-allow-methods', b'GET, HEAD, OPTIONS'), (b'content-length', b'0')],
+        })
+        await send({'type': 'http.response.body', 'body': b''})
+        return
+
+    try:
+        forwarded = user_agent = if_none_match = None
+        for name, value in scope['headers']:
+            if name == CLIENT_IP_HEADER_NAME:
+                # Repeated header lines form one list, as WSGI servers join them
+                value = value.decode('latin-1')
+                forwarded = value if forwarded is None else f"{forwarded}, {value}"
+            elif name == b'user-agent':
+                user_agent = value.decode('latin-1')
+            elif name == b'if-none-match':
+                if_none_match = value.decode('latin-1')
+        client = scope.get('client')
+
+        ip_data = build_ip_data(forwarded, client[0] if client else None, user_agent, scope['method'])
+
+        if should_log_access():
+            logger.info("Successfully retrieved IP information: %s", ip_data["ip"])
+
+        if RESPONSE_CACHE_ENABLED:
+            await _send_cached(send, ip_data, if_none_match)
+            return
+        body = json.dumps({"message": "Success", "data": ip_data}, separators=(',', ':'), sort_keys=True).encode()
+        await _send_json(send, 200, body)
+    except Exception as e:
+        logger.exception(f"Exception while processing request: {str(e)}")
+        await _send_json(send, 500, json.dumps({"message": "Error", "error": str(e)}).encode())
@@ -0,0 +1,68 @@
+# Micro-benchmark for client IP resolution: python bench_client_ip.py [--max-us 5]
+# Times TrustedProxies.resolve on short and long forwarding chains: "cached" repeats a chain, "walk"
+# clears the per-chain cache so every hop is looked up, "cold" clears all caches.
+# --max-us exits 1 if any walk is slower than that per call.
+import argparse
+import sys
+import timeit
+
+from client_ip import DEFAULT_TRUSTED_PROXIES, TrustedProxies
+
+# A realistic trust list: the defaults plus a few dozen load balancer ranges
+CIDRS = DEFAULT_TRUSTED_PROXIES.split(',') + [f'100.{i}.0.0/16' for i in range(64, 96)] + ['2001:db8::/32']
+
+INTERNAL_HOPS = [f'10.{i}.0.{i}' for i in range(1, 51)]
+SPOOFED_HOPS = [f'198.51.{i}.{i}' for i in range(1, 51)]
+
+
+def cases(xff, forwarded):
+    """(name, resolver, remote address, header value)"""
+    return [
+        ('no header', xff, '10.0.0.1', None),
+        ('untrusted peer', xff, '198.51.100.1', '1.2.3.4'),
+        ('2-hop X-Forwarded-For', xff, '10.0.0.1', '203.0.113.7, 10.0.0.2'),
+        ('50 spoofed + 3 proxies', xff, '10.0.0.1', ', '.join(SPOOFED_HOPS + ['203.0.113.7'] + INTERNAL_HOPS[:3])),
+        ('50 trusted hops', xff, '10.0.0.1', ', '.join(['203.0.113.7'] + INTERNAL_HOPS)),
+        ('20-hop Forwarded', forwarded, '10.0.0.1',
+         ', '.join(['for=203.0.113.7'] + [f'for={hop};proto=https' for hop in INTERNAL_HOPS[:19]])),
+        ('20-hop Forwarded, IPv6', forwarded, '10.0.0.1',
+         ', '.join(['for="[2001:db9::7]:443"'] + [f'for="[2001:db8::{i}]"' for i in range(1, 20)])),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Client IP resolution micro-benchmark')
+    parser.add_argument('--number', type=int, default=20000, help='calls per timing round')
+    parser.add_argument('--max-us', type=float, help='fail if a warm case exceeds this many microseconds')
+    args = parser.parse_args()
+
+    xff = TrustedProxies(CIDRS, header='x-forwarded-for')
+    forwarded = TrustedProxies(CIDRS, header='forwarded')
+
+    slowest = 0.0
+    print(f"{'case':28} {'cached':>10} {'walk':>10} {'cold':>10}")
+    for name, resolver, remote_addr, header in cases(xff, forwarded):
+        def cached():
+            resolver.resolve(remote_addr, header)
+
+        def walk():
+            resolver.clear_cache(chains_only=True)
+            resolver.resolve(remote_addr, header)
+
+        def cold():
+            resolver.clear_cache()
+            resolver.resolve(remote_addr, header)
+
+        timings = []
+        for fn, number in ((cached, args.number), (walk, args.number), (cold, max(1, args.number // 10))):
+            timings.append(min(timeit.repeat(fn, number=number, repeat=3)) / number)
+        slowest = max(slowest, timings[1])
+        print(f"{name:28} " + ' '.join(f"{t * 1e6:8.2f}us" for t in timings))
+
+    if args.max_us is not None and slowest * 1e6 > args.max_us:
+        print(f'Slowest walk {slowest * 1e6:.2f}us exceeds {args.max_us}us')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+# Client IP resolution behind trusted proxies.
+# TRUSTED_PROXIES is compiled once into per-prefix-length sets of network numbers, so checking a hop
+# costs one shift and set lookup per distinct prefix length. Hop classification is memoised.
+import ipaddress
+import os
+import socket
+
+# Loopback and private ranges, where our load balancers live
+DEFAULT_TRUSTED_PROXIES = '127.0.0.0/8,10.0.0.0/8,172.16.0.0/12,192.168.0.0/16,::1/128,fc00::/7'
+
+# Comma-separated CIDRs whose X-Forwarded-For/Forwarded entries are believed
+TRUSTED_PROXIES = os.getenv('TRUSTED_PROXIES', DEFAULT_TRUSTED_PROXIES)
+# Header the proxies append to: x-forwarded-for or forwarded (RFC 7239)
+CLIENT_IP_HEADER = os.getenv('CLIENT_IP_HEADER', 'x-forwarded-for').strip().lower()
+# Longest trusted chain walked before the nearest address is taken as the client
+MAX_FORWARDED_HOPS = int(os.getenv('MAX_FORWARDED_HOPS', '20'))
+HOP_CACHE_SIZE = 4096
+
+
+def _hop_address(hop):
+    """Bare address from an X-Forwarded-For entry or Forwarded for= value"""
+    hop = hop.strip().strip('"')
+    if hop.startswith('['):
+        # [2001:db8::1]:4711
+        return hop[1:hop.find(']')] if ']' in hop else hop[1:]
+    if hop.count(':') == 1:
+        # 192.0.2.1:4711
+        return hop.split(':', 1)[0]
+    return hop
+
+
+def _forwarded_for(element):
+    """for= value of one Forwarded element, or '' when the proxy did not disclose it"""
+    element = element.strip()
+    if element.startswith('for='):
+        # Common case: for= is the first pair
+        return element[4:].split(';', 1)[0]
+    for pair in element.split(';'):
+        name, _, value = pair.partition('=')
+        if name.strip().lower() == 'for':
+            return value
+    return ''
+
+
+class TrustedProxies:
+    """Right-to-left walk of a forwarding chain that stops at the first untrusted hop"""
+
+    def __init__(self, cidrs, header=CLIENT_IP_HEADER, max_hops=MAX_FORWARDED_HOPS):
+        if header not in ('x-forwarded-for', 'forwarded'):
+            raise ValueError(f"Unsupported client IP header: {header}")
+        self.header = header
+        self.max_hops = max_hops
+        self._parse_hop = _forwarded_for if header == 'forwarded' else str
+        tables = {4: {}, 6: {}}
+        for cidr in cidrs:
+            network = ipaddress.ip_network(cidr.strip(), strict=False)
+            shift = network.max_prefixlen - network.prefixlen
+            tables[network.version].setdefault(shift, set()).add(int(network.network_address) >> shift)
+        # version -> [(shift, network numbers)], most specific prefixes first
+        self._tables = {version: sorted(table.items()) for version, table in tables.items()}
+        # Memoised (address, trusted) per raw hop, trusted per peer address, and client per whole chain
+        self._hops = {}
+        self._peers = {}
+        self._chains = {}
+
+    def _trusted(self, address):
+        """Whether a bare address is in a trusted network; None when it is not an IP address"""
+        try:
+            if ':' in address:
+                value = int.from_bytes(socket.inet_pton(socket.AF_INET6, address), 'big')
+                version = 6
+                if value >> 32 == 0xffff:
+                    # IPv4-mapped (::ffff:a.b.c.d)
+                    value &= 0xffffffff
+                    version = 4
+            else:
+                value = int.from_bytes(socket.inet_pton(socket.AF_INET, address), 'big')
+                version = 4
+        except (OSError, ValueError):
+            return None
+        for shift, networks in self._tables[version]:
+            if value >> shift in networks:
+                return True
+        return False
+
+    def classify(self, hop):
+        """(address, trusted) for a raw X-Forwarded-For entry or Forwarded element"""
+        result = self._hops.get(hop)
+        if result is None:
+            if len(self._hops) >= HOP_CACHE_SIZE:
+                self._hops.clear()
+            address = _hop_address(self._parse_hop(hop))
+            result = self._hops[hop] = (address, self._trusted(address))
+        return result
+
+    def is_trusted(self, address):
+        result = self._peers.get(address)
+        if result is None:
+            if len(self._peers) >= HOP_CACHE_SIZE:
+                self._peers.clear()
+            result = self._peers[address] = self._trusted(address) is True
+        return result
+
+    def clear_cache(self, chains_only=False):
+        self._chains.clear()
+        if not chains_only:
+            self._hops.clear()
+            self._peers.clear()
+
+    def resolve(self, remote_addr, header_value):
+        """Client address for a request that arrived from remote_addr with the forwarding header value"""
+        if not header_value or not remote_addr or not self.is_trusted(remote_addr):
+            # Only believe forwarding headers set by our own proxies
+            return remote_addr
+
+        # Repeat clients send the same chain on every request
+        client = self._chains.get(header_value)
+        if client is None:
+            if len(self._chains) >= HOP_CACHE_SIZE:
+                self._chains.clear()
+            client = self._chains[header_value] = self.walk(header_value)
+        return client or remote_addr
+
+    def walk(self, header_value):
+        """Nearest untrusted address in a forwarding chain, '' if the first hop is not an address"""
+        # Only the nearest max_hops entries are split off a (possibly long, spoofed) chain
+        hops = header_value.rsplit(',', self.max_hops)
+        if len(hops) > self.max_hops:
+            # Unsplit remainder beyond the walk limit
+            del hops[0]
+        classify = self.classify
+        client = ''
+        for hop in reversed(hops):
+            address, trusted = classify(hop)
+            if trusted is None:
+                # Obfuscated or malformed hop ("unknown", "_hidden"): keep the nearest real address
+                break
+            client = address
+            if not trusted:
+                break
+        return client
+
+
+# Global resolver instance
+_resolver = TrustedProxies(cidr for cidr in TRUSTED_PROXIES.split(',') if cidr.strip())
+
+
+def get_resolver():
+    """Get the global trusted proxy resolver"""
+    return _resolver
+
+
+def resolve_client_ip(remote_addr, header_value):
+    """Client address using the configured trusted proxies"""
+    return _resolver.resolve(remote_addr, header_value)
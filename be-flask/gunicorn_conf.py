@@ -0,0 +1,25 @@
+# Gunicorn settings for the production server: gunicorn -c gunicorn_conf.py app:app
+import multiprocessing
+import os
+
+bind = os.getenv('BIND', '0.0.0.0:5000')
+
+# Threaded workers: the endpoint does no I/O, so a few processes with threads go a long way
+worker_class = 'gthread'
+workers = int(os.getenv('WEB_CONCURRENCY', str(multiprocessing.cpu_count() * 2 + 1)))
+threads = int(os.getenv('GUNICORN_THREADS', '4'))
+
+# Load balancers reuse connections; keep them open a little longer than their idle timeout
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', '75'))
+backlog = int(os.getenv('GUNICORN_BACKLOG', '2048'))
+timeout = 30
+graceful_timeout = 30
+
+# Recycle workers now and then so memory growth cannot accumulate
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '100000'))
+max_requests_jitter = max_requests // 10
+
+# Access logging is done (and sampled) by the app; gunicorn's own access log stays off
+accesslog = None
+errorlog = '-'
+loglevel = os.getenv('LOG_LEVEL', 'info').lower()
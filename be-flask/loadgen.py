@@ -0,0 +1,140 @@
+# Local load generator: python loadgen.py --url http://localhost:5000/ --concurrency 32 --duration 15
+# Each worker thread keeps one HTTP/1.1 connection open, like a load balancer does.
+# Reports requests/sec and latency percentiles; --baseline compares against an earlier --output file.
+import argparse
+import http.client
+import json
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, max(0, int(round(q / 100 * len(values) + 0.5)) - 1))
+    return values[index]
+
+
+class Worker(threading.Thread):
+    def __init__(self, url, headers, deadline, keepalive):
+        super().__init__(daemon=True)
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == 'https' else 80)
+        self.https = parts.scheme == 'https'
+        self.path = (parts.path or '/') + ('?' + parts.query if parts.query else '')
+        self.headers = headers
+        self.deadline = deadline
+        self.keepalive = keepalive
+        self.latencies = []
+        self.errors = 0
+
+    def _connect(self):
+        connection_class = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+        return connection_class(self.host, self.port, timeout=10)
+
+    def run(self):
+        connection = self._connect()
+        while time.perf_counter() < self.deadline:
+            started = time.perf_counter()
+            try:
+                connection.request('GET', self.path, headers=self.headers)
+                response = connection.getresponse()
+                response.read()
+                if response.status not in (200, 304):
+                    self.errors += 1
+                    continue
+                self.latencies.append(time.perf_counter() - started)
+                if not self.keepalive or response.will_close:
+                    connection.close()
+                    connection = self._connect()
+            except (OSError, http.client.HTTPException):
+                self.errors += 1
+                connection.close()
+                connection = self._connect()
+        connection.close()
+
+
+def run(url, concurrency, duration, headers, keepalive=True):
+    deadline = time.perf_counter() + duration
+    workers = [Worker(url, headers, deadline, keepalive) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency for worker in workers for latency in worker.latencies)
+    return {
+        "url": url,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": sum(worker.errors for worker in workers),
+        "seconds": elapsed,
+        "requests_per_second": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "max_ms": (latencies[-1] if latencies else 0.0) * 1000,
+    }
+
+
+def report(result, baseline=None):
+    print(f"{result['requests']} requests, {result['errors']} errors in {result['seconds']:.1f}s "
+          f"({result['concurrency']} connections)")
+    rows = [("requests/sec", "requests_per_second", ""), ("p50", "p50_ms", "ms"), ("p95", "p95_ms", "ms"),
+            ("p99", "p99_ms", "ms"), ("max", "max_ms", "ms")]
+    for label, key, unit in rows:
+        line = f"  {label:<14}{result[key]:>10.2f}{unit}"
+        if baseline and baseline.get(key):
+            line += f"   baseline {baseline[key]:.2f}{unit} ({result[key] / baseline[key] - 1:+.0%})"
+        print(line)
+
+
+def regressed(result, baseline, tolerance):
+    if result['requests_per_second'] < baseline['requests_per_second'] * (1 - tolerance):
+        return True
+    return baseline.get('p99_ms', 0) > 0 and result['p99_ms'] > baseline['p99_ms'] * (1 + tolerance)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='HTTP load generator for the IP echo service')
+    parser.add_argument('--url', default='http://localhost:5000/')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--warmup', type=float, default=1, help='seconds of unmeasured load first')
+    parser.add_argument('--no-keepalive', action='store_true', help='open a new connection per request')
+    parser.add_argument('--header', action='append', default=[], help='extra header, e.g. "X-Forwarded-For: 1.2.3.4"')
+    parser.add_argument('--output', help='write the result as JSON')
+    parser.add_argument('--baseline', help='earlier --output file to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='allowed regression before exiting 1')
+    args = parser.parse_args()
+
+    headers = {'User-Agent': 'be-flask-loadgen'}
+    for header in args.header:
+        name, _, value = header.partition(':')
+        headers[name.strip()] = value.strip()
+
+    if args.warmup > 0:
+        run(args.url, args.concurrency, args.warmup, headers, not args.no_keepalive)
+    result = run(args.url, args.concurrency, args.duration, headers, not args.no_keepalive)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    report(result, baseline)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+    if baseline and regressed(result, baseline, args.tolerance):
+        print('Regression beyond tolerance')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+# Queued logging: the root handler puts records on a bounded queue and one listener
+# thread writes them, so a slow stderr never holds up a request. When the queue is full
+# records are dropped and the count is logged once there is room again, and at shutdown.
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', '10000'))
+
+TEXT_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self.unreported = 0
+
+    def enqueue(self, record):
+        # Called with the handler lock held, so the counters need no lock of their own
+        if self.unreported and self._put(dropped_record(self.unreported)):
+            self.unreported = 0
+        if not self._put(record):
+            self.dropped += 1
+            self.unreported += 1
+
+    def _put(self, record):
+        try:
+            self.queue.put_nowait(record)
+            return True
+        except queue.Full:
+            return False
+
+
+def dropped_record(count):
+    return logging.LogRecord(__name__, logging.WARNING, __file__, 0,
+                             '%d log records dropped, the log writer fell behind', (count,), None)
+
+
+_listener = None
+_handler = None
+
+
+def configure_logging(level=LOG_LEVEL, stream=None, queue_size=LOG_QUEUE_SIZE):
+    """Send all logging through the queue and start the writer thread"""
+    global _listener, _handler
+    stop_logging()
+
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(logging.Formatter(TEXT_FORMAT))
+
+    log_queue = queue.Queue(maxsize=queue_size)
+    handler = NonBlockingQueueHandler(log_queue)
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    _handler = handler
+    return handler
+
+
+def stop_logging():
+    """Write out queued records, report drops not yet logged and stop the writer thread"""
+    global _listener, _handler
+    if _listener is not None:
+        _listener.stop()
+        if _handler.unreported:
+            for output in _listener.handlers:
+                output.handle(dropped_record(_handler.unreported))
+            _handler.unreported = 0
+        _listener = None
+        _handler = None
+
+
+atexit.register(stop_logging)
@@ -0,0 +1,120 @@
+# Optional response caching for polling clients (RESPONSE_CACHE_ENABLED=true).
+# Response bodies are precomputed per (ip, user_agent, method) in a bounded LRU with a strong ETag,
+# so repeat polls skip serialisation and clients sending If-None-Match get a 304 with no body.
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+try:
+    import orjson
+except ImportError:  # optional: pip install orjson
+    orjson = None
+
+RESPONSE_CACHE_ENABLED = os.getenv('RESPONSE_CACHE_ENABLED', 'false').lower() == 'true'
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', '10000'))
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv('RESPONSE_CACHE_MAX_BYTES', str(8 * 1024 * 1024)))
+
+# Responses differ per client, so shared caches must not store them and clients must revalidate
+CACHE_CONTROL = 'private, no-cache'
+
+
+def dumps(obj):
+    """Compact JSON bytes with sorted keys, matching Flask's jsonify body"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS) + b'\n'
+    return json.dumps(obj, separators=(',', ':'), sort_keys=True).encode() + b'\n'
+
+
+def make_etag(body):
+    return '"' + hashlib.blake2b(body, digest_size=8).hexdigest() + '"'
+
+
+def etag_matches(if_none_match, etag):
+    """If-None-Match check: weak comparison against each whole tag in the list"""
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(','):
+        tag = tag.strip()
+        if tag == '*' or tag.startswith('W/') and tag[2:] == etag or tag == etag:
+            return True
+    return False
+
+
+class ResponseCache:
+    """Thread-safe LRU of (body, etag) bounded by entry count and total body bytes"""
+
+    def __init__(self, max_entries=RESPONSE_CACHE_MAX_ENTRIES, max_bytes=RESPONSE_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.evictions = 0
+
+    def render(self, ip_data):
+        """(body, etag) of the success response for ip_data, built once per distinct client"""
+        key = (ip_data["ip"], ip_data["user_agent"], ip_data["method"])
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        body = dumps({"message": "Success", "data": ip_data})
+        entry = (body, make_etag(body))
+        if len(body) > self.max_bytes:
+            return entry
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous[0])
+            self._entries[key] = entry
+            self._bytes += len(body)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self.evictions += 1
+        return entry
+
+    def record_not_modified(self):
+        with self._lock:
+            self.not_modified += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": RESPONSE_CACHE_ENABLED,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "not_modified": self.not_modified,
+                "evictions": self.evictions,
+                "serializer": "orjson" if orjson is not None else "json",
+            }
+
+
+# Global response cache instance
+_cache = ResponseCache()
+
+
+def get_response_cache():
+    """Get the global response cache"""
+    return _cache
@@ -1,6 +1,33 @@
 # tests/test_unit.py
+import asyncio
+import io
+import logging
+import queue
 import unittest
+from unittest import mock
+
+import app as app_module
+import asgi_app
 from app import app
+from client_ip import TrustedProxies
+from log_config import NonBlockingQueueHandler, configure_logging, stop_logging
+from response_cache import ResponseCache, etag_matches
+
+
+def call_asgi(path='/', method='GET', headers=(), client=('10.0.0.9', 51234)):
+    """Run one request through the ASGI app and return (status, headers, body)"""
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {'type': 'http', 'method': method, 'path': path, 'headers': list(headers), 'client': client}
+    asyncio.run(asgi_app.app(scope, receive, send))
+    start, body = messages
+    return start['status'], dict(start['headers']), body['body']
 
 
 class TestApp(unittest.TestCase):
@@ -25,6 +52,232 @@ class TestApp(unittest.TestCase):
         self.assertIn('user_agent', data['data'])
         self.assertIn('method', data['data'])
 
+    def test_forwarded_for_uses_first_untrusted_hop_from_the_right(self):
+        response = self.app.get('/', headers={'X-Forwarded-For': '203.0.113.7, 10.0.0.1'})
+        self.assertEqual(response.get_json()['data']['ip'], '203.0.113.7')
+
+    def test_spoofed_forwarded_for_entries_are_ignored(self):
+        response = self.app.get('/', headers={'X-Forwarded-For': '6.6.6.6, 203.0.113.7, 10.0.0.1'})
+        self.assertEqual(response.get_json()['data']['ip'], '203.0.113.7')
+
+    def test_forwarded_for_ignored_from_untrusted_peer(self):
+        response = self.app.get('/', headers={'X-Forwarded-For': '6.6.6.6'},
+                                environ_base={'REMOTE_ADDR': '198.51.100.20'})
+        self.assertEqual(response.get_json()['data']['ip'], '198.51.100.20')
+
+    def test_user_agent_defaults_to_unknown(self):
+        response = self.app.get('/', environ_base={'HTTP_USER_AGENT': None})
+        self.assertEqual(response.get_json()['data']['user_agent'], 'Unknown')
+
+    def test_access_log_sampling(self):
+        with mock.patch.object(app_module, 'ACCESS_LOG_SAMPLE_RATE', 0.0), \
+                mock.patch.object(app_module.logger, 'info') as info:
+            self.app.get('/')
+        info.assert_not_called()
+
+        with mock.patch.object(app_module, 'ACCESS_LOG_SAMPLE_RATE', 1.0), \
+                self.assertLogs(app_module.logger, 'INFO') as logs:
+            self.app.get('/')
+        self.assertEqual(len(logs.records), 1)
+
+
+class TestResponseCache(unittest.TestCase):
+
+    def setUp(self):
+        self.app = app.test_client()
+        self.cache = ResponseCache(max_entries=100, max_bytes=1024 * 1024)
+        patches = [mock.patch.object(app_module, 'RESPONSE_CACHE_ENABLED', True),
+                   mock.patch.object(asgi_app, 'RESPONSE_CACHE_ENABLED', True),
+                   mock.patch.object(app_module, 'get_response_cache', return_value=self.cache),
+                   mock.patch.object(asgi_app, 'get_response_cache', return_value=self.cache)]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def test_cached_body_matches_jsonify(self):
+        cached = self.app.get('/', headers={'User-Agent': 'poller'})
+        with mock.patch.object(app_module, 'RESPONSE_CACHE_ENABLED', False):
+            uncached = self.app.get('/', headers={'User-Agent': 'poller'})
+        self.assertEqual(cached.get_json(), uncached.get_json())
+        self.assertEqual(cached.data.strip(), uncached.data.strip())
+        self.assertEqual(cached.headers['Content-Type'], 'application/json')
+        self.assertIn('ETag', cached.headers)
+
+    def test_repeat_polls_hit_the_cache(self):
+        first = self.app.get('/', headers={'User-Agent': 'poller'})
+        second = self.app.get('/', headers={'User-Agent': 'poller'})
+        self.app.get('/', headers={'User-Agent': 'other'})
+        self.assertEqual(first.headers['ETag'], second.headers['ETag'])
+        stats = self.cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['entries']), (1, 2, 2))
+
+    def test_if_none_match_returns_304(self):
+        etag = self.app.get('/').headers['ETag']
+        response = self.app.get('/', headers={'If-None-Match': f'W/"0000", {etag}'})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.data, b'')
+        self.assertEqual(response.headers['ETag'], etag)
+        self.assertEqual(self.app.get('/', headers={'If-None-Match': '"stale"'}).status_code, 200)
+        self.assertEqual(self.cache.stats()['not_modified'], 1)
+
+    def test_asgi_conditional_request(self):
+        status, headers, body = call_asgi()
+        status, _, body = call_asgi(headers=[(b'if-none-match', headers[b'etag'])])
+        self.assertEqual((status, body), (304, b''))
+
+    def test_bounded_by_entries_and_bytes(self):
+        cache = ResponseCache(max_entries=2, max_bytes=1024 * 1024)
+        for ip in ('192.0.2.1', '192.0.2.2', '192.0.2.1', '192.0.2.3'):
+            cache.render({"ip": ip, "user_agent": "ua", "method": "GET"})
+        self.assertEqual(cache.stats()['entries'], 2)
+        self.assertEqual(cache.stats()['evictions'], 1)
+        # 192.0.2.2 was least recently used
+        cache.render({"ip": "192.0.2.1", "user_agent": "ua", "method": "GET"})
+        self.assertEqual(cache.stats()['hits'], 2)
+
+        small = ResponseCache(max_entries=100, max_bytes=300)
+        for i in range(10):
+            small.render({"ip": f"192.0.2.{i}", "user_agent": "ua" * 20, "method": "GET"})
+        self.assertLessEqual(small.stats()['bytes'], 300)
+        self.assertGreater(small.stats()['evictions'], 0)
+
+    def test_stats_endpoint(self):
+        self.app.get('/')
+        self.app.get('/')
+        auth = {'Authorization': 'Bearer s3cret'}
+        with mock.patch.object(app_module, 'ADMIN_TOKEN', 's3cret'):
+            stats = self.app.get('/cache/stats', headers=auth).get_json()
+            self.assertEqual(stats['hit_ratio'], 0.5)
+            _, _, body = call_asgi(path='/cache/stats', headers=[(b'authorization', b'Bearer s3cret')])
+            self.assertIn(b'"hits":1', body)
+
+    def test_stats_endpoint_needs_admin_token(self):
+        self.assertEqual(self.app.get('/cache/stats').status_code, 404)
+        self.assertEqual(call_asgi(path='/cache/stats')[0], 404)
+        with mock.patch.object(app_module, 'ADMIN_TOKEN', 's3cret'):
+            self.assertEqual(self.app.get('/cache/stats', headers={'Authorization': 'Bearer nope'}).status_code, 403)
+            self.assertEqual(self.app.get('/cache/stats').status_code, 403)
+            self.assertEqual(call_asgi(path='/cache/stats', headers=[(b'authorization', b'Bearer nope')])[0], 403)
+
+    def test_etag_matching(self):
+        self.assertTrue(etag_matches('*', '"abc"'))
+        self.assertTrue(etag_matches('"x", W/"abc"', '"abc"'))
+        self.assertFalse(etag_matches('"abd"', '"abc"'))
+        self.assertFalse(etag_matches('"xx"abc"xx"', '"abc"'))
+        self.assertFalse(etag_matches('W/"prefix-"abc"', '"abc"'))
+        self.assertFalse(etag_matches(None, '"abc"'))
+
+
+class TestTrustedProxies(unittest.TestCase):
+
+    def setUp(self):
+        self.proxies = TrustedProxies(['10.0.0.0/8', '192.0.2.10/32', '2001:db8::/32'])
+
+    def test_cidr_matching(self):
+        self.assertTrue(self.proxies.is_trusted('10.200.3.4'))
+        self.assertTrue(self.proxies.is_trusted('192.0.2.10'))
+        self.assertFalse(self.proxies.is_trusted('192.0.2.11'))
+        self.assertTrue(self.proxies.is_trusted('2001:db8::1'))
+        self.assertTrue(self.proxies.is_trusted('::ffff:10.1.1.1'))
+        self.assertFalse(self.proxies.is_trusted('not-an-ip'))
+        self.assertEqual(self.proxies.classify(' [2001:db8::2]:80'), ('2001:db8::2', True))
+
+    def test_walks_forwarded_for_right_to_left(self):
+        chain = '1.1.1.1, 203.0.113.5, 192.0.2.10:443, 10.0.0.7'
+        self.assertEqual(self.proxies.resolve('10.0.0.1', chain), '203.0.113.5')
+        self.assertEqual(self.proxies.resolve('10.0.0.1', '10.0.0.3, 10.0.0.2'), '10.0.0.3')
+        self.assertEqual(self.proxies.resolve('10.0.0.1', 'unknown, 10.0.0.2'), '10.0.0.2')
+        self.assertEqual(self.proxies.resolve('10.0.0.1', None), '10.0.0.1')
+
+    def test_walk_is_bounded(self):
+        proxies = TrustedProxies(['10.0.0.0/8'], max_hops=3)
+        self.assertEqual(proxies.resolve('10.0.0.1', '1.1.1.1, 10.0.0.5, 10.0.0.4, 10.0.0.3, 10.0.0.2'), '10.0.0.4')
+
+    def test_forwarded_header(self):
+        proxies = TrustedProxies(['10.0.0.0/8', '2001:db8::/32'], header='forwarded')
+        header = 'for=1.1.1.1, for="[2001:db8:cafe::17]:4711";proto=https, for=10.0.0.2;by=10.0.0.1'
+        self.assertEqual(proxies.resolve('10.0.0.1', 'for=198.51.100.3:80;proto=http, ' + header),
+                         '1.1.1.1')
+        self.assertEqual(proxies.resolve('10.0.0.1', 'for="[2001:db9::5]", for=10.0.0.2'), '2001:db9::5')
+        self.assertEqual(proxies.resolve('10.0.0.1', 'for=_hidden, for=10.0.0.2'), '10.0.0.2')
+
+    def test_rejects_unknown_header(self):
+        with self.assertRaises(ValueError):
+            TrustedProxies([], header='x-real-ip')
+
+
+class TestLogging(unittest.TestCase):
+
+    def setUp(self):
+        self.logger = logging.getLogger('test_unit.logging')
+        self.logger.propagate = False
+        self.logger.setLevel(logging.INFO)
+        self.queue = queue.Queue(maxsize=3)
+        self.handler = NonBlockingQueueHandler(self.queue)
+        self.logger.addHandler(self.handler)
+        self.addCleanup(self.logger.removeHandler, self.handler)
+
+    def drain(self):
+        messages = []
+        while not self.queue.empty():
+            messages.append(self.queue.get_nowait().getMessage())
+        return messages
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        for i in range(5):
+            self.logger.info('record %d', i)
+        self.assertEqual(self.drain(), ['record 0', 'record 1', 'record 2'])
+        self.assertEqual(self.handler.dropped, 2)
+
+    def test_drops_are_reported_once_there_is_room(self):
+        for i in range(5):
+            self.logger.info('record %d', i)
+        self.drain()
+        self.logger.info('after')
+        self.assertEqual(self.drain(), ['2 log records dropped, the log writer fell behind', 'after'])
+        self.assertEqual(self.handler.unreported, 0)
+        self.assertEqual(self.handler.dropped, 2)
+
+    def test_drops_are_reported_at_shutdown(self):
+        stream = io.StringIO()
+        root = logging.getLogger()
+        saved = (list(root.handlers), root.level)
+        self.addCleanup(lambda: (root.handlers.clear(), root.handlers.extend(saved[0]), root.setLevel(saved[1])))
+        handler = configure_logging('INFO', stream=stream)
+        self.addCleanup(stop_logging)
+        logging.getLogger('test_unit.shutdown').info('last words')
+        handler.dropped = handler.unreported = 4
+        stop_logging()
+        self.assertIn('INFO - last words', stream.getvalue())
+        self.assertIn('WARNING - 4 log records dropped', stream.getvalue())
+
+
+class TestAsgiApp(unittest.TestCase):
+
+    def test_same_response_as_flask(self):
+        status, headers, body = call_asgi(headers=[(b'user-agent', b'tester'), (b'x-forwarded-for', b'198.51.100.4')])
+        flask_response = app.test_client().get(
+            '/', headers={'User-Agent': 'tester', 'X-Forwarded-For': '198.51.100.4'})
+        self.assertEqual(status, 200)
+        self.assertEqual(headers[b'access-control-allow-origin'], b'*')
+        self.assertEqual(body.strip(), flask_response.data.strip())
+
+    def test_client_address_without_proxy(self):
+        _, _, body = call_asgi()
+        self.assertIn(b'"ip":"10.0.0.9"', body)
+        self.assertIn(b'"user_agent":"Unknown"', body)
+
+    def test_unknown_path(self):
+        status, _, _ = call_asgi(path='/nope')
+        self.assertEqual(status, 404)
+
+    def test_rejects_methods_flask_does_not_route(self):
+        for method in ('POST', 'PUT', 'DELETE'):
+            status, headers, _ = call_asgi(method=method)
+            self.assertEqual(status, 405)
+            self.assertEqual(status, app.test_client().open('/', method=method).status_code)
+            self.assertEqual(headers[b'allow'], b'GET, HEAD, OPTIONS')
+
 
 if __name__ == '__main__':
     unittest.main()
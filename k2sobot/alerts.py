@@ -0,0 +1,411 @@
+"""
+Proactive cluster alerts for K2SOBot
+A shared `kubectl get pods --watch` stream emits one compact jsonpath line
+per pod. A line identical to the last one seen for that pod is skipped with
+a dict lookup. Changed lines are parsed and checked against the rule
+predicates. Warning events are watched as JSON, since their messages can
+hold newlines and tabs. Each firing joins an incident keyed by (rule,
+namespace, workload). An incident is posted to ALERT_CHANNEL as one Slack
+message once its grouping window closes. Later firings update that same
+message, and a final update marks it resolved once it has been quiet.
+"""
+import logging
+import os
+import re
+import subprocess
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from datetime import datetime, timezone
+
+import metrics
+import process_runner
+import shared_state as shared
+from rollout_watch import WATCH_STREAMS, iter_json_objects, retry_delay
+
+logger = logging.getLogger(__name__)
+
+# Alert configuration
+ALERT_CHANNEL = os.getenv("ALERT_CHANNEL", "")
+# Comma-separated namespaces to watch (empty watches all namespaces)
+ALERT_NAMESPACES = [ns.strip() for ns in os.getenv("ALERT_NAMESPACES", "").split(",") if ns.strip()]
+# Comma-separated rule names to enable (empty enables all)
+ALERT_RULES = [name.strip() for name in os.getenv("ALERT_RULES", "").split(",") if name.strip()]
+# Seconds to collect firings before an incident is first posted
+ALERT_GROUP_WINDOW = float(os.getenv("ALERT_GROUP_WINDOW", "30"))
+# Minimum seconds between updates of a posted incident
+ALERT_UPDATE_INTERVAL = float(os.getenv("ALERT_UPDATE_INTERVAL", "60"))
+# Seconds without firings before an incident is marked resolved
+ALERT_RESOLVE_AFTER = float(os.getenv("ALERT_RESOLVE_AFTER", "900"))
+# Objects whose last state is remembered for change detection
+ALERT_MAX_TRACKED = int(os.getenv("ALERT_MAX_TRACKED", "20000"))
+ALERT_MAX_LISTED = 10
+
+WATCH_LINES_TOTAL = metrics.Counter(
+    "k2sobot_alert_watch_lines_total", "Watch lines seen by the alert evaluator", ["kind", "outcome"])
+ALERTS_FIRED_TOTAL = metrics.Counter(
+    "k2sobot_alerts_fired_total", "Rule firings (before grouping)", ["rule"])
+ALERT_MESSAGES_TOTAL = metrics.Counter(
+    "k2sobot_alert_messages_total", "Slack alert messages sent", ["action"])
+ALERT_INCIDENTS = metrics.Gauge("k2sobot_alert_incidents", "Open alert incidents")
+
+# One line per object: namespace, name, phase, reason, then name,restarts,waiting,last terminated per container
+POD_TEMPLATE = (
+    '{.metadata.namespace}{"\\t"}{.metadata.name}{"\\t"}{.status.phase}{"\\t"}{.status.reason}{"\\t"}'
+    '{range .status.containerStatuses[*]}{.name}{","}{.restartCount}{","}{.state.waiting.reason}{","}'
+    '{.lastState.terminated.reason}{";"}{end}{"\\n"}'
+)
+
+Container = namedtuple("Container", "name restarts waiting last_terminated")
+Pod = namedtuple("Pod", "namespace name phase reason containers restarts")
+Event = namedtuple("Event", "namespace kind name reason count message")
+# predicate(obj) returns a short detail string when the rule matches. An on_restart rule
+# only fires when the pod's restart count rose since it was last seen: its condition
+# (e.g. lastState) persists long after the fact and would re-alert on every start.
+Rule = namedtuple("Rule", "name kind title predicate on_restart", defaults=(False,))
+
+# ReplicaSet pods end in -<hash>-<suffix>, StatefulSet pods in -<ordinal>
+_POD_SUFFIX = re.compile(r"(-[a-z0-9]{6,10})?-[a-z0-9]{5}$|-\d+$")
+
+
+def workload_name(pod_name):
+    """Best-effort owning workload of a pod (web-7d9f8c6b5-x2k4q -> web)"""
+    return _POD_SUFFIX.sub("", pod_name) or pod_name
+
+
+def _containers_waiting(pod, reasons):
+    names = [c.name for c in pod.containers if c.waiting in reasons]
+    return ", ".join(names) if names else None
+
+
+def _containers_terminated(pod, reason):
+    names = [c.name for c in pod.containers if c.last_terminated == reason]
+    return ", ".join(names) if names else None
+
+
+RULES = [
+    Rule("crashloop", "pod", "CrashLoopBackOff", lambda pod: _containers_waiting(pod, {"CrashLoopBackOff"})),
+    Rule("oomkilled", "pod", "OOMKilled", lambda pod: _containers_terminated(pod, "OOMKilled"), on_restart=True),
+    Rule("image_pull", "pod", "Image pull failing",
+         lambda pod: _containers_waiting(pod, {"ImagePullBackOff", "ErrImagePull", "InvalidImageName"})),
+    Rule("evicted", "pod", "Evicted",
+         lambda pod: "evicted" if pod.phase == "Failed" and pod.reason == "Evicted" else None),
+    Rule("failed_scheduling", "event", "FailedScheduling",
+         lambda event: event.message[:200] if event.reason == "FailedScheduling" else None),
+    Rule("failed_mount", "event", "FailedMount",
+         lambda event: event.message[:200] if event.reason == "FailedMount" else None),
+]
+
+
+def parse_pod_line(line):
+    """Pod from a POD_TEMPLATE line, or None if it is malformed"""
+    fields = line.rstrip("\n").split("\t")
+    if len(fields) != 5:
+        return None
+    namespace, name, phase, reason, statuses = fields
+    containers = []
+    restarts = 0
+    for status in statuses.split(";"):
+        if not status:
+            continue
+        parts = status.split(",")
+        if len(parts) != 4:
+            return None
+        count = int(parts[1]) if parts[1].isdigit() else 0
+        restarts += count
+        containers.append(Container(parts[0], count, parts[2], parts[3]))
+    return Pod(namespace, name, phase, reason, tuple(containers), restarts)
+
+
+def parse_event(obj):
+    """Event from a `kubectl get events -o json` object, or None if it is malformed"""
+    if not isinstance(obj, dict):
+        return None
+    involved = obj.get("involvedObject") or {}
+    return Event(obj.get("metadata", {}).get("namespace", ""), involved.get("kind", ""), involved.get("name", ""),
+                 obj.get("reason", ""), obj.get("count") or 1, " ".join((obj.get("message") or "").split()))
+
+
+class Incident:
+    """Firings of one rule for one workload, shown as a single Slack message"""
+
+    def __init__(self, rule, namespace, workload, now):
+        self.rule = rule
+        self.namespace = namespace
+        self.workload = workload
+        self.started = now
+        self.started_at = datetime.now(timezone.utc)
+        self.last_fired = now
+        self.objects = OrderedDict()
+        self.firings = 0
+        self.version = 0
+        self.posted_version = 0
+        self.last_posted = 0.0
+        self.ts = None
+
+    def add(self, name, detail, now):
+        self.objects[name] = detail
+        self.objects.move_to_end(name)
+        self.firings += 1
+        self.version += 1
+        self.last_fired = now
+
+    def render(self, quiet_for=None):
+        resolved = quiet_for is not None
+        icon = "✅" if resolved else "🚨"
+        count = len(self.objects)
+        noun = "pod" if self.rule.kind == "pod" else "object"
+        header = (f"{icon} *{self.rule.title}*: `{self.workload}` in `{self.namespace}`: "
+                  f"{count} {noun}{'s' if count != 1 else ''}, {self.firings} firing{'s' if self.firings != 1 else ''} "
+                  f"since {self.started_at:%H:%M} UTC")
+        if resolved:
+            return f"{header}\nResolved: quiet for {int(quiet_for // 60)} min."
+        names = list(self.objects.items())[-ALERT_MAX_LISTED:]
+        lines = [f"• `{name}`: {detail}" for name, detail in reversed(names)]
+        if count > ALERT_MAX_LISTED:
+            lines.append(f"…and {count - ALERT_MAX_LISTED} more")
+        return "\n".join([header] + lines)
+
+
+class AlertManager:
+    """Evaluates watch lines against rules and turns firings into grouped Slack incidents"""
+
+    def __init__(self, channel=ALERT_CHANNEL, rules=None, namespaces=None, group_window=ALERT_GROUP_WINDOW,
+                 update_interval=ALERT_UPDATE_INTERVAL, resolve_after=ALERT_RESOLVE_AFTER,
+                 max_tracked=ALERT_MAX_TRACKED, clock=time.monotonic):
+        rules = RULES if rules is None else rules
+        self.channel = channel
+        self.namespaces = ALERT_NAMESPACES if namespaces is None else namespaces
+        self.pod_rules = [rule for rule in rules if rule.kind == "pod"]
+        self.event_rules = [rule for rule in rules if rule.kind == "event"]
+        self.group_window = group_window
+        self.update_interval = update_interval
+        self.resolve_after = resolve_after
+        self.max_tracked = max_tracked
+        self.clock = clock
+        # object key -> last line, pod key -> restarts when last seen,
+        # and pod key -> {rule name: restarts when it last fired}
+        self._last_lines = OrderedDict()
+        self._restarts = {}
+        self._firing = {}
+        self._state_lock = threading.Lock()
+        self.incidents = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = []
+
+    def _changed(self, kind, key, line):
+        """Remember line for key; False if it is what we saw last time"""
+        if self._last_lines.get(key) == line:
+            WATCH_LINES_TOTAL.inc(kind=kind, outcome="unchanged")
+            return False
+        self._last_lines[key] = line
+        self._last_lines.move_to_end(key)
+        if len(self._last_lines) > self.max_tracked:
+            forgotten, _ = self._last_lines.popitem(last=False)
+            self._restarts.pop(forgotten, None)
+            self._firing.pop(forgotten, None)
+        return True
+
+    def observe_pod(self, line):
+        """Evaluate one pod watch line"""
+        with self._state_lock:
+            self._observe_pod(line)
+
+    def _observe_pod(self, line):
+        key = line[:line.find("\t", line.find("\t") + 1)]
+        if not self._changed("pod", key, line):
+            return
+        pod = parse_pod_line(line)
+        if pod is None:
+            WATCH_LINES_TOTAL.inc(kind="pod", outcome="malformed")
+            return
+        WATCH_LINES_TOTAL.inc(kind="pod", outcome="evaluated")
+
+        seen_restarts = self._restarts.get(key)
+        self._restarts[key] = pod.restarts
+        previous = self._firing.get(key, {})
+        current = {}
+        for rule in self.pod_rules:
+            detail = rule.predicate(pod)
+            if not detail:
+                continue
+            if rule.on_restart:
+                # Pods first seen after a start only seed the count
+                fires = seen_restarts is not None and pod.restarts > seen_restarts
+            else:
+                # Fire on the rising edge, and again whenever the pod restarts while still matching
+                fires = rule.name not in previous or pod.restarts > previous[rule.name]
+            if fires:
+                self.fire(rule, pod.namespace, workload_name(pod.name), pod.name, detail)
+            current[rule.name] = pod.restarts
+        if current:
+            self._firing[key] = current
+        else:
+            self._firing.pop(key, None)
+
+    def observe_event(self, obj):
+        """Evaluate one Warning event from the JSON watch"""
+        with self._state_lock:
+            self._observe_event(obj)
+
+    def _observe_event(self, obj):
+        event = parse_event(obj)
+        if event is None:
+            WATCH_LINES_TOTAL.inc(kind="event", outcome="malformed")
+            return
+        # Repeats of an event only bump its count
+        key = ("event", event.namespace, event.kind, event.name, event.reason)
+        if not self._changed("event", key, (event.count, event.message)):
+            return
+        WATCH_LINES_TOTAL.inc(kind="event", outcome="evaluated")
+        for rule in self.event_rules:
+            detail = rule.predicate(event)
+            if detail:
+                workload = workload_name(event.name) if event.kind == "Pod" else event.name
+                self.fire(rule, event.namespace, workload, event.name, detail)
+
+    def fire(self, rule, namespace, workload, name, detail):
+        ALERTS_FIRED_TOTAL.inc(rule=rule.name)
+        now = self.clock()
+        with self._lock:
+            key = (rule.name, namespace, workload)
+            incident = self.incidents.get(key)
+            if incident is None:
+                incident = self.incidents[key] = Incident(rule, namespace, workload, now)
+            incident.add(name, detail, now)
+
+    def flush(self):
+        """Post, update or resolve incidents that are due"""
+        now = self.clock()
+        due = []
+        with self._lock:
+            for key, incident in list(self.incidents.items()):
+                in_flight = incident.ts is None and incident.posted_version != 0
+                if now - incident.last_fired >= self.resolve_after and not in_flight:
+                    del self.incidents[key]
+                    if incident.ts is not None:
+                        due.append((incident, "resolved"))
+                elif incident.ts is None and incident.posted_version == 0:
+                    if now - incident.started >= self.group_window:
+                        incident.posted_version, incident.last_posted = incident.version, now
+                        due.append((incident, "posted"))
+                elif (incident.ts is not None and incident.version != incident.posted_version
+                      and now - incident.last_posted >= self.update_interval):
+                    incident.posted_version, incident.last_posted = incident.version, now
+                    due.append((incident, "updated"))
+        for incident, action in due:
+            self._send(incident, action)
+        return due
+
+    def _send(self, incident, action):
+        ALERT_MESSAGES_TOTAL.inc(action=action)
+        text = incident.render(quiet_for=self.resolve_after if action == "resolved" else None)
+        try:
+            if action == "posted":
+                future = shared.slack_client.chat_postMessage(channel=self.channel, text=text)
+                future.add_done_callback(lambda f: self._posted(incident, f))
+            else:
+                shared.slack_client.chat_update(channel=self.channel, ts=incident.ts, text=text)
+        except Exception as e:
+            if action == "posted":
+                with self._lock:
+                    incident.posted_version = 0
+            metrics.ERRORS_TOTAL.inc(component="alerts")
+            logger.error(f"❌ Failed to send alert: {e}", exc_info=True)
+
+    def _posted(self, incident, future):
+        try:
+            ts = future.result()["ts"]
+        except Exception as e:
+            # Leave it unposted so the next flush retries
+            with self._lock:
+                incident.posted_version = 0
+            logger.warning(f"⚠️ Alert post failed: {e}")
+            return
+        with self._lock:
+            incident.ts = ts
+
+    def start(self):
+        """Start the watch streams and the flush loop"""
+        scopes = [["-n", ns] for ns in self.namespaces] or [["--all-namespaces"]]
+        for scope in scopes:
+            self._spawn("pods", ["kubectl", "get", "pods", *scope, "--watch", "-o", f"jsonpath={POD_TEMPLATE}"],
+                        iter, self.observe_pod)
+            if self.event_rules:
+                self._spawn("events", ["kubectl", "get", "events", *scope, "--watch",
+                                       "--field-selector", "type=Warning", "-o", "json"],
+                            iter_json_objects, self.observe_event)
+        thread = threading.Thread(target=self._flush_loop, name="alert-flusher", daemon=True)
+        thread.start()
+        self._threads.append(thread)
+        ALERT_INCIDENTS.set_function(lambda: len(self.incidents))
+        logger.info(f"🚨 Alerts enabled for {', '.join(self.namespaces) or 'all namespaces'} -> {self.channel}")
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _spawn(self, kind, argv, decode, observe):
+        thread = threading.Thread(
+            target=self._watch, args=(kind, argv, decode, observe), name=f"alerts-{kind}", daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def _watch(self, kind, argv, decode, observe):
+        """Run one watch stream; decode turns its stdout into the items observe takes"""
+        WATCH_STREAMS.inc(kind=f"alerts-{kind}")
+        failures = 0
+        try:
+            while not self._stop.is_set():
+                try:
+                    process = process_runner.popen(argv, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+                except (RuntimeError, OSError) as e:
+                    # Child process cap reached, or kubectl could not be started
+                    failures += 1
+                    metrics.ERRORS_TOTAL.inc(component="alerts")
+                    logger.warning(f"⚠️ Alert watch not started: {e}")
+                    self._stop.wait(retry_delay(failures))
+                    continue
+                failures = 0
+                for item in decode(process.stdout):
+                    try:
+                        observe(item)
+                    except Exception as e:
+                        metrics.ERRORS_TOTAL.inc(component="alerts")
+                        logger.error(f"❌ Alert rule evaluation failed: {e}", exc_info=True)
+                    if self._stop.is_set():
+                        process.kill()
+                        break
+                process.wait()
+                # kubectl watches end after a server timeout; known objects are remembered across reconnects
+                self._stop.wait(1)
+        finally:
+            WATCH_STREAMS.dec(kind=f"alerts-{kind}")
+
+    def _flush_loop(self):
+        interval = max(1.0, min(self.group_window, self.update_interval) / 2)
+        while not self._stop.wait(interval):
+            try:
+                self.flush()
+            except Exception as e:
+                metrics.ERRORS_TOTAL.inc(component="alerts")
+                logger.error(f"❌ Alert flush failed: {e}", exc_info=True)
+
+
+_manager = None
+
+
+def get_alert_manager():
+    """Get the running alert manager (None when alerts are off)"""
+    return _manager
+
+
+def start():
+    """Start alerting when ALERT_CHANNEL is configured"""
+    global _manager
+    if not ALERT_CHANNEL or _manager is not None:
+        return _manager
+    rules = [rule for rule in RULES if not ALERT_RULES or rule.name in ALERT_RULES]
+    _manager = AlertManager(rules=rules).start()
+    return _manager
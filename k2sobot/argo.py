@@ -2,6 +2,10 @@ import subprocess
 import logging
 import os
 from functools import wraps
+import command_executor
+import metrics
+import process_runner
+import tracing
 import shared_state as shared
 
 # ArgoCD connection configuration for minikube environment
@@ -9,13 +13,15 @@ ARGOCD_SERVER = os.getenv("ARGOCD_SERVER", "argocd-server.argo.svc.cluster.local
 ARGOCD_USERNAME = os.getenv("ARGOCD_USERNAME", "admin")
 ARGOCD_PASSWORD = os.getenv("ARGOCD_PASSWORD", "BNoWRv-jt3UtMMaS")
 ARGOCD_INSECURE = os.getenv("ARGOCD_INSECURE", "true").lower() == "true"
+ARGOCD_ROLLBACK_TIMEOUT = float(os.getenv("ARGOCD_ROLLBACK_TIMEOUT", "300"))
 
 def ensure_argocd_login():
     """Ensure ArgoCD is logged in before executing commands"""
     try:
         # Check if already logged in
         check_command = ["argocd", "account", "get-user-info"]
-        result = subprocess.run(check_command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=10)
+        with metrics.ARGOCD_SECONDS.time(subcommand="account get-user-info"):
+            result = process_runner.run(check_command, timeout=10)
 
         if result.returncode == 0 and "Logged In: true" in result.stdout:
             logging.info("ArgoCD already authenticated")
@@ -28,7 +34,8 @@ def ensure_argocd_login():
         if ARGOCD_INSECURE:
             login_command.append("--insecure")
 
-        login_result = subprocess.run(login_command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=15)
+        with metrics.ARGOCD_SECONDS.time(subcommand="login"):
+            login_result = process_runner.run(login_command, timeout=15)
 
         if login_result.returncode == 0:
             logging.info("ArgoCD login successful")
@@ -38,6 +45,7 @@ def ensure_argocd_login():
             return False
 
     except subprocess.TimeoutExpired:
+        metrics.ERRORS_TOTAL.inc(component="argocd")
         logging.error("ArgoCD login timeout")
         return False
     except Exception as e:
@@ -55,58 +63,82 @@ def require_argocd_auth(func):
 
 
 @require_argocd_auth
+@tracing.traced("argocd app list")
+@metrics.ARGOCD_SECONDS.timed(subcommand="app list")
 def get_argo_applications():
     try:
         command = ["argocd", "app", "list", "-o", "name"]
-        result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=True)
+        result = process_runner.run(command, check=True)
         applications = [app.strip() for app in result.stdout.strip().split('\n') if app.strip()]
         return applications
-    except subprocess.CalledProcessError as e:
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+        metrics.ERRORS_TOTAL.inc(component="argocd")
         logging.error("Error running argocd command: %s", e)
         return []
 
 
 @require_argocd_auth
+@tracing.traced("argocd app get")
+@metrics.ARGOCD_SECONDS.timed(subcommand="app get")
 def get_argo_application_status(channel_id, app_name):
     try:
-        command = ["argocd", "app", "get", app_name]
-        result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=True)
+        command = command_executor.argocd_argv("get", app_name)
+        result = process_runner.run(command, check=True)
         output = result.stdout.strip()
-        shared.slack_client.chat_postMessage(channel=channel_id, text=f"```\n{output}\n```")
-    except subprocess.CalledProcessError as e:
+        shared.slack_client.chat_postMessage(channel=channel_id, text=f"```\n{output}\n```", coalesce=True)
+    except command_executor.CommandRejected as e:
+        logging.warning(f"⚠️ Rejected argocd command: {e}")
+        shared.slack_client.chat_postMessage(channel=channel_id, text=f"❌ {e}", coalesce=True)
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+        metrics.ERRORS_TOTAL.inc(component="argocd")
         logging.error("Error running argocd command: %s", e)
-        shared.slack_client.chat_postMessage(channel=channel_id, text=f"Error executing command:\n```\n{e.stderr}\n```")
+        shared.slack_client.chat_postMessage(channel=channel_id, text=f"Error executing command:\n```\n{e.stderr}\n```", coalesce=True)
 
 
 @require_argocd_auth
+@tracing.traced("argocd app history")
+@metrics.ARGOCD_SECONDS.timed(subcommand="app history")
 def get_argo_application_revisions(channel_id, app_name):
     try:
-        command = ["argocd", "app", "history", app_name]
-        result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=True)
+        command = command_executor.argocd_argv("history", app_name)
+        result = process_runner.run(command, check=True)
         output = result.stdout.strip()
-        shared.slack_client.chat_postMessage(channel=channel_id, text=f"```\n{output}\n```")
-    except subprocess.CalledProcessError as e:
+        shared.slack_client.chat_postMessage(channel=channel_id, text=f"```\n{output}\n```", coalesce=True)
+    except command_executor.CommandRejected as e:
+        logging.warning(f"⚠️ Rejected argocd command: {e}")
+        shared.slack_client.chat_postMessage(channel=channel_id, text=f"❌ {e}", coalesce=True)
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+        metrics.ERRORS_TOTAL.inc(component="argocd")
         logging.error("Error running argocd history command: %s", e)
-        shared.slack_client.chat_postMessage(channel=channel_id, text=f"Error executing command:\n```\n{e.stderr}\n```")
+        shared.slack_client.chat_postMessage(channel=channel_id, text=f"Error executing command:\n```\n{e.stderr}\n```", coalesce=True)
 
 
 @require_argocd_auth
+@tracing.traced("argocd app history")
+@metrics.ARGOCD_SECONDS.timed(subcommand="app history")
 def get_argo_application_revisions_for_rollback(app_name):
     try:
-        command = ["argocd", "app", "history", app_name, "-o", "id"]
-        result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=True)
+        command = command_executor.argocd_argv("history", app_name) + ["-o", "id"]
+        result = process_runner.run(command, check=True)
         revisions = [rev.strip() for rev in result.stdout.strip().split('\n') if rev.strip()]
         return revisions
-    except subprocess.CalledProcessError as e:
+    except command_executor.CommandRejected as e:
+        logging.warning(f"⚠️ Rejected argocd command: {e}")
+        return []
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+        metrics.ERRORS_TOTAL.inc(component="argocd")
         logging.error("Error getting revisions for rollback: %s", e)
         return []
 
 
 @require_argocd_auth
+@tracing.traced("argocd app rollback")
+@metrics.ARGOCD_SECONDS.timed(subcommand="app rollback")
 def rollback_argo_application(channel_id, app_name, revision):
+    """Roll back and post the outcome; True only if the rollback succeeded"""
     try:
-        command = ["argocd", "app", "rollback", app_name, revision]
-        result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=True)
+        command = command_executor.argocd_argv("rollback", app_name, revision)
+        result = process_runner.run(command, check=True, timeout=ARGOCD_ROLLBACK_TIMEOUT)
 
         # Extract key information from the output
         output = result.stdout.strip()
@@ -139,8 +171,22 @@ def rollback_argo_application(channel_id, app_name, revision):
                 channel=channel_id,
                 text=f"✅ **Rollback completed successfully**\nApplication: `{app_name}`\nRevision: `{revision}`"
             )
+        return True
+
+    except subprocess.TimeoutExpired:
+        metrics.ERRORS_TOTAL.inc(component="argocd")
+        logging.error("Rollback of %s timed out", app_name)
+        shared.slack_client.chat_postMessage(
+            channel=channel_id, text=f"⏱️ Rollback of `{app_name}` did not finish within {ARGOCD_ROLLBACK_TIMEOUT:g}s")
+        return False
+
+    except command_executor.CommandRejected as e:
+        logging.warning(f"⚠️ Rejected rollback: {e}")
+        shared.slack_client.chat_postMessage(channel=channel_id, text=f"❌ Rollback rejected: {e}")
+        return False
 
     except subprocess.CalledProcessError as e:
+        metrics.ERRORS_TOTAL.inc(component="argocd")
         logging.error("Error rolling back application: %s", e)
         error_message = e.stderr.strip()
 
@@ -157,13 +203,18 @@ def rollback_argo_application(channel_id, app_name, revision):
             )
         else:
             shared.slack_client.chat_postMessage(channel=channel_id, text=f"❌ Rollback failed:\n```\n{error_message}\n```")
+        return False
 
 
 @require_argocd_auth
-def run_argo_command(channel_id, command):
-    try:
-        logging.info("Running command: %s", command)
-        output = subprocess.check_output(command, shell=True, stderr=subprocess.STDOUT, text=True)
-        shared.slack_client.chat_postMessage(channel=channel_id, text=f"```\n{output}\n```")
-    except subprocess.CalledProcessError as e:
-        shared.slack_client.chat_postMessage(channel=channel_id, text=f"Error executing command:\n```\n{e.output}\n```")
\ No newline at end of file
+def run_argo_command(channel_id, argv):
+    """Run a validated argocd argv list (see command_executor.argocd_argv) and post its output"""
+    logging.info("Running command: %s", argv)
+    subcommand = " ".join(argv[1:3])
+    with tracing.span("argocd " + subcommand), metrics.ARGOCD_SECONDS.time(subcommand=subcommand):
+        result = command_executor.execute(argv)
+    if result.ok:
+        shared.slack_client.chat_postMessage(channel=channel_id, text=f"```\n{result.output}\n```", coalesce=True)
+    else:
+        metrics.ERRORS_TOTAL.inc(component="argocd")
+        shared.slack_client.chat_postMessage(channel=channel_id, text=f"Error executing command:\n```\n{result.output or 'timed out'}\n```", coalesce=True)
@@ -0,0 +1,248 @@
+"""
+Argo CD application change feed for K2SOBot
+Keeps the last known state of every application in memory and posts only
+what changed to the channels that subscribed. It covers sync status,
+health, revision, operation phase, and per-resource sync and health.
+State comes from the shared `argocd app list -o json` poll in
+rollout_watch. Each application is cut down to those fields as soon as
+it is parsed, and unchanged applications are skipped with one tuple
+comparison.
+
+Channels subscribe with `/k2sobot argo-feed subscribe [app|*]`, or
+statically with ARGO_FEED_SUBSCRIPTIONS="C0123=*;C0456=payments,checkout".
+"""
+import logging
+import os
+import threading
+import time
+from collections import namedtuple
+
+import metrics
+import rollout_watch
+import shared_state as shared
+
+logger = logging.getLogger(__name__)
+
+# Feed configuration
+ARGO_FEED_INTERVAL = float(os.getenv("ARGO_FEED_INTERVAL", "30"))
+ARGO_FEED_SUBSCRIPTIONS = os.getenv("ARGO_FEED_SUBSCRIPTIONS", "")
+# Resource changes listed per application before summarising the rest
+ARGO_FEED_MAX_RESOURCES = int(os.getenv("ARGO_FEED_MAX_RESOURCES", "10"))
+# Applications listed per message before summarising the rest
+ARGO_FEED_MAX_APPS = 20
+
+FEED_APPLICATIONS = metrics.Gauge("k2sobot_argo_feed_applications", "Applications tracked by the Argo feed")
+FEED_CHANGES_TOTAL = metrics.Counter(
+    "k2sobot_argo_feed_changes_total", "Application state changes detected", ["field"])
+FEED_DIFF_SECONDS = metrics.Histogram(
+    "k2sobot_argo_feed_diff_seconds", "Time to diff one application list against the last one")
+
+AppState = namedtuple("AppState", "sync health revision phase resources")
+
+ALL_APPS = "*"
+
+
+def project(app):
+    """(name, AppState) holding only the fields the feed compares"""
+    status = app.get("status", {})
+    sync = status.get("sync", {})
+    resources = tuple(sorted(
+        (f"{r.get('kind', '')}/{r.get('name', '')}", r.get("namespace", ""), r.get("status", ""),
+         r.get("health", {}).get("status", ""))
+        for r in status.get("resources", [])
+    ))
+    return app.get("metadata", {}).get("name"), AppState(
+        sync.get("status", "Unknown"),
+        status.get("health", {}).get("status", "Unknown"),
+        (sync.get("revision") or "")[:7],
+        status.get("operationState", {}).get("phase", ""),
+        resources,
+    )
+
+
+def _resource_changes(old, new):
+    before = {(name, namespace): (sync, health) for name, namespace, sync, health in old}
+    after = {(name, namespace): (sync, health) for name, namespace, sync, health in new}
+    lines = []
+    for key in sorted(before.keys() | after.keys()):
+        name = key[0]
+        if key not in before:
+            lines.append(f"➕ `{name}` ({'/'.join(filter(None, after[key])) or 'new'})")
+        elif key not in after:
+            lines.append(f"➖ `{name}` removed")
+        elif before[key] != after[key]:
+            changes = [f"{label} {was or '-'} → {now or '-'}"
+                       for label, was, now in zip(("sync", "health"), before[key], after[key]) if was != now]
+            lines.append(f"• `{name}` {', '.join(changes)}")
+    return lines
+
+
+def diff_states(old, new):
+    """Human-readable changes between two AppStates"""
+    changes = []
+    for field in ("sync", "health", "revision", "phase"):
+        was, now = getattr(old, field), getattr(new, field)
+        if was != now:
+            FEED_CHANGES_TOTAL.inc(field=field)
+            label = "operation" if field == "phase" else field
+            changes.append(f"{label} {was or '-'} → {now or '-'}")
+    lines = [", ".join(changes)] if changes else []
+    if old.resources != new.resources:
+        FEED_CHANGES_TOTAL.inc(field="resources")
+        resource_lines = _resource_changes(old.resources, new.resources)
+        if len(resource_lines) > ARGO_FEED_MAX_RESOURCES:
+            extra = len(resource_lines) - ARGO_FEED_MAX_RESOURCES
+            resource_lines = resource_lines[:ARGO_FEED_MAX_RESOURCES] + [f"…and {extra} more resource changes"]
+        lines += resource_lines
+    return lines
+
+
+def parse_subscriptions(spec):
+    """{channel: {app names}} from "C1=*;C2=app-a,app-b" """
+    subscriptions = {}
+    for entry in spec.split(";"):
+        channel, _, apps = entry.partition("=")
+        if channel.strip():
+            names = {app.strip() for app in apps.split(",") if app.strip()} or {ALL_APPS}
+            subscriptions.setdefault(channel.strip(), set()).update(names)
+    return subscriptions
+
+
+class ArgoFeed:
+    """Diffs each application list against the last one and posts changes per subscribed channel"""
+
+    def __init__(self, interval=ARGO_FEED_INTERVAL, poller=None, subscriptions=None):
+        self.interval = interval
+        self.poller = poller or rollout_watch.get_argo_poller()
+        self.states = {}
+        self.subscriptions = subscriptions if subscriptions is not None else parse_subscriptions(ARGO_FEED_SUBSCRIPTIONS)
+        self._primed = False
+        self._lock = threading.Lock()
+        FEED_APPLICATIONS.set_function(lambda: len(self.states))
+        if self.subscriptions:
+            self.poller.subscribe_all(self.on_list, self.interval)
+
+    def subscribe(self, channel, app=ALL_APPS):
+        with self._lock:
+            first = not self.subscriptions
+            self.subscriptions.setdefault(channel, set()).add(app)
+        if first:
+            self.poller.subscribe_all(self.on_list, self.interval)
+
+    def unsubscribe(self, channel, app=ALL_APPS):
+        """Drop one app (or every subscription with *); False if there was nothing to drop"""
+        with self._lock:
+            apps = self.subscriptions.get(channel)
+            if not apps or (app != ALL_APPS and app not in apps):
+                return False
+            if app == ALL_APPS:
+                apps.clear()
+            else:
+                apps.discard(app)
+            if not apps:
+                del self.subscriptions[channel]
+            idle = not self.subscriptions
+        if idle:
+            # Nobody listens: stop polling and start from a fresh snapshot next time
+            self.poller.unsubscribe_all(self.on_list)
+            with self._lock:
+                self.states, self._primed = {}, False
+        return True
+
+    def on_list(self, apps):
+        """Poller callback with the full application list"""
+        started = time.perf_counter()
+        current = dict(project(app) for app in apps)
+        with self._lock:
+            previous, primed = self.states, self._primed
+            self.states, self._primed = current, True
+            subscriptions = {channel: set(names) for channel, names in self.subscriptions.items()}
+        if not primed:
+            # The first list only seeds the state
+            return {}
+
+        changed = {}
+        for name, state in current.items():
+            old = previous.get(name)
+            if old is None:
+                changed[name] = [f"🆕 added: sync {state.sync}, health {state.health}"]
+            elif old != state:
+                lines = diff_states(old, state)
+                if lines:
+                    changed[name] = lines
+        for name in previous.keys() - current.keys():
+            changed[name] = ["🗑️ removed"]
+        FEED_DIFF_SECONDS.observe(time.perf_counter() - started)
+
+        if changed:
+            self.publish(changed, subscriptions)
+        return changed
+
+    def publish(self, changed, subscriptions):
+        """One message per channel covering every changed app it follows"""
+        for channel, names in subscriptions.items():
+            apps = sorted(changed) if ALL_APPS in names else sorted(names & changed.keys())
+            if not apps:
+                continue
+            lines = [f"🚀 *{name}*: " + "\n".join(changed[name]) for name in apps[:ARGO_FEED_MAX_APPS]]
+            if len(apps) > ARGO_FEED_MAX_APPS:
+                lines.append(f"…and {len(apps) - ARGO_FEED_MAX_APPS} more applications changed")
+            text = "\n".join(lines)
+            try:
+                shared.slack_client.chat_postMessage(channel=channel, text=text, coalesce=True)
+            except Exception as e:
+                metrics.ERRORS_TOTAL.inc(component="argo_feed")
+                logger.error(f"❌ Failed to post Argo feed update: {e}", exc_info=True)
+
+    def status(self, app=None):
+        """Last known state from memory, without calling argocd"""
+        with self._lock:
+            states = dict(self.states)
+        if not states:
+            return "No application state yet. It appears after the first poll once a channel subscribes."
+        names = [app] if app else sorted(states)
+        lines = []
+        for name in names:
+            state = states.get(name)
+            if state is None:
+                lines.append(f"`{name}`: not found")
+                continue
+            unhealthy = sum(1 for *_, health in state.resources if health not in ("", "Healthy"))
+            lines.append(f"`{name}`: sync {state.sync}, health {state.health}, revision {state.revision or '-'}"
+                         + (f", {unhealthy} unhealthy resource{'s' if unhealthy != 1 else ''}" if unhealthy else ""))
+        return "\n".join(lines)
+
+    def handle_command(self, channel, text):
+        """Reply to `/k2sobot argo-feed <subscribe|unsubscribe|status|list> [app]`"""
+        words = text.split()
+        action = words[0].lower() if words else "list"
+        target = words[1] if len(words) > 1 else None
+        if action == "subscribe":
+            self.subscribe(channel, target or ALL_APPS)
+            return f"✅ This channel now gets Argo CD changes for {f'`{target}`' if target else 'all applications'}."
+        if action == "unsubscribe":
+            if self.unsubscribe(channel, target or ALL_APPS):
+                return f"🔕 Unsubscribed from {f'`{target}`' if target else 'all Argo CD changes'}."
+            return "This channel was not subscribed to that."
+        if action == "status":
+            return self.status(target)
+        if action == "list":
+            with self._lock:
+                apps = sorted(self.subscriptions.get(channel, ()))
+            return ("This channel follows: " + ", ".join(f"`{app}`" for app in apps)) if apps else \
+                "This channel has no Argo CD feed subscriptions."
+        return "Usage: `/k2sobot argo-feed subscribe|unsubscribe|status|list [app]`"
+
+
+# Global feed instance
+_feed = None
+_feed_lock = threading.Lock()
+
+
+def get_argo_feed():
+    """Get the global Argo CD change feed"""
+    global _feed
+    with _feed_lock:
+        if _feed is None:
+            _feed = ArgoFeed()
+        return _feed
@@ -0,0 +1,134 @@
+"""
+Micro-benchmarks for the per-message hot paths
+Covers tool discovery and dispatch, shaping tool results for Gemini, history
+bookkeeping, intent routing, alert rule evaluation, Argo feed diffing and the
+Slack menu builders. Each case reports
+the best-of-three mean time per call.
+
+Usage:
+    python benchmarks/bench_hot_paths.py [--filter registry] [--scale 1.0] [--collapsed stacks.txt]
+
+--collapsed samples the run with profiler.SamplingProfiler and writes
+collapsed stacks for flamegraph.pl or speedscope.
+"""
+import argparse
+import logging
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import alerts  # noqa: E402
+import argo_feed  # noqa: E402
+import gemini_integration  # noqa: E402
+import intent_router  # noqa: E402
+import profiler  # noqa: E402
+import shared_state as shared  # noqa: E402
+import slack_blocks  # noqa: E402
+import tool_output  # noqa: E402
+from tools import joke_tools  # noqa: E402
+from tools.registry import ToolRegistry, get_tool_registry  # noqa: E402
+
+PODS = [f"web-{i:03d}-7d9f8c6b5-x2k4q" for i in range(80)]
+POD_SUMMARY = {
+    "pod": "web-001", "namespace": "default", "phase": "Running", "node": "node-1",
+    "containers": [{"name": "app", "ready": False, "restarts": 12, "state": "waiting: CrashLoopBackOff"}],
+    "events": [f"Warning BackOff: Back-off restarting failed container (x{i})" for i in range(10)],
+}
+LOG_TEXT = "\n".join(
+    f"2024-01-01T00:00:{i % 60:02d}Z {'ERROR upstream refused' if i % 50 == 0 else 'INFO request served'} id={i}"
+    for i in range(2000))
+
+ALERTS = alerts.AlertManager(channel="CBENCH")
+HEALTHY_POD_LINE = "prod\tweb-7d9f8c6b5-x2k4q\tRunning\t\tapp,0,,;istio-proxy,0,,;\n"
+_restarts = iter(range(10 ** 9))
+
+
+def _pod_status_change():
+    # A new restart count each call, so the line is parsed and every rule is evaluated
+    ALERTS.observe_pod(f"prod\tweb-7d9f8c6b5-x2k4q\tRunning\t\tapp,{next(_restarts)},,;istio-proxy,0,,;\n")
+
+ARGO_APPS = [
+    {"metadata": {"name": f"app-{i:03d}"},
+     "status": {"sync": {"status": "Synced", "revision": "4f2c1e9d"}, "health": {"status": "Healthy"},
+                "operationState": {"phase": "Succeeded"},
+                "resources": [{"kind": "Deployment", "name": f"svc-{j}", "namespace": "prod", "status": "Synced",
+                               "health": {"status": "Healthy"}} for j in range(10)]}}
+    for i in range(200)]
+
+
+class _IdlePoller:
+    def subscribe_all(self, callback, interval):
+        pass
+
+
+FEED = argo_feed.ArgoFeed(poller=_IdlePoller(), subscriptions={})
+FEED.on_list(ARGO_APPS)
+
+
+def _history_roundtrip():
+    shared.add_to_conversation_history("UBENCH", "user", "what pods are crashlooping in default?")
+    shared.add_to_conversation_history("UBENCH", "model", "Two pods are in CrashLoopBackOff: web-001 and web-007.")
+    return shared.get_conversation_history("UBENCH")
+
+
+# (group, name, callable, calls per timing round)
+CASES = [
+    ("registry", "discover_tools (fresh registry)", lambda: ToolRegistry().discover_tools(), 20),
+    ("registry", "direct call get_random_joke", joke_tools.get_random_joke, 100000),
+    ("registry", "execute_tool get_random_joke", lambda: get_tool_registry().execute_tool("get_random_joke"), 100000),
+    ("gemini", "function_response_content (80 pod list)",
+     lambda: gemini_integration.function_response_content("get_pods", PODS), 5000),
+    ("gemini", "function_response_content (pod summary)",
+     lambda: gemini_integration.function_response_content("describe_pod", POD_SUMMARY), 5000),
+    ("gemini", "cap_tool_output (2000-line log)",
+     lambda: tool_output.cap_tool_output("get_pod_logs", LOG_TEXT), 500),
+    ("history", "add x2 + get conversation history", _history_roundtrip, 100000),
+    ("router", "intent_router.match (hit)",
+     lambda: intent_router.get_intent_router().match("show pods in kube-system"), 50000),
+    ("router", "intent_router.match (miss)",
+     lambda: intent_router.get_intent_router().match("why does web-001 keep restarting?"), 50000),
+    ("alerts", "observe_pod (unchanged line)", lambda: ALERTS.observe_pod(HEALTHY_POD_LINE), 100000),
+    ("alerts", "observe_pod (changed, all rules)", _pod_status_change, 50000),
+    ("argo_feed", "on_list (200 apps x 10 resources, unchanged)", lambda: FEED.on_list(ARGO_APPS), 200),
+    ("slack_blocks", "kubectl options menu",
+     lambda: slack_blocks.build_kubectl_options_block("U012345", shared.available_commands), 50000),
+    ("slack_blocks", "pod menu (80 pods)", lambda: slack_blocks.build_pod_command_block(PODS, "default"), 50000),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--filter", default="", help="only run cases whose group or name contains this")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply the calls per round")
+    parser.add_argument("--collapsed", help="write sampled collapsed stacks of the run to this file")
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+    get_tool_registry().discover_tools()
+
+    sampler = profiler.SamplingProfiler(interval=0.001).start() if args.collapsed else None
+    results = {}
+    print(f"{'case':48} {'per call':>12}")
+    for group, name, fn, number in CASES:
+        if args.filter and args.filter not in group and args.filter not in name:
+            continue
+        number = max(1, int(number * args.scale))
+        per_call = min(timeit.repeat(fn, number=number, repeat=3)) / number
+        results[name] = per_call
+        print(f"{group + ': ' + name:48} {per_call * 1e6:10.2f}us")
+
+    direct = results.get("direct call get_random_joke")
+    dispatched = results.get("execute_tool get_random_joke")
+    if direct and dispatched:
+        print(f"\nexecute_tool dispatch overhead: {(dispatched - direct) * 1e6:.2f}us per call")
+
+    if sampler is not None:
+        sampler.stop()
+        with open(args.collapsed, "w") as f:
+            f.write(sampler.collapsed())
+        print(f"Collapsed stacks written to {args.collapsed}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Micro-benchmark: build + serialize cost of the Slack menus
+Compares building nested dicts and json.dumps-ing them on every call (the
+previous slack_blocks implementation, reproduced below) with the cached
+BlockTemplate rendering now used by slack_blocks.
+
+Usage:
+    python benchmarks/bench_slack_blocks.py [--number 20000]
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import slack_blocks  # noqa: E402
+import shared_state as shared  # noqa: E402
+
+
+def _legacy_menu(prompt, placeholder, action_id, items, accessory=None):
+    section = {"type": "section", "text": {"type": "mrkdwn", "text": prompt}}
+    if accessory:
+        section["accessory"] = accessory
+    return {
+        "blocks": [
+            section,
+            {
+                "type": "actions",
+                "elements": [
+                    {
+                        "type": "static_select",
+                        "placeholder": {"type": "plain_text", "text": placeholder},
+                        "options": [
+                            {"text": {"type": "plain_text", "text": item}, "value": item}
+                            for item in items
+                        ],
+                        "action_id": action_id
+                    }
+                ]
+            }
+        ]
+    }
+
+
+def legacy_kubectl_options(user_id):
+    return _legacy_menu(
+        f"\nHello <@{user_id}>! Please select a command:\n\n", "Select a command", "kubectl_command_select",
+        shared.available_commands,
+        accessory={
+            "type": "image",
+            "image_url": "https://raw.githubusercontent.com/kubernetes/kubernetes/master/logo/logo.png",
+            "alt_text": "computer thumbnail"
+        })
+
+
+def legacy_sub_command(selected_command):
+    return _legacy_menu(
+        "Please select a sub-command:", "Select a sub-command", "kubectl_sub_command_select",
+        shared.available_sub_commands.get(selected_command, []))
+
+
+def legacy_pods(pods):
+    return _legacy_menu("Please select a pod:", "Select a pod", "kubectl_pod_select", pods)
+
+
+PODS = [f"web-{i:03d}-7d9f8c6b5-x2k4q" for i in range(80)]
+
+CASES = [
+    ("kubectl options (user mention)",
+     lambda: json.dumps(legacy_kubectl_options("U012345")),
+     lambda: slack_blocks.build_kubectl_options_block("U012345", shared.available_commands)["blocks"]),
+    ("sub-command menu",
+     lambda: json.dumps(legacy_sub_command("argo")),
+     lambda: slack_blocks.build_kubectl_sub_command_block(shared.available_sub_commands, "argo")["blocks"]),
+    ("pod menu (80 pods)",
+     lambda: json.dumps(legacy_pods(PODS)),
+     lambda: slack_blocks.build_pod_command_block(PODS, "default")["blocks"]),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--number", type=int, default=20000)
+    args = parser.parse_args()
+
+    print(f"{'case':34} {'dict+dumps':>12} {'template':>12} {'speedup':>8}")
+    for name, legacy, templated in CASES:
+        before = min(timeit.repeat(legacy, number=args.number, repeat=3)) / args.number
+        after = min(timeit.repeat(templated, number=args.number, repeat=3)) / args.number
+        print(f"{name:34} {before * 1e6:10.2f}us {after * 1e6:10.2f}us {before / after:7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,398 @@
+"""
+Offline replay benchmark for the whole bot
+Replays Slack events, slash commands, interactions and options requests
+against main.app with every backend replaced by a local stand-in:
+
+    Slack Web API   testing/fake_socket_mode.py (via SLACK_API_URL)
+    kubectl/argocd  testing/bin (fake CLIs, FAKE_CLI_LATENCY per call)
+    Gemini          testing/fake_gemini.py (scripted REST responses)
+    MCP             testing/fake_mcp_server.py
+
+Each session is one simulated user working through a flow in its own
+channel; sessions run concurrently, steps within a session in order. A
+step's latency runs from the HTTP request until the handler it queued on
+the worker pool has finished. A second, serial pass measures the peak
+traced memory of each handler.
+
+Requests come from a synthetic mix, or from a JSONL recording with one
+{"session": ..., "kind": "event|interaction|slash_command|options|mcp",
+"payload": {...}} object per line.
+
+Usage:
+    python benchmarks/replay.py [--sessions 200] [--concurrency 16] [--events recorded.jsonl]
+                                [--output results.json] [--baseline results.json --tolerance 0.2]
+"""
+import argparse
+import hashlib
+import hmac
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import tracemalloc
+import warnings
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from testing.fake_gemini import FakeGeminiServer  # noqa: E402
+from testing.fake_socket_mode import FakeSocketModeServer  # noqa: E402
+
+SIGNING_SECRET = "replay-signing-secret"
+VERIFICATION_TOKEN = "replay-verification-token"
+STEP_TIMEOUT = 60
+
+# flow name -> relative weight in the synthetic mix
+FLOW_WEIGHTS = {
+    "mention": 10,
+    "slash_menu": 10,
+    "get_pods": 15,
+    "describe_pod": 10,
+    "pod_logs": 10,
+    "unhealthy_pods": 5,
+    "argo_status": 8,
+    "argo_revisions": 5,
+    "typeahead": 10,
+    "dm_tool": 8,
+    "dm_chat": 4,
+    "dm_routed": 8,
+    "mcp": 3,
+}
+
+
+def _interaction(channel, user, action_id, value):
+    return {
+        "type": "block_actions",
+        "user": {"id": user},
+        "channel": {"id": channel},
+        "actions": [{"action_id": action_id, "selected_option": {"value": value}}],
+    }
+
+
+def _event(event, n):
+    return {
+        "token": VERIFICATION_TOKEN,
+        "type": "event_callback",
+        "event_id": f"Ev{n:08d}",
+        "event_time": int(time.time()),
+        "event": event,
+    }
+
+
+def synthetic_sessions(count, seed=1):
+    """Generate count sessions drawn from FLOW_WEIGHTS"""
+    rng = random.Random(seed)
+    flows, weights = zip(*FLOW_WEIGHTS.items())
+    sessions = []
+    for n in range(count):
+        flow = rng.choices(flows, weights)[0]
+        channel, user, dm = f"C{n:06d}", f"U{n:06d}", f"D{n:06d}"
+        namespace = rng.choice(["default", "kube-system", "team-0", "team-1"])
+        pod = f"{namespace}-api-{rng.randrange(20):03d}-7d9f"
+        app = f"app-{rng.randrange(12):02d}"
+
+        def pick(command, sub_command):
+            return [
+                ("interaction", _interaction(channel, user, "kubectl_command_select", command)),
+                ("interaction", _interaction(channel, user, "kubectl_sub_command_select", sub_command)),
+            ]
+
+        if flow == "mention":
+            steps = [("event", _event({"type": "app_mention", "channel": channel, "user": user, "text": "<@UFAKEBOT>"}, n))]
+        elif flow == "slash_menu":
+            steps = [("slash_command", {"command": "/k2sobot", "user_id": user, "channel_id": channel, "text": ""})]
+        elif flow == "get_pods":
+            steps = pick("get", "pods") + [
+                ("interaction", _interaction(channel, user, "kubectl_namespace_select", namespace))]
+        elif flow in ("describe_pod", "pod_logs"):
+            steps = pick("describe" if flow == "describe_pod" else "logs", "pods") + [
+                ("interaction", _interaction(channel, user, "kubectl_namespace_select", namespace)),
+                ("interaction", _interaction(channel, user, "kubectl_pod_select", pod)),
+            ]
+        elif flow == "unhealthy_pods":
+            steps = pick("get", "unhealthy pods")
+        elif flow in ("argo_status", "argo_revisions"):
+            steps = pick("argo", "status" if flow == "argo_status" else "revisions") + [
+                ("interaction", _interaction(channel, user, "argo_app_select", app))]
+        elif flow == "typeahead":
+            steps = pick("describe", "pods") + [
+                ("interaction", _interaction(channel, user, "kubectl_namespace_select", namespace)),
+                ("options", {"type": "block_suggestion", "action_id": "kubectl_pod_select",
+                             "block_id": f"pods:{namespace}", "value": pod[:len(namespace) + 6],
+                             "user": {"id": user}, "channel": {"id": channel}}),
+            ]
+        elif flow.startswith("dm_"):
+            text = {"dm_tool": f"are any pods restarting a lot in namespace {namespace}?",
+                    "dm_chat": "how do readiness probes work?",
+                    "dm_routed": "what time is it?"}[flow]
+            steps = [("event", _event({"type": "message", "channel": dm, "user": user, "text": text}, n))]
+        else:
+            steps = [("mcp", {"server": "fake", "tool": "echo", "arguments": {"text": f"hello {n}"}})]
+        sessions.append((flow, steps))
+    return sessions
+
+
+def recorded_sessions(path):
+    """Group a JSONL recording into sessions, keeping each session's order"""
+    grouped = defaultdict(list)
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                grouped[record.get("session", "default")].append((record["kind"], record["payload"]))
+    return [(f"recorded:{session}", steps) for session, steps in grouped.items()]
+
+
+def handler_name(kind, payload):
+    if kind == "event":
+        event = payload["event"]
+        return "message.im" if event["type"] == "message" else event["type"]
+    if kind == "interaction":
+        return payload["actions"][0]["action_id"]
+    if kind == "options":
+        return f"options {payload['action_id']}"
+    if kind == "mcp":
+        return "mcp tools/call"
+    return kind
+
+
+class Replayer:
+    """Sends steps through main.app and times them until their queued work is done"""
+
+    def __init__(self, main, mcp_client):
+        self.main = main
+        self.mcp_client = mcp_client
+        self._local = threading.local()
+        pool = main.workers.get_worker_pool()
+        submit = pool.submit
+
+        def recording_submit(fn, *args, **kwargs):
+            future = submit(fn, *args, **kwargs)
+            pending = getattr(self._local, "pending", None)
+            if pending is not None:
+                pending.append(future)
+            return future
+
+        # Instance attribute: only this process's pool object is affected
+        pool.submit = recording_submit
+
+    def _client(self):
+        client = getattr(self._local, "client", None)
+        if client is None:
+            client = self._local.client = self.main.app.test_client()
+        return client
+
+    def _post(self, path, form=None, json_body=None):
+        body = json.dumps(json_body) if json_body is not None else urlencode(form)
+        timestamp = str(int(time.time()))
+        signature = "v0=" + hmac.new(
+            SIGNING_SECRET.encode(), f"v0:{timestamp}:{body}".encode(), hashlib.sha256).hexdigest()
+        response = self._client().post(
+            path, data=body,
+            content_type="application/json" if json_body is not None else "application/x-www-form-urlencoded",
+            headers={"X-Slack-Request-Timestamp": timestamp, "X-Slack-Signature": signature})
+        if response.status_code >= 400:
+            raise RuntimeError(f"{path} answered {response.status_code}")
+
+    def step(self, kind, payload):
+        """Run one step; returns (ack seconds, total seconds)"""
+        self._local.pending = pending = []
+        started = time.perf_counter()
+        try:
+            if kind == "event":
+                self._post("/slack/events", json_body=payload)
+            elif kind == "interaction":
+                self._post("/interactions", form={"payload": json.dumps(payload)})
+            elif kind == "slash_command":
+                self._post("/k2sobot", form=payload)
+            elif kind == "options":
+                self._post("/slack/options", form={"payload": json.dumps(payload)})
+            elif kind == "mcp":
+                result = self.mcp_client.call_tool(payload["server"], payload["tool"], payload["arguments"])
+                if result.startswith("Error"):
+                    raise RuntimeError(result)
+            else:
+                raise ValueError(f"Unknown step kind {kind}")
+            acked = time.perf_counter()
+            for future in pending:
+                if future is None:
+                    raise RuntimeError("worker pool backlog full")
+                future.result(timeout=STEP_TIMEOUT)
+        finally:
+            self._local.pending = None
+        return acked - started, time.perf_counter() - started
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, int(round(q / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def run_load(replayer, sessions, concurrency):
+    samples = defaultdict(lambda: {"ack": [], "total": [], "errors": 0})
+    lock = threading.Lock()
+
+    def run_session(session):
+        _, steps = session
+        for kind, payload in steps:
+            name = handler_name(kind, payload)
+            try:
+                ack, total = replayer.step(kind, payload)
+            except Exception as e:
+                logging.warning(f"❌ {name} failed: {e}")
+                with lock:
+                    samples[name]["errors"] += 1
+                return
+            with lock:
+                samples[name]["ack"].append(ack)
+                samples[name]["total"].append(total)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(run_session, sessions))
+    return samples, time.perf_counter() - started
+
+
+def run_memory(replayer, sessions):
+    """Serially replay one session per flow, recording each handler's peak traced memory"""
+    peaks = {}
+    seen = set()
+    tracemalloc.start()
+    try:
+        for flow, steps in sessions:
+            if flow in seen:
+                continue
+            seen.add(flow)
+            for kind, payload in steps:
+                name = handler_name(kind, payload)
+                baseline = tracemalloc.get_traced_memory()[0]
+                tracemalloc.reset_peak()
+                try:
+                    replayer.step(kind, payload)
+                except Exception:
+                    break
+                peak = tracemalloc.get_traced_memory()[1] - baseline
+                peaks[name] = max(peaks.get(name, 0), peak)
+    finally:
+        tracemalloc.stop()
+    return peaks
+
+
+def summarize(samples, peaks, wall):
+    steps = sum(len(s["total"]) for s in samples.values())
+    handlers = {}
+    for name, s in sorted(samples.items()):
+        handlers[name] = {
+            "count": len(s["total"]),
+            "errors": s["errors"],
+            "ack_p50_ms": percentile(s["ack"], 50) * 1000,
+            "p50_ms": percentile(s["total"], 50) * 1000,
+            "p95_ms": percentile(s["total"], 95) * 1000,
+            "p99_ms": percentile(s["total"], 99) * 1000,
+            "peak_kib": peaks[name] / 1024 if name in peaks else None,
+        }
+    return {"steps": steps, "wall_seconds": wall, "throughput_per_second": steps / wall if wall else 0.0,
+            "handlers": handlers}
+
+
+def print_report(results):
+    header = f"{'handler':<32}{'n':>6}{'err':>5}{'ack p50':>10}{'p50':>10}{'p95':>10}{'p99':>10}{'peak KiB':>10}"
+    print(header)
+    print("-" * len(header))
+    for name, h in results["handlers"].items():
+        peak = "-" if h["peak_kib"] is None else f"{h['peak_kib']:.0f}"
+        print(f"{name:<32}{h['count']:>6}{h['errors']:>5}{h['ack_p50_ms']:>8.1f}ms{h['p50_ms']:>8.1f}ms"
+              f"{h['p95_ms']:>8.1f}ms{h['p99_ms']:>8.1f}ms{peak:>10}")
+    print(f"\n{results['steps']} steps in {results['wall_seconds']:.2f}s: "
+          f"{results['throughput_per_second']:.1f} steps/s")
+
+
+def compare(results, baseline, tolerance):
+    """Print p95 regressions beyond tolerance; returns True if any were found"""
+    regressed = False
+    for name, h in results["handlers"].items():
+        before = baseline.get("handlers", {}).get(name)
+        if not before or not before["p95_ms"]:
+            continue
+        change = h["p95_ms"] / before["p95_ms"] - 1
+        if change > tolerance:
+            regressed = True
+            print(f"⚠️ {name}: p95 {before['p95_ms']:.1f}ms -> {h['p95_ms']:.1f}ms ({change:+.0%})")
+    before = baseline.get("throughput_per_second")
+    if before and results["throughput_per_second"] < before * (1 - tolerance):
+        regressed = True
+        print(f"⚠️ throughput {before:.1f}/s -> {results['throughput_per_second']:.1f}/s")
+    return regressed
+
+
+def setup_environment(args):
+    """Start the fakes and point the bot's configuration at them; must run before importing main"""
+    slack = FakeSocketModeServer().start()
+    gemini = FakeGeminiServer(latency=args.gemini_latency).start()
+    os.environ.update({
+        "SLACK_TRANSPORT": "http",
+        "SLACK_BOT_TOKEN": "xoxb-replay",
+        "SLACK_SIGNING_SECRET": SIGNING_SECRET,
+        "VERIFICATION_TOKEN": VERIFICATION_TOKEN,
+        "SLACK_API_URL": slack.api_url,
+        "GEMINI_API_KEY": "replay",
+        "GEMINI_API_ENDPOINT": gemini.endpoint,
+        "FAKE_CLI_LATENCY": str(args.cli_latency),
+        "PATH": os.path.join(ROOT, "testing", "bin") + os.pathsep + os.environ.get("PATH", ""),
+    })
+    return slack, gemini
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--events", help="JSONL recording to replay instead of the synthetic mix")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--gemini-latency", type=float, default=0.4, help="seconds per fake Gemini response")
+    parser.add_argument("--cli-latency", type=float, default=0.05, help="seconds per fake kubectl/argocd call")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    parser.add_argument("--output", help="write results as JSON")
+    parser.add_argument("--baseline", help="earlier --output file to compare p95 and throughput against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed regression before failing")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    setup_environment(args)
+    import main as bot  # noqa: E402
+    import mcp_client  # noqa: E402
+
+    logging.getLogger().setLevel(logging.INFO if args.verbose else logging.WARNING)
+    if not args.verbose:
+        warnings.filterwarnings("ignore", category=UserWarning, module="slack_sdk")
+    mcp_client.mcp_client.register_server(
+        "fake", sys.executable, [os.path.join(ROOT, "testing", "fake_mcp_server.py")])
+
+    sessions = recorded_sessions(args.events) if args.events else synthetic_sessions(args.sessions, args.seed)
+    replayer = Replayer(bot, mcp_client.mcp_client)
+
+    samples, wall = run_load(replayer, sessions, args.concurrency)
+    peaks = {} if args.no_memory else run_memory(replayer, sessions)
+    results = summarize(samples, peaks, wall)
+    print_report(results)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            if compare(results, json.load(f), args.tolerance):
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Per-user Gemini chat sessions
+Keeps each user's live ChatSession between DMs instead of rebuilding it with
+start_chat on every message. Sessions are evicted least-recently-used or
+after sitting idle, and are rebuilt from shared_state's conversation history
+when needed. Turns for one user are serialized so two quick DMs cannot
+interleave on the same session.
+"""
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import metrics
+from shared_state import get_conversation_history
+
+logger = logging.getLogger(__name__)
+
+# Session cache configuration
+GEMINI_SESSION_MAX = int(os.getenv("GEMINI_SESSION_MAX", "200"))
+GEMINI_SESSION_IDLE_TIMEOUT = float(os.getenv("GEMINI_SESSION_IDLE_TIMEOUT", "1800"))
+# Rebuild a session from the short text history once its full history grows past this many contents
+GEMINI_SESSION_MAX_HISTORY = int(os.getenv("GEMINI_SESSION_MAX_HISTORY", "40"))
+
+
+class _Session:
+    def __init__(self, chat, model):
+        self.chat = chat
+        self.model = model
+        self.last_used = time.monotonic()
+        self.lock = threading.Lock()
+
+
+class ChatSessionCache:
+    """LRU + idle-timeout cache of live ChatSession objects keyed by user"""
+
+    def __init__(self, max_sessions=GEMINI_SESSION_MAX, idle_timeout=GEMINI_SESSION_IDLE_TIMEOUT):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    @contextmanager
+    def session(self, user_id, model):
+        """Yield the user's ChatSession, holding it for the whole turn"""
+        entry = self._get(user_id, model)
+        with entry.lock:
+            if len(entry.chat.history) > GEMINI_SESSION_MAX_HISTORY:
+                entry.chat = model.start_chat(history=get_conversation_history(user_id))
+            try:
+                yield entry.chat
+            except Exception:
+                # A failed turn can leave a function call without its response; start clean next time
+                self.invalidate(user_id)
+                raise
+            finally:
+                entry.last_used = time.monotonic()
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._sessions.pop(user_id, None)
+
+    def _get(self, user_id, model):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._sessions.get(user_id)
+            if entry is not None and entry.model is model and now - entry.last_used < self.idle_timeout:
+                self._sessions.move_to_end(user_id)
+                metrics.CACHE_HITS_TOTAL.inc(cache="chat_sessions")
+                return entry
+
+            metrics.CACHE_MISSES_TOTAL.inc(cache="chat_sessions")
+            entry = _Session(model.start_chat(history=get_conversation_history(user_id)), model)
+            self._sessions[user_id] = entry
+            self._sessions.move_to_end(user_id)
+            self._evict(now)
+            return entry
+
+    def _evict(self, now):
+        """Drop idle sessions and the least recently used beyond the limit; called with the lock held"""
+        for user_id in [u for u, s in self._sessions.items() if now - s.last_used >= self.idle_timeout]:
+            del self._sessions[user_id]
+        while len(self._sessions) > self.max_sessions:
+            user_id, _ = self._sessions.popitem(last=False)
+            logger.debug(f"Evicted chat session for {user_id}")
+
+
+# Global session cache instance
+_cache = ChatSessionCache()
+CHAT_SESSIONS = metrics.Gauge("k2sobot_chat_sessions", "Live Gemini chat sessions cached")
+CHAT_SESSIONS.set_function(lambda: len(_cache))
+
+
+def get_session_cache():
+    """Get the global chat session cache instance"""
+    return _cache
+
+
+def session(user_id, model):
+    """Convenience context manager for the global session cache"""
+    return _cache.session(user_id, model)
@@ -0,0 +1,138 @@
+"""
+Safe command executor for kubectl and argocd
+Commands are built as argv lists from an allow-list of verbs and resources,
+with every Slack-supplied name checked against the Kubernetes naming rules,
+so nothing ever goes through a shell. Execution is bounded: a cap on
+concurrent commands, a timeout and a cap on captured output.
+"""
+import logging
+import os
+import re
+import subprocess
+import threading
+
+import metrics
+import process_runner
+
+logger = logging.getLogger(__name__)
+
+# Executor limits
+COMMAND_TIMEOUT = float(os.getenv("COMMAND_TIMEOUT", "30"))
+COMMAND_MAX_OUTPUT = int(os.getenv("COMMAND_MAX_OUTPUT", "65536"))
+COMMAND_MAX_CONCURRENT = int(os.getenv("COMMAND_MAX_CONCURRENT", "8"))
+
+# kubectl verb -> resources it may be used with (None: the verb takes a pod name directly)
+KUBECTL_VERBS = {
+    "get": {"pods", "nodes", "services", "deployments", "namespaces"},
+    "describe": {"pod", "pods", "deployment", "service", "node"},
+    "logs": {None},
+    "rollout restart": {"deployment"},
+}
+
+# argocd app sub-commands allowed from Slack
+ARGOCD_APP_VERBS = {"get", "history", "list", "sync", "rollback"}
+
+# DNS-1123 subdomain: what Kubernetes accepts for namespace, pod and deployment names
+NAME_PATTERN = re.compile(r"^[a-z0-9]([-a-z0-9.]*[a-z0-9])?$")
+NAME_MAX_LENGTH = 253
+# History IDs, commit SHAs, tags and branches. Like NAME_PATTERN it must start with
+# a letter or digit, so no value can be parsed as a flag when passed positionally.
+REVISION_PATTERN = re.compile(r"^[A-Za-z0-9._][A-Za-z0-9._/-]{0,99}$")
+
+COMMANDS_REJECTED_TOTAL = metrics.Counter(
+    "k2sobot_commands_rejected_total", "Commands refused by validation", ["tool"])
+
+
+class CommandRejected(ValueError):
+    """Raised when a command or one of its arguments is not allowed"""
+
+
+class CommandResult:
+    """Outcome of one executed command"""
+
+    def __init__(self, argv, returncode, output, truncated=False, timed_out=False):
+        self.argv = argv
+        self.returncode = returncode
+        self.output = output
+        self.truncated = truncated
+        self.timed_out = timed_out
+
+    @property
+    def ok(self):
+        return self.returncode == 0 and not self.timed_out
+
+
+def validate_name(value, what="name"):
+    if not isinstance(value, str) or len(value) > NAME_MAX_LENGTH or not NAME_PATTERN.match(value):
+        raise CommandRejected(f"Invalid {what}: {value!r}")
+    return value
+
+
+def validate_app_name(value):
+    """Argo CD application name, optionally `namespace/name` (apps in any namespace)"""
+    parts = value.split("/") if isinstance(value, str) else [value]
+    if len(parts) > 2:
+        raise CommandRejected(f"Invalid application name: {value!r}")
+    for part in parts:
+        validate_name(part, "application name")
+    return value
+
+
+def validate_revision(value):
+    value = str(value)
+    if not REVISION_PATTERN.match(value):
+        raise CommandRejected(f"Invalid revision: {value!r}")
+    return value
+
+
+def kubectl_argv(verb, resource=None, name=None, namespace=None):
+    """Build a validated kubectl argv list"""
+    allowed = KUBECTL_VERBS.get(verb)
+    if allowed is None or resource not in allowed:
+        COMMANDS_REJECTED_TOTAL.inc(tool="kubectl")
+        raise CommandRejected(f"kubectl {verb} {resource or ''} is not allowed".replace("  ", " "))
+    try:
+        argv = ["kubectl", *verb.split()]
+        if resource:
+            argv.append(resource)
+        if name:
+            argv.append(validate_name(name, "resource name"))
+        if namespace:
+            argv += ["-n", validate_name(namespace, "namespace")]
+    except CommandRejected:
+        COMMANDS_REJECTED_TOTAL.inc(tool="kubectl")
+        raise
+    return argv
+
+
+def argocd_argv(verb, app_name=None, revision=None):
+    """Build a validated argocd app argv list"""
+    try:
+        if verb not in ARGOCD_APP_VERBS:
+            raise CommandRejected(f"argocd app {verb} is not allowed")
+        argv = ["argocd", "app", verb]
+        if app_name:
+            argv.append(validate_app_name(app_name))
+        if revision:
+            argv.append(validate_revision(revision))
+    except CommandRejected:
+        COMMANDS_REJECTED_TOTAL.inc(tool="argocd")
+        raise
+    return argv
+
+
+_slots = threading.BoundedSemaphore(COMMAND_MAX_CONCURRENT)
+
+
+def execute(argv, timeout=COMMAND_TIMEOUT, max_output=COMMAND_MAX_OUTPUT):
+    """Run argv without a shell; stdout and stderr are merged and capped at max_output bytes"""
+    if not isinstance(argv, (list, tuple)) or not argv:
+        raise CommandRejected("Commands must be argv lists")
+    with _slots:
+        try:
+            result = process_runner.run(list(argv), timeout=timeout, max_output=max_output, merge_stderr=True)
+        except subprocess.TimeoutExpired as e:
+            metrics.ERRORS_TOTAL.inc(component=argv[0])
+            return CommandResult(argv, None, e.output or "", e.truncated, timed_out=True)
+
+    return CommandResult(argv, result.returncode, result.stdout, result.truncated)
@@ -1,5 +1,15 @@
 import os
 
-SLACK_SIGNING_SECRET = os.environ['SLACK_SIGNING_SECRET']
+# "http" uses the Events API routes, "socket" uses Socket Mode (needs SLACK_APP_TOKEN)
+SLACK_TRANSPORT = os.environ.get('SLACK_TRANSPORT', 'http').lower()
+SLACK_APP_TOKEN = os.environ.get('SLACK_APP_TOKEN', '')
+
+# Request signing only applies to the HTTP transport
+SLACK_SIGNING_SECRET = os.environ['SLACK_SIGNING_SECRET'] if SLACK_TRANSPORT == 'http' else os.environ.get('SLACK_SIGNING_SECRET', '')
 SLACK_TOKEN = os.environ['SLACK_BOT_TOKEN']
-VERIFICATION_TOKEN = os.environ['VERIFICATION_TOKEN']
\ No newline at end of file
+# Slack Web API base URL; override to point at a proxy or a local fake
+SLACK_API_URL = os.environ.get('SLACK_API_URL', 'https://slack.com/api/')
+VERIFICATION_TOKEN = os.environ['VERIFICATION_TOKEN']
+
+# Bearer token for /admin endpoints; they are disabled while this is empty
+ADMIN_TOKEN = os.environ.get('K2SOBOT_ADMIN_TOKEN', '')
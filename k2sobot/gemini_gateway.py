@@ -0,0 +1,208 @@
+"""
+Gemini gateway for K2SOBot
+Every Gemini request goes through one gateway that limits concurrency, keeps
+a rolling tokens-per-minute budget and serves waiting users round-robin, so a
+chatty user cannot starve the rest. Rate-limit responses halve the allowed
+concurrency and pause dispatch with exponential backoff; successes slowly
+restore it.
+"""
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+from google.api_core.exceptions import ResourceExhausted, TooManyRequests
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Gateway configuration
+GEMINI_MAX_CONCURRENT = int(os.getenv("GEMINI_MAX_CONCURRENT", "4"))
+GEMINI_TPM_LIMIT = int(os.getenv("GEMINI_TPM_LIMIT", "250000"))
+GEMINI_QUEUE_TIMEOUT = float(os.getenv("GEMINI_QUEUE_TIMEOUT", "60"))
+GEMINI_MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "3"))
+GEMINI_BACKOFF_MAX = float(os.getenv("GEMINI_BACKOFF_MAX", "60"))
+
+# Consecutive successes needed to raise the concurrency limit by one
+RECOVERY_SUCCESSES = 5
+TPM_WINDOW = 60.0
+RATE_LIMIT_ERRORS = (ResourceExhausted, TooManyRequests)
+
+GEMINI_QUEUE_WAIT_SECONDS = metrics.Histogram(
+    "k2sobot_gemini_queue_wait_seconds", "Time Gemini requests wait in the gateway queue")
+GEMINI_RATE_LIMITED_TOTAL = metrics.Counter(
+    "k2sobot_gemini_rate_limited_total", "Gemini rate-limit responses")
+GEMINI_REJECTED_TOTAL = metrics.Counter(
+    "k2sobot_gemini_rejected_total", "Gemini requests that gave up waiting in the queue")
+GEMINI_TOKENS_TOTAL = metrics.Counter(
+    "k2sobot_gemini_tokens_total", "Gemini tokens used")
+GEMINI_CONCURRENCY_LIMIT = metrics.Gauge(
+    "k2sobot_gemini_concurrency_limit", "Current adaptive Gemini concurrency limit")
+
+
+class GatewayBusy(Exception):
+    """Raised when a request waited longer than GEMINI_QUEUE_TIMEOUT for a slot"""
+
+
+class _Ticket:
+    def __init__(self, user_id, estimated_tokens):
+        self.user_id = user_id
+        self.estimated_tokens = estimated_tokens
+        self.enqueued = time.monotonic()
+        self.granted = threading.Event()
+        # [admitted_at, tokens] entry in the rolling TPM window
+        self.usage = None
+
+
+class GeminiGateway:
+    """Fair, rate-aware admission control for Gemini calls"""
+
+    def __init__(self, max_concurrent=GEMINI_MAX_CONCURRENT, tpm_limit=GEMINI_TPM_LIMIT):
+        self.max_concurrent = max_concurrent
+        self.limit = max_concurrent
+        self.tpm_limit = tpm_limit
+        self._lock = threading.Lock()
+        self._queues = OrderedDict()
+        self._in_flight = 0
+        self._tokens = deque()
+        self._paused_until = 0.0
+        self._backoff = 1.0
+        self._successes = 0
+        self._timer = None
+        GEMINI_CONCURRENCY_LIMIT.set(self.limit)
+
+    def queue_depth(self):
+        return sum(len(queue) for queue in list(self._queues.values()))
+
+    def call(self, fn, user_id=None, estimated_tokens=1000):
+        """Run fn() once admitted; retries rate-limit errors with backoff"""
+        for attempt in range(GEMINI_MAX_RETRIES + 1):
+            ticket = self._acquire(user_id, estimated_tokens)
+            try:
+                response = fn()
+            except RATE_LIMIT_ERRORS as e:
+                # Pause before freeing the slot so nothing else is admitted meanwhile
+                self._rate_limited()
+                self._release(ticket, 0)
+                if attempt == GEMINI_MAX_RETRIES:
+                    raise
+                logger.warning(f"⚠️ Gemini rate limited (attempt {attempt + 1}): {e}")
+                continue
+            except Exception:
+                self._release(ticket, estimated_tokens)
+                raise
+            self._release(ticket, _tokens_used(response, estimated_tokens), success=True)
+            return response
+
+    def _acquire(self, user_id, estimated_tokens):
+        ticket = _Ticket(user_id or "anonymous", estimated_tokens)
+        with self._lock:
+            self._queues.setdefault(ticket.user_id, deque()).append(ticket)
+            self._dispatch()
+
+        if not ticket.granted.wait(GEMINI_QUEUE_TIMEOUT):
+            with self._lock:
+                queue = self._queues.get(ticket.user_id)
+                if queue is not None and ticket in queue:
+                    queue.remove(ticket)
+                    if not queue:
+                        del self._queues[ticket.user_id]
+                    GEMINI_REJECTED_TOTAL.inc()
+                    raise GatewayBusy(f"Gemini is busy, waited {GEMINI_QUEUE_TIMEOUT:g}s for a slot")
+            # Granted between the timeout and taking the lock
+
+        GEMINI_QUEUE_WAIT_SECONDS.observe(time.monotonic() - ticket.enqueued)
+        return ticket
+
+    def _dispatch(self):
+        """Admit waiting tickets round-robin across users; called with the lock held"""
+        now = time.monotonic()
+        while self._tokens and now - self._tokens[0][0] > TPM_WINDOW:
+            self._tokens.popleft()
+
+        while self._queues and self._in_flight < self.limit:
+            if now < self._paused_until:
+                self._wake_at(self._paused_until)
+                return
+            user_id, queue = next(iter(self._queues.items()))
+            ticket = queue[0]
+            if self.tpm_limit and self._tokens:
+                used = sum(tokens for _, tokens in self._tokens)
+                if used + ticket.estimated_tokens > self.tpm_limit:
+                    self._wake_at(self._tokens[0][0] + TPM_WINDOW)
+                    return
+            queue.popleft()
+            # Served users go to the back of the rotation
+            del self._queues[user_id]
+            if queue:
+                self._queues[user_id] = queue
+            self._in_flight += 1
+            ticket.usage = [now, ticket.estimated_tokens]
+            self._tokens.append(ticket.usage)
+            ticket.granted.set()
+
+    def _wake_at(self, when):
+        if self._timer is not None:
+            return
+
+        def wake():
+            with self._lock:
+                self._timer = None
+                self._dispatch()
+
+        self._timer = threading.Timer(max(when - time.monotonic(), 0.01), wake)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _release(self, ticket, tokens_used, success=False):
+        with self._lock:
+            self._in_flight -= 1
+            # Replace the admission estimate with what the call actually used
+            ticket.usage[1] = tokens_used
+            if success:
+                GEMINI_TOKENS_TOTAL.inc(tokens_used)
+                self._backoff = max(1.0, self._backoff / 2)
+                self._successes += 1
+                if self._successes >= RECOVERY_SUCCESSES and self.limit < self.max_concurrent:
+                    self._successes = 0
+                    self.limit += 1
+                    GEMINI_CONCURRENCY_LIMIT.set(self.limit)
+            self._dispatch()
+
+    def _rate_limited(self):
+        GEMINI_RATE_LIMITED_TOTAL.inc()
+        with self._lock:
+            self._successes = 0
+            self.limit = max(1, self.limit // 2)
+            GEMINI_CONCURRENCY_LIMIT.set(self.limit)
+            self._paused_until = max(self._paused_until, time.monotonic() + self._backoff)
+            logger.warning(f"⏸️ Gemini paused {self._backoff:g}s, concurrency limit now {self.limit}")
+            self._backoff = min(self._backoff * 2, GEMINI_BACKOFF_MAX)
+
+
+def _tokens_used(response, default):
+    usage = getattr(response, "usage_metadata", None)
+    return getattr(usage, "total_token_count", 0) or default
+
+
+def estimate_tokens(*texts):
+    """Rough admission estimate: four characters per token plus room for the reply"""
+    return sum(len(str(text)) for text in texts) // 4 + 500
+
+
+# Global gateway instance
+_gateway = GeminiGateway()
+metrics.QUEUE_DEPTH.set_function(_gateway.queue_depth, queue="gemini")
+
+
+def get_gemini_gateway():
+    """Get the global Gemini gateway instance"""
+    return _gateway
+
+
+def send_message(chat, content, user_id=None):
+    """Send a chat message through the global gateway"""
+    return _gateway.call(
+        lambda: chat.send_message(content), user_id=user_id, estimated_tokens=estimate_tokens(content))
@@ -1,16 +1,37 @@
+import datetime
 import os
 import logging
+import threading
+import time
 import google.generativeai as genai
+from google.generativeai import caching
 from google.generativeai.types import content_types
 
 # Import tool registry for automatic tool discovery
 from tools.registry import discover_and_get_tools, get_function_map, execute_tool
 from system_prompt import get_system_prompt
+import chat_sessions
+import gemini_gateway
+import intent_router
+import metrics
+import tool_output
+import tracing
 
 logger = logging.getLogger(__name__)
 
+GEMINI_MODEL = 'gemini-2.5-flash-lite'
+
+# Cache the system prompt and tool declarations server-side where the API allows it
+GEMINI_CONTEXT_CACHE = os.getenv("GEMINI_CONTEXT_CACHE", "false").lower() == "true"
+GEMINI_CONTEXT_CACHE_TTL = int(os.getenv("GEMINI_CONTEXT_CACHE_TTL", "3600"))
+# Alternative API endpoint (REST transport), e.g. a proxy or testing/fake_gemini.py
+GEMINI_API_ENDPOINT = os.getenv("GEMINI_API_ENDPOINT", "")
+
 # Configure once at module level
 _model = None
+_model_expires_at = 0.0
+_model_lock = threading.Lock()
+_tools = None
 
 def is_gemini_available():
     """Check if Gemini API key is configured"""
@@ -19,29 +40,76 @@ def is_gemini_available():
 
 def get_gemini_model_with_tools():
     """Get or create Gemini model instance with tools"""
-    global _model
-    if _model is None:
+    global _model, _model_expires_at
+    if _model is not None and time.monotonic() < _model_expires_at:
+        return _model
+
+    with _model_lock:
+        if _model is not None and time.monotonic() < _model_expires_at:
+            return _model
+
         api_key = os.environ.get('GEMINI_API_KEY')
         if not api_key:
             raise ValueError("GEMINI_API_KEY environment variable is not set")
         
-        genai.configure(api_key=api_key)
+        if GEMINI_API_ENDPOINT:
+            genai.configure(api_key=api_key, transport="rest", client_options={"api_endpoint": GEMINI_API_ENDPOINT})
+        else:
+            genai.configure(api_key=api_key)
         
-        # Automatically discover all available tools
-        tools = discover_and_get_tools()
+        tools = _discover_tools()
 
         # Get system prompt
         system_prompt = get_system_prompt()
 
-        _model = genai.GenerativeModel(
-            'gemini-2.5-flash-lite',
-            tools=tools,
-            system_instruction=system_prompt
-        )
+        _model = _create_cached_model(tools, system_prompt) if GEMINI_CONTEXT_CACHE else None
+        if _model is None:
+            _model = genai.GenerativeModel(
+                GEMINI_MODEL,
+                tools=tools,
+                system_instruction=system_prompt
+            )
+            _model_expires_at = float("inf")
         logger.info(f"✅ Initialized Gemini with {len(tools)} tools and system prompt")
     
     return _model
 
+def get_tools():
+    """Tool declarations, discovered once and shared by the model and the intent router"""
+    if _tools is None:
+        with _model_lock:
+            _discover_tools()
+    return _tools
+
+def _discover_tools():
+    """Called with _model_lock held"""
+    global _tools
+    if _tools is None:
+        # Automatically discover all available tools
+        _tools = discover_and_get_tools()
+    return _tools
+
+def _create_cached_model(tools, system_prompt):
+    """Model backed by a server-side cache of the system prompt and tool schemas, or None if unsupported"""
+    global _model_expires_at
+    try:
+        cache = caching.CachedContent.create(
+            model=f"models/{GEMINI_MODEL}",
+            display_name="k2sobot-system",
+            system_instruction=system_prompt,
+            tools=tools,
+            ttl=datetime.timedelta(seconds=GEMINI_CONTEXT_CACHE_TTL),
+        )
+    except Exception as e:
+        # Caching has a minimum token count and is not offered for every model
+        logger.warning(f"⚠️ Gemini context caching unavailable, sending the prompt with every request: {e}")
+        return None
+
+    # Rebuild a little before the cache expires; cached sessions follow the new model
+    _model_expires_at = time.monotonic() + GEMINI_CONTEXT_CACHE_TTL - 60
+    logger.info(f"✅ Cached Gemini system prompt and tools as {cache.name}")
+    return genai.GenerativeModel.from_cached_content(cached_content=cache)
+
 def execute_function_call(function_call):
     """Execute the function that Gemini wants to call"""
     function_name = function_call.name
@@ -50,121 +118,70 @@ def execute_function_call(function_call):
     logger.info(f"🔧 {function_name}({function_args})")
 
     # Use the registry to execute the tool
-    return execute_tool(function_name, **function_args)
+    with metrics.TOOL_EXECUTION_SECONDS.time(tool=function_name):
+        return execute_tool(function_name, **function_args)
     
+def function_response_content(function_name, result):
+    """Wrap a tool result as the function_response content Gemini expects"""
+    # Ensure result is properly formatted for Gemini API
+    # If result is a list, convert it to a dict with a meaningful key
+    if isinstance(result, list):
+        formatted_result = {"items": result}
+    elif not isinstance(result, dict):
+        # For strings, numbers, etc., wrap in a dict
+        formatted_result = {"value": result}
+    else:
+        # Already a dict, use as-is
+        formatted_result = result
+
+    return content_types.to_content({
+        "parts": [{
+            "function_response": {
+                "name": function_name,
+                "response": formatted_result
+            }
+        }]
+    })
+
+@tracing.traced("chat_with_gemini")
 def chat_with_gemini(user_message, user_id=None, max_tokens=1000):
     """Chat with Gemini using native function calling with conversation history"""
     try:
         if not is_gemini_available():
             return "Gemini API key is not configured. Please set GEMINI_API_KEY environment variable."
 
-        model = get_gemini_model_with_tools()
-
-        # Get conversation history if user_id is provided
-        history = []
-        if user_id:
-            from shared_state import get_conversation_history
-            history = get_conversation_history(user_id)
-
-        chat = model.start_chat(history=history)
-
-        logger.info(f"📝 User message: {user_message}")
-
-        # Send user message
-        response = chat.send_message(user_message)
-        
-        # Check if Gemini wants to call a function
-        function_calls = []
-        for part in response.parts:
-            if fn := part.function_call:
-                function_calls.append(fn)
-        
-        if function_calls:
-            # Execute all function calls
-            for function_call in function_calls:
-                function_name = function_call.name
-                
-                # Execute the function
-                result = execute_function_call(function_call)
-                
-                logger.info(f"✅ Function result: {result}")
-
-                # Ensure result is properly formatted for Gemini API
-                # If result is a list, convert it to a dict with a meaningful key
-                if isinstance(result, list):
-                    formatted_result = {"items": result}
-                elif not isinstance(result, dict):
-                    # For strings, numbers, etc., wrap in a dict
-                    formatted_result = {"value": result}
-                else:
-                    # Already a dict, use as-is
-                    formatted_result = result
-
-                # Send result back to Gemini for formatting
-                response = chat.send_message(
-                    content_types.to_content({
-                        "parts": [{
-                            "function_response": {
-                                "name": function_name,
-                                "response": formatted_result
-                            }
-                        }]
-                    })
-                )
-                
-                # Add tool footer
-                try:
-                    final_response = response.text
-                    if "_🔧 Tool used:" not in final_response:
-                        final_response += f"\n\n_🔧 Tool used: `{function_name}`_"
-
-                    # Save conversation history
-                    if user_id:
-                        from shared_state import add_to_conversation_history
-                        add_to_conversation_history(user_id, "user", user_message)
-                        add_to_conversation_history(user_id, "model", final_response)
-
-                    return final_response
-                except Exception as e:
-                    logger.warning(f"Could not get response.text: {e}")
-                    # Fallback to a formatted response using the tool's output
-                    if isinstance(result, dict) and "output" in result:
-                        fallback_response = f"{result['output']}\n\n_🔧 Tool used: `{function_name}`_"
-                    else:
-                        fallback_response = f"Here's the result:\n\n{result}\n\n_🔧 Tool used: `{function_name}`_"
-
-                    # Save conversation history
-                    if user_id:
-                        from shared_state import add_to_conversation_history
-                        add_to_conversation_history(user_id, "user", user_message)
-                        add_to_conversation_history(user_id, "model", fallback_response)
-
-                    return fallback_response
-
-        # No function call, just return text
-        try:
-            final_response = response.text
-
-            # Save conversation history
+        # Obvious single-tool requests are answered without a model round trip
+        get_tools()
+        routed = intent_router.route(user_message)
+        if routed is not None:
             if user_id:
                 from shared_state import add_to_conversation_history
                 add_to_conversation_history(user_id, "user", user_message)
-                add_to_conversation_history(user_id, "model", final_response)
+                add_to_conversation_history(user_id, "model", routed)
+                # The live session lacks this exchange; rebuild it from history next turn
+                chat_sessions.get_session_cache().invalidate(user_id)
+            return routed
 
-            return final_response
-        except Exception as e:
-            logger.warning(f"Could not get response.text for direct response: {e}")
-            fallback_response = "I understand your request but couldn't generate a proper response. Please try rephrasing your question."
+        model = get_gemini_model_with_tools()
 
-            # Save conversation history
-            if user_id:
-                from shared_state import add_to_conversation_history
-                add_to_conversation_history(user_id, "user", user_message)
-                add_to_conversation_history(user_id, "model", fallback_response)
+        started = time.monotonic()
+        # Reuse the user's live session; anonymous calls get a throwaway one
+        if user_id:
+            with chat_sessions.session(user_id, model) as chat:
+                response = _run_turn(chat, user_message, user_id)
+        else:
+            response = _run_turn(model.start_chat(history=[]), user_message, user_id)
+        intent_router.observe_model_turn(time.monotonic() - started)
+        return response
+
+    except (gemini_gateway.GatewayBusy,) + gemini_gateway.RATE_LIMIT_ERRORS as e:
+        metrics.ERRORS_TOTAL.inc(component="gemini")
+        logger.warning(f"⚠️ Gemini unavailable: {e}")
+        # Not saved to history: the question was never answered
+        return "⏳ I'm handling a lot of requests right now. Please try again in a minute."
 
-            return fallback_response
-        
     except Exception as e:
+        metrics.ERRORS_TOTAL.inc(component="gemini")
         logger.error(f"Error communicating with Gemini: {e}", exc_info=True)
         error_response = f"Sorry, I encountered an error: {str(e)}"
 
@@ -174,4 +191,99 @@ def chat_with_gemini(user_message, user_id=None, max_tokens=1000):
             add_to_conversation_history(user_id, "user", user_message)
             add_to_conversation_history(user_id, "model", error_response)
 
-        return error_response
\ No newline at end of file
+        return error_response
+
+
+def _discard_session(user_id):
+    """Rebuild the user's session from text history next turn instead of reusing a broken one"""
+    if user_id:
+        chat_sessions.get_session_cache().invalidate(user_id)
+
+
+def _run_turn(chat, user_message, user_id):
+    """Send one user message on a chat session, executing any function calls it triggers"""
+    logger.info(f"📝 User message: {user_message}")
+
+    # Send user message
+    with tracing.span("gemini send_message"), metrics.GEMINI_REQUEST_SECONDS.time():
+        response = gemini_gateway.send_message(chat, user_message, user_id=user_id)
+    
+    # Check if Gemini wants to call a function
+    function_calls = []
+    for part in response.parts:
+        if fn := part.function_call:
+            function_calls.append(fn)
+    
+    if function_calls:
+        # Execute all function calls
+        for function_call in function_calls:
+            function_name = function_call.name
+            
+            # Execute the function
+            result = execute_function_call(function_call)
+            result = tool_output.cap_tool_output(function_name, result)
+
+            # Full results only at DEBUG, formatted lazily; the handler caps their size
+            logger.info(f"✅ Function result from {function_name}")
+            logger.debug("✅ Function result: %s", result)
+
+            # Send result back to Gemini for formatting
+            with tracing.span("gemini send_message"), metrics.GEMINI_REQUEST_SECONDS.time():
+                response = gemini_gateway.send_message(
+                    chat, function_response_content(function_name, result), user_id=user_id)
+            
+            # Add tool footer
+            try:
+                final_response = response.text
+                if "_🔧 Tool used:" not in final_response:
+                    final_response += f"\n\n_🔧 Tool used: `{function_name}`_"
+
+                # Save conversation history
+                if user_id:
+                    from shared_state import add_to_conversation_history
+                    add_to_conversation_history(user_id, "user", user_message)
+                    add_to_conversation_history(user_id, "model", final_response)
+
+                return final_response
+            except Exception as e:
+                logger.warning(f"Could not get response.text: {e}")
+                # The live session may now end on an unanswered function call
+                _discard_session(user_id)
+                # Fallback to a formatted response using the tool's output
+                if isinstance(result, dict) and "output" in result:
+                    fallback_response = f"{result['output']}\n\n_🔧 Tool used: `{function_name}`_"
+                else:
+                    fallback_response = f"Here's the result:\n\n{result}\n\n_🔧 Tool used: `{function_name}`_"
+
+                # Save conversation history
+                if user_id:
+                    from shared_state import add_to_conversation_history
+                    add_to_conversation_history(user_id, "user", user_message)
+                    add_to_conversation_history(user_id, "model", fallback_response)
+
+                return fallback_response
+
+    # No function call, just return text
+    try:
+        final_response = response.text
+
+        # Save conversation history
+        if user_id:
+            from shared_state import add_to_conversation_history
+            add_to_conversation_history(user_id, "user", user_message)
+            add_to_conversation_history(user_id, "model", final_response)
+
+        return final_response
+    except Exception as e:
+        logger.warning(f"Could not get response.text for direct response: {e}")
+        _discard_session(user_id)
+        fallback_response = "I understand your request but couldn't generate a proper response. Please try rephrasing your question."
+
+        # Save conversation history
+        if user_id:
+            from shared_state import add_to_conversation_history
+            add_to_conversation_history(user_id, "user", user_message)
+            add_to_conversation_history(user_id, "model", fallback_response)
+
+        return fallback_response
+    
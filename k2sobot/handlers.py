@@ -1,16 +1,27 @@
 import json
 import os
 import subprocess
-from threading import Thread
 from flask import Flask, Response, request
 from slack_sdk import WebClient
 from slackeventsapi import SlackEventAdapter
 import slack_blocks
 import logging
-import k8s, argo, shared_state as shared
+import command_executor, k8s, argo, jobs, rollout_watch, shared_state as shared
+from resource_index import get_resource_cache
 
 
 
+def run_kubectl(channel_id, verb, resource=None, name=None, namespace=None):
+    """Validate a menu selection into a kubectl argv list and run it"""
+    try:
+        argv = command_executor.kubectl_argv(verb, resource, name, namespace)
+    except command_executor.CommandRejected as e:
+        logging.warning(f"⚠️ Rejected kubectl command from {channel_id}: {e}")
+        shared.slack_client.chat_postMessage(channel=channel_id, text=f"❌ {e}")
+        return False
+    return k8s.run_kubectl_command(channel_id, argv)
+
+
 def handle_kubectl_command_select(payload, channel_id):
     selected_command = payload["actions"][0]["selected_option"]["value"]
     shared.selected_actions[channel_id] = {"command": selected_command}
@@ -27,8 +38,12 @@ def handle_kubectl_sub_command_select(payload, channel_id):
 
     if selected_command == "argo":
         handle_argo_sub_command_select(payload, channel_id)
+    elif selected_sub_command == "unhealthy pods":
+        # Cluster-wide query, no namespace to pick
+        k8s.run_batch_pod_query(channel_id)
     else:
         available_namespaces = k8s.get_available_namespaces()
+        get_resource_cache().put("namespaces", "", available_namespaces)
         namespaces_menu = slack_blocks.build_namesapces_block(available_namespaces)
         shared.slack_client.chat_postMessage(channel=channel_id, blocks=namespaces_menu["blocks"])
 
@@ -43,15 +58,16 @@ def handle_kubectl_namespace_select(payload, channel_id):
 
     if selected_command in ["describe", "logs"] and selected_sub_command == "pods":
         available_pods = k8s.get_available_pods(selected_namespace)
-        pods_menu = slack_blocks.build_pod_command_block(available_pods)
+        get_resource_cache().put("pods", selected_namespace, available_pods)
+        pods_menu = slack_blocks.build_pod_command_block(available_pods, selected_namespace)
         shared.slack_client.chat_postMessage(channel=channel_id, blocks=pods_menu["blocks"])
     elif selected_command in ["rollout restart"] and selected_sub_command == "deployments":
         available_deployments = k8s.get_deployments(selected_namespace)
-        deployments_menu = slack_blocks.build_deployments_command_block(available_deployments)
+        get_resource_cache().put("deployments", selected_namespace, available_deployments)
+        deployments_menu = slack_blocks.build_deployments_command_block(available_deployments, selected_namespace)
         shared.slack_client.chat_postMessage(channel=channel_id, blocks=deployments_menu["blocks"])
     else:
-        command = f"kubectl {selected_command} {selected_sub_command} -n {selected_namespace}"
-        k8s.run_kubectl_command(channel_id, command)
+        run_kubectl(channel_id, selected_command, selected_sub_command, namespace=selected_namespace)
 
 
 def handle_kubectl_pod_select(payload, channel_id):
@@ -60,10 +76,9 @@ def handle_kubectl_pod_select(payload, channel_id):
     selected_command = shared.selected_actions.get(channel_id, {}).get("command")
     if selected_namespace:
         if selected_command in ["logs"]:
-            command = f"kubectl {selected_command} {selected_pod} -n {selected_namespace}"
+            run_kubectl(channel_id, selected_command, name=selected_pod, namespace=selected_namespace)
         else:
-            command = f"kubectl {selected_command} pod {selected_pod} -n {selected_namespace}"
-        k8s.run_kubectl_command(channel_id, command)
+            run_kubectl(channel_id, selected_command, "pod", selected_pod, selected_namespace)
     else:
         shared.slack_client.chat_postMessage(channel=channel_id, text="Namespace not selected. Please start over.")
 
@@ -74,8 +89,9 @@ def handle_kubectl_deployment_select(payload, channel_id):
     selected_command = shared.selected_actions.get(channel_id, {}).get("command")
 
     if selected_namespace:
-        command = f"kubectl {selected_command} deployment {selected_deployment} -n {selected_namespace}"
-        k8s.run_kubectl_command(channel_id, command)
+        succeeded = run_kubectl(channel_id, selected_command, "deployment", selected_deployment, selected_namespace)
+        if succeeded and selected_command == "rollout restart":
+            rollout_watch.watch_deployment(channel_id, selected_namespace, selected_deployment)
     else:
         shared.slack_client.chat_postMessage(channel=channel_id, text="Namespace not selected. Please start over.")
 
@@ -124,14 +140,50 @@ def handle_argo_revision_select(payload, channel_id):
     selected_sub_command = shared.selected_actions.get(channel_id, {}).get("sub_command")
 
     if selected_command == "argo" and selected_sub_command == "rollback" and selected_app:
-        # Send immediate acknowledgment
-        shared.slack_client.chat_postMessage(
-            channel=channel_id,
-            text=f"🔄 Initiating rollback for `{selected_app}` to revision `{selected_revision}`...\nPlease wait, this may take a few moments."
-        )
-
-        # Perform rollback in a separate thread to avoid Slack timeout
-        thread = Thread(target=argo.rollback_argo_application, args=(channel_id, selected_app, selected_revision))
-        thread.start()
+        def run_rollback():
+            # Watch from the moment this job actually starts, not while it waits its turn
+            watch = rollout_watch.watch_application(
+                channel_id, selected_app, title=f"Rollback of `{selected_app}` to revision `{selected_revision}`")
+            # An auth failure comes back as an error string rather than False
+            succeeded = argo.rollback_argo_application(channel_id, selected_app, selected_revision)
+            if succeeded is not True:
+                watch.cancel(succeeded or "rollback did not complete")
+                raise jobs.JobFailed(succeeded or "rollback did not complete")
+
+        job, coalesced = jobs.submit(
+            selected_app, "rollback", run_rollback, revision=selected_revision, requested_by=payload.get("user", {}).get("id"))
+        if coalesced:
+            shared.slack_client.chat_postMessage(
+                channel=channel_id,
+                text=f"🔁 An identical rollback is already {job.status} for `{selected_app}` (job `{job.id}`), not starting another one.",
+                coalesce=True
+            )
+        else:
+            ahead = jobs.get_job_queue().position(job)
+            queued = f"\n{ahead} job(s) ahead of it." if job.status == "queued" and ahead else ""
+            shared.slack_client.chat_postMessage(
+                channel=channel_id,
+                text=f"🔄 Rollback of `{selected_app}` to revision `{selected_revision}` queued as job `{job.id}`...{queued}\nPlease wait, this may take a few moments.",
+                coalesce=True
+            )
     else:
         shared.slack_client.chat_postMessage(channel=channel_id, text="Invalid rollback sequence. Please start over.")
+
+
+
+# external_select action_id -> resource kind served by the options endpoint
+OPTIONS_RESOURCE_KINDS = {
+    "kubectl_namespace_select": "namespaces",
+    "kubectl_pod_select": "pods",
+    "kubectl_deployment_select": "deployments",
+}
+
+
+def handle_block_suggestion(payload):
+    """Typeahead results for an external_select menu"""
+    kind = OPTIONS_RESOURCE_KINDS.get(payload.get("action_id"))
+    if kind is None:
+        return {"options": []}
+    _, _, namespace = payload.get("block_id", "").partition(":")
+    names, total = get_resource_cache().search(kind, namespace, payload.get("value", ""), limit=slack_blocks.STATIC_SELECT_LIMIT)
+    return slack_blocks.build_options_response(names, total)
\ No newline at end of file
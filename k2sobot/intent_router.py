@@ -0,0 +1,221 @@
+"""
+Local intent router for DMs
+Requests that plainly map to one tool ("what time is it", "list namespaces",
+"tell me a joke") are answered by running the tool directly and formatting
+the result with a template, skipping both Gemini round trips. Anything that
+does not match exactly one route still goes to Gemini. Hits, misses and the
+estimated model latency saved are exported as metrics.
+"""
+import logging
+import os
+import re
+import threading
+import time
+
+import metrics
+from tools.registry import execute_tool
+
+logger = logging.getLogger(__name__)
+
+INTENT_ROUTER_ENABLED = os.getenv("INTENT_ROUTER_ENABLED", "true").lower() == "true"
+# Assumed Gemini turn latency until real turns have been measured
+INTENT_ROUTER_DEFAULT_MODEL_SECONDS = float(os.getenv("INTENT_ROUTER_DEFAULT_MODEL_SECONDS", "2.0"))
+# Longer messages almost always carry detail only the model can handle
+INTENT_ROUTER_MAX_LENGTH = 80
+
+INTENT_ROUTER_TOTAL = metrics.Counter(
+    "k2sobot_intent_router_total", "DMs seen by the intent router", ["outcome"])
+INTENT_ROUTER_HITS_TOTAL = metrics.Counter(
+    "k2sobot_intent_router_hits_total", "DMs answered without Gemini", ["tool"])
+INTENT_ROUTER_SAVED_SECONDS = metrics.Counter(
+    "k2sobot_intent_router_saved_seconds_total", "Estimated Gemini latency avoided by local answers")
+INTENT_ROUTER_SECONDS = metrics.Histogram(
+    "k2sobot_intent_router_seconds", "Time to answer a routed DM locally", ["tool"])
+
+_NAME = r"(?P<namespace>[a-z0-9]([-a-z0-9]*[a-z0-9])?)"
+# Greetings and pleasantries are only filler where they lead the message ("hi, show pods in hi"),
+# courtesies only where they end it; anywhere else they may be the namespace asked about
+_POLITE_PREFIX = re.compile(r"^((please|pls|plz|hey|hi|hello|k2so|can you|could you|would you)\s+)+")
+_POLITE_SUFFIX = re.compile(r"(\s+(please|pls|plz|thanks|thank you))+$")
+_NOISE = re.compile(r"[^\w\s'-]")
+
+
+def _format_time(result, **_):
+    return f"🕐 It's {result['full']}."
+
+
+def _format_timestamp(result, **_):
+    return f"🕐 Unix timestamp: `{result['timestamp']}`"
+
+
+def _format_joke(result, **_):
+    return f"{result['setup']}\n\n{result['punchline']}"
+
+
+def _format_list(title, empty):
+    def format_result(result, namespace=None):
+        heading = title.format(namespace=namespace)
+        if not result:
+            return empty.format(namespace=namespace)
+        return f"{heading} ({len(result)}):\n" + "\n".join(f"• `{item}`" for item in result)
+    return format_result
+
+
+def _format_president(result, **_):
+    return f"🇺🇸 {result['name']} (#{result['number']}, {result['party']}, {result['years']})"
+
+
+def _format_longest_serving(result, **_):
+    return f"🇺🇸 {result['name']} served longest: {result['years_served']} years ({result['years']}). {result['note']}."
+
+
+class Route:
+    """One intent: regexes over the normalized message, the tool it runs and how to answer"""
+
+    def __init__(self, tool, patterns, formatter, args=None):
+        self.tool = tool
+        self.patterns = [re.compile(pattern) for pattern in patterns]
+        self.formatter = formatter
+        self.args = args or (lambda match: {})
+
+    def match(self, text):
+        for pattern in self.patterns:
+            match = pattern.fullmatch(text)
+            if match:
+                return match
+        return None
+
+
+def _namespace_args(match):
+    return {"namespace": match.groupdict().get("namespace") or "default"}
+
+
+ROUTES = [
+    Route("get_current_time", [
+        r"(what|whats|what's) (is )?the (current )?(time|date)( now| today)?",
+        r"(what|whats|what's) time is it( now)?",
+        r"(current )?time",
+        r"(what|whats|what's) (day|date) is (it|today)",
+    ], _format_time),
+    Route("get_timestamp", [
+        r"(current |unix |epoch )*timestamp",
+        r"(what|whats|what's) the (current )?(unix |epoch )?timestamp",
+    ], _format_timestamp),
+    Route("get_random_joke", [
+        r"(tell|give) (me )?(a |another )?(programming |tech )?joke",
+        r"(a )?(programming |tech )?joke",
+        r"make me laugh",
+    ], _format_joke),
+    Route("get_namespaces", [
+        r"(list|show|get)( me)?( all)?( the)?( k8s| kubernetes)? namespaces",
+        r"(what|which) namespaces (are there|exist|do we have)",
+        r"kubectl get (namespaces|ns)",
+    ], _format_list("📁 Namespaces", "No namespaces found.")),
+    Route("get_pods", [
+        rf"(list|show|get)( me)?( all)?( the)? pods( in)?( the)?( namespace)? {_NAME}( namespace)?",
+        r"(list|show|get)( me)?( all)?( the)? pods",
+        rf"kubectl get pods( -n {_NAME})?",
+    ], _format_list("🐳 Pods in `{namespace}`", "No pods found in `{namespace}`."), _namespace_args),
+    Route("get_deployments", [
+        rf"(list|show|get)( me)?( all)?( the)? deployments( in)?( the)?( namespace)? {_NAME}( namespace)?",
+        r"(list|show|get)( me)?( all)?( the)? deployments",
+        rf"kubectl get deployments( -n {_NAME})?",
+    ], _format_list("🚀 Deployments in `{namespace}`", "No deployments found in `{namespace}`."), _namespace_args),
+    Route("get_applications", [
+        r"(list|show|get)( me)?( all)?( the)?( argo| argocd)? (applications|apps)",
+        r"argocd app list",
+    ], _format_list("🐙 ArgoCD applications", "No ArgoCD applications found.")),
+    Route("get_longest_serving_president", [
+        r"(who was )?(the )?longest serving (us )?president",
+    ], _format_longest_serving),
+    Route("get_president_by_year", [
+        r"who was (the )?(us )?president in (?P<year>1[7-9]\d\d|20\d\d)",
+    ], _format_president, lambda match: {"year": int(match.group("year"))}),
+]
+
+
+def normalize(text):
+    """Lowercase, drop punctuation and pleasantries, collapse whitespace"""
+    text = " ".join(_NOISE.sub(" ", text.lower()).split())
+    text = _POLITE_SUFFIX.sub("", _POLITE_PREFIX.sub("", text))
+    return text.strip(" -'")
+
+
+class IntentRouter:
+    """Matches DMs against ROUTES and answers unambiguous ones locally"""
+
+    def __init__(self, routes=ROUTES, default_model_seconds=INTENT_ROUTER_DEFAULT_MODEL_SECONDS):
+        self.routes = routes
+        self._model_seconds = default_model_seconds
+        self._lock = threading.Lock()
+
+    def match(self, message):
+        """(route, regex match) for a message matching exactly one route, else None"""
+        if len(message) > INTENT_ROUTER_MAX_LENGTH:
+            return None
+        text = normalize(message)
+        matches = [(route, m) for route in self.routes if (m := route.match(text))]
+        if len(matches) != 1:
+            return None
+        return matches[0]
+
+    def route(self, message):
+        """Answer the message locally, or return None to send it to Gemini
+
+        Tools must already be registered; gemini_integration.get_tools() loads them.
+        """
+        matched = self.match(message)
+        if matched is None:
+            INTENT_ROUTER_TOTAL.inc(outcome="miss")
+            return None
+
+        route, match = matched
+        args = route.args(match)
+        started = time.monotonic()
+        try:
+            with metrics.TOOL_EXECUTION_SECONDS.time(tool=route.tool):
+                result = execute_tool(route.tool, **args)
+            if isinstance(result, dict) and "error" in result:
+                raise RuntimeError(result["error"])
+            if isinstance(result, str) and result.startswith("Error"):
+                raise RuntimeError(result)
+            answer = route.formatter(result, **args)
+        except Exception as e:
+            # Let Gemini explain failures instead of templating them
+            logger.warning(f"⚠️ Intent router fell back to Gemini for {route.tool}: {e}")
+            INTENT_ROUTER_TOTAL.inc(outcome="error")
+            return None
+
+        elapsed = time.monotonic() - started
+        INTENT_ROUTER_TOTAL.inc(outcome="hit")
+        INTENT_ROUTER_HITS_TOTAL.inc(tool=route.tool)
+        INTENT_ROUTER_SECONDS.observe(elapsed, tool=route.tool)
+        INTENT_ROUTER_SAVED_SECONDS.inc(max(self._model_seconds - elapsed, 0))
+        logger.info(f"⚡ Answered locally with {route.tool} in {elapsed * 1000:.0f}ms")
+        return f"{answer}\n\n_🔧 Tool used: `{route.tool}`_"
+
+    def observe_model_turn(self, seconds):
+        """Feed a measured Gemini turn into the latency-saved estimate"""
+        with self._lock:
+            self._model_seconds += 0.1 * (seconds - self._model_seconds)
+
+
+# Global router instance
+_router = IntentRouter()
+
+
+def get_intent_router():
+    """Get the global intent router instance"""
+    return _router
+
+
+def route(message):
+    """Convenience function to route a message with the global router"""
+    if not INTENT_ROUTER_ENABLED:
+        return None
+    return _router.route(message)
+
+
+def observe_model_turn(seconds):
+    """Convenience function to record a Gemini turn latency"""
+    _router.observe_model_turn(seconds)
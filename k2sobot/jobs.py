@@ -0,0 +1,170 @@
+"""
+Mutation job queue for ArgoCD operations
+Rollbacks and syncs run as jobs: at most one at a time per application, at
+most ARGO_MAX_CONCURRENT_JOBS overall, and a request identical to a queued or
+running job (same app, action and revision) joins that job instead of
+starting another one.
+"""
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Job queue configuration
+ARGO_MAX_CONCURRENT_JOBS = int(os.getenv("ARGO_MAX_CONCURRENT_JOBS", "2"))
+# Finished jobs kept for status queries
+JOB_HISTORY_SIZE = int(os.getenv("JOB_HISTORY_SIZE", "50"))
+
+JOBS_TOTAL = metrics.Counter(
+    "k2sobot_jobs_total", "Mutation jobs by final status", ["action", "status"])
+JOBS_COALESCED_TOTAL = metrics.Counter(
+    "k2sobot_jobs_coalesced_total", "Requests merged into an identical queued or running job", ["action"])
+JOB_WAIT_SECONDS = metrics.Histogram(
+    "k2sobot_job_wait_seconds", "Time jobs spend queued before running", ["action"])
+
+
+class JobFailed(Exception):
+    """Raised by a job function whose operation failed in an expected way (no traceback logged)"""
+
+
+class Job:
+    """One queued mutation against an application"""
+
+    def __init__(self, app, action, revision, fn, requested_by):
+        self.id = uuid.uuid4().hex[:8]
+        self.app = app
+        self.action = action
+        self.revision = revision
+        self.fn = fn
+        self.requested_by = [requested_by] if requested_by else []
+        self.status = "queued"
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.future = Future()
+
+    @property
+    def key(self):
+        return (self.app, self.action, self.revision)
+
+    def describe(self):
+        """One-line status for Slack and the LLM"""
+        target = f"{self.action} `{self.app}`" + (f" to `{self.revision}`" if self.revision else "")
+        line = f"Job {self.id}: {target} is {self.status}"
+        if self.finished and self.started:
+            line += f" ({self.finished - self.started:.0f}s)"
+        if self.error:
+            line += f": {self.error}"
+        return line
+
+
+class JobQueue:
+    """FIFO job scheduler with per-app mutual exclusion and a global cap"""
+
+    def __init__(self, max_concurrent=ARGO_MAX_CONCURRENT_JOBS, history_size=JOB_HISTORY_SIZE):
+        self.max_concurrent = max_concurrent
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix="argo-job")
+        self._lock = threading.Lock()
+        self._pending = deque()
+        self._running = {}
+        self._active = {}
+        self._history = deque(maxlen=history_size)
+
+    def queue_depth(self):
+        return len(self._pending)
+
+    def submit(self, app, action, fn, revision=None, requested_by=None):
+        """Queue fn() as a job; returns (job, coalesced)"""
+        with self._lock:
+            job = self._active.get((app, action, revision))
+            if job is not None:
+                if requested_by and requested_by not in job.requested_by:
+                    job.requested_by.append(requested_by)
+                JOBS_COALESCED_TOTAL.inc(action=action)
+                logger.info(f"🔁 Joined existing {action} job {job.id} for {app}")
+                return job, True
+
+            job = Job(app, action, revision, fn, requested_by)
+            self._active[job.key] = job
+            self._pending.append(job)
+            logger.info(f"📥 Queued {action} job {job.id} for {app}")
+            self._schedule()
+        return job, False
+
+    def position(self, job):
+        """Number of jobs ahead of a queued job"""
+        with self._lock:
+            try:
+                return self._pending.index(job)
+            except ValueError:
+                return 0
+
+    def get(self, job_id):
+        with self._lock:
+            for job in list(self._active.values()) + list(self._history):
+                if job.id == job_id:
+                    return job
+        return None
+
+    def list_jobs(self, app=None):
+        """Active jobs first, then recent history, newest first"""
+        with self._lock:
+            jobs = list(self._active.values()) + list(reversed(self._history))
+        return [job for job in jobs if app is None or job.app == app]
+
+    def _schedule(self):
+        """Start every pending job whose app is idle, up to the cap; called with the lock held"""
+        for job in list(self._pending):
+            if len(self._running) >= self.max_concurrent:
+                break
+            if job.app in self._running:
+                continue
+            self._pending.remove(job)
+            self._running[job.app] = job
+            job.status = "running"
+            job.started = time.time()
+            JOB_WAIT_SECONDS.observe(job.started - job.created, action=job.action)
+            self._executor.submit(self._run, job)
+
+    def _run(self, job):
+        try:
+            result = job.fn()
+            job.status = "succeeded"
+            job.future.set_result(result)
+        except Exception as e:
+            metrics.ERRORS_TOTAL.inc(component="jobs")
+            logger.error(f"❌ Job {job.id} ({job.action} {job.app}) failed: {e}", exc_info=not isinstance(e, JobFailed))
+            job.status = "failed"
+            job.error = str(e)
+            job.future.set_exception(e)
+        finally:
+            job.finished = time.time()
+            JOBS_TOTAL.inc(action=job.action, status=job.status)
+            with self._lock:
+                self._running.pop(job.app, None)
+                self._active.pop(job.key, None)
+                self._history.append(job)
+                self._schedule()
+
+
+# Global job queue instance
+_queue = JobQueue()
+metrics.QUEUE_DEPTH.set_function(_queue.queue_depth, queue="argo_jobs")
+
+
+def get_job_queue():
+    """Get the global job queue instance"""
+    return _queue
+
+
+def submit(app, action, fn, revision=None, requested_by=None):
+    """Convenience function to queue a job on the global queue"""
+    return _queue.submit(app, action, fn, revision=revision, requested_by=requested_by)
@@ -1,3 +1,4 @@
+import contextvars
 import json
 import os
 import subprocess
@@ -7,58 +8,334 @@ from slack_sdk import WebClient
 from slackeventsapi import SlackEventAdapter
 import slack_blocks
 import logging
-import k8s, shared_state as shared
+import command_executor, metrics, process_runner, tracing, shared_state as shared
+import re
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
+# Batch query fan-out limits
+K8S_FANOUT_CONCURRENCY = int(os.getenv("K8S_FANOUT_CONCURRENCY", "8"))
+K8S_FANOUT_TIMEOUT = float(os.getenv("K8S_FANOUT_TIMEOUT", "15"))
+
+# Log search bounds: matches kept per pod and pods searched per query
+K8S_LOG_SEARCH_MAX_PER_POD = int(os.getenv("K8S_LOG_SEARCH_MAX_PER_POD", "20"))
+K8S_LOG_SEARCH_MAX_PODS = int(os.getenv("K8S_LOG_SEARCH_MAX_PODS", "100"))
+
+# Pod phases that count as healthy
+HEALTHY_PHASES = {"Running", "Succeeded"}
+
+@tracing.traced("kubectl get namespaces")
+@metrics.KUBECTL_SECONDS.timed(subcommand="get namespaces")
 def get_available_namespaces():
     try:
         command = ["kubectl", "get", "namespaces", "-o", "jsonpath='{.items[*].metadata.name}'"]
-        result = subprocess.run(
-            command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=True)
+        result = process_runner.run(command, check=True)
         namespaces = result.stdout.strip("'").split()
         return namespaces
-    except subprocess.CalledProcessError as e:
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+        metrics.ERRORS_TOTAL.inc(component="kubectl")
         logging.error("Error running kubectl command: %s", e)
         return []
 
 
+@tracing.traced("kubectl get pods")
+@metrics.KUBECTL_SECONDS.timed(subcommand="get pods")
 def get_available_pods(namespace):
     try:
         command = ["kubectl", "get", "pods", "-n", namespace, "-o", "jsonpath='{.items[*].metadata.name}'"]
-        result = subprocess.run(
-            command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=True)
+        result = process_runner.run(command, check=True)
         pods = result.stdout.strip("'").split()
         return pods
-    except subprocess.CalledProcessError as e:
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+        metrics.ERRORS_TOTAL.inc(component="kubectl")
         logging.error("Error running kubectl command: %s", e)
         return []
 
 
+@tracing.traced("kubectl get deployments")
+@metrics.KUBECTL_SECONDS.timed(subcommand="get deployments")
 def get_deployments(namespace):
     try:
         command = ["kubectl", "get", "deployments", "-n", namespace, "-o", "jsonpath='{.items[*].metadata.name}'"]
-        result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=True)
+        result = process_runner.run(command, check=True)
         pods = result.stdout.strip("'").split()
         return pods
-    except subprocess.CalledProcessError as e:
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+        metrics.ERRORS_TOTAL.inc(component="kubectl")
         logging.error("Error running kubectl command: %s", e)
         return []
 
 
+@tracing.traced("kubectl rollout restart")
+@metrics.KUBECTL_SECONDS.timed(subcommand="rollout restart")
 def rollout_restart_deployment(namespace, deployment):
     try:
         command = ["kubectl", "rollout", "restart", "deployment", deployment, "-n", namespace]
-        result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=True)
+        result = process_runner.run(command, check=True)
         output = result.stdout.strip("'").split()
         return output
-    except subprocess.CalledProcessError as e:
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+        metrics.ERRORS_TOTAL.inc(component="kubectl")
+        logging.error("Error running kubectl command: %s", e)
+        return []
+
+
+def run_kubectl_command(channel_id, argv):
+    """Run a validated kubectl argv list (see command_executor.kubectl_argv) and post its output"""
+    logging.info("Running command: %s", argv)
+    with tracing.span("kubectl " + argv[1]), metrics.KUBECTL_SECONDS.time(subcommand=argv[1]):
+        result = command_executor.execute(argv)
+    if result.timed_out:
+        metrics.ERRORS_TOTAL.inc(component="kubectl")
+        shared.slack_client.chat_postMessage(channel=channel_id, text=f"⏱️ Command timed out:\n```\n{' '.join(argv)}\n```", coalesce=True)
+    elif result.returncode != 0:
+        metrics.ERRORS_TOTAL.inc(component="kubectl")
+        shared.slack_client.chat_postMessage(channel=channel_id, text=f"Error executing command:\n```\n{result.output}\n```", coalesce=True)
+    else:
+        shared.slack_client.chat_postMessage(channel=channel_id, text=f"```\n{result.output}\n```", coalesce=True)
+    return result.ok
+
+
+@tracing.traced("kubectl config get-contexts")
+def get_contexts():
+    try:
+        command = ["kubectl", "config", "get-contexts", "-o", "name"]
+        result = process_runner.run(command, check=True, timeout=K8S_FANOUT_TIMEOUT)
+        return result.stdout.split()
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+        metrics.ERRORS_TOTAL.inc(component="kubectl")
         logging.error("Error running kubectl command: %s", e)
         return []
 
 
-def run_kubectl_command(channel_id, command):
+def _pod_row(context, pod):
+    """Flatten one pod from `kubectl get pods -o json` into a table row"""
+    status = pod.get("status", {})
+    containers = status.get("containerStatuses", [])
+    reason = status.get("reason", "")
+    for container in containers:
+        waiting = container.get("state", {}).get("waiting")
+        if waiting:
+            reason = waiting.get("reason", reason)
+            break
+    return {
+        "context": context or "",
+        "namespace": pod["metadata"].get("namespace", ""),
+        "pod": pod["metadata"]["name"],
+        "phase": status.get("phase", "Unknown"),
+        "ready": f"{sum(1 for c in containers if c.get('ready'))}/{len(containers)}",
+        "restarts": sum(c.get("restartCount", 0) for c in containers),
+        "reason": reason,
+    }
+
+
+def is_unhealthy(row):
+    """A pod needs attention if it is not running/succeeded or is waiting on something"""
+    if row["phase"] not in HEALTHY_PHASES or row["reason"]:
+        return True
+    ready, total = row["ready"].split("/")
+    return row["phase"] == "Running" and ready != total
+
+
+@tracing.traced("kubectl get pods -o json")
+@metrics.KUBECTL_SECONDS.timed(subcommand="get pods -o json")
+def _query_pods(context, namespace, timeout):
+    command = ["kubectl", "get", "pods", "-o", "json"]
+    if context:
+        command += ["--context", context]
+    command += ["-n", namespace] if namespace else ["--all-namespaces"]
+    result = process_runner.run(command, check=True, timeout=timeout)
+    return [_pod_row(context, pod) for pod in json.loads(result.stdout).get("items", [])]
+
+
+@tracing.traced("kubectl batch get pods")
+def batch_get_pods(namespaces=None, contexts=None, only_unhealthy=False,
+                   max_workers=K8S_FANOUT_CONCURRENCY, timeout=K8S_FANOUT_TIMEOUT):
+    """
+    Query pods concurrently across namespaces and kubeconfig contexts
+    No namespaces means one --all-namespaces query per context; no contexts
+    means the current context. Returns {"rows": [...], "errors": [...]} with
+    rows sorted by context, namespace and pod.
+    """
+    targets = [(context, namespace) for context in (contexts or [None]) for namespace in (namespaces or [None])]
+    rows, errors = [], []
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(targets))) as executor:
+        # Each task runs in a copy of this context so its spans join the current trace
+        futures = {executor.submit(contextvars.copy_context().run, _query_pods, context, namespace, timeout): (context, namespace)
+                   for context, namespace in targets}
+        for future in as_completed(futures):
+            context, namespace = futures[future]
+            target = f"{context or 'current'}/{namespace or '*'}"
+            try:
+                rows.extend(future.result())
+            except subprocess.TimeoutExpired:
+                metrics.ERRORS_TOTAL.inc(component="kubectl")
+                errors.append(f"{target}: timed out after {timeout:g}s")
+            except subprocess.CalledProcessError as e:
+                metrics.ERRORS_TOTAL.inc(component="kubectl")
+                errors.append(f"{target}: {(e.stderr or '').strip() or e}")
+            except ValueError as e:
+                metrics.ERRORS_TOTAL.inc(component="kubectl")
+                errors.append(f"{target}: unreadable kubectl output ({e})")
+            except (RuntimeError, OSError) as e:
+                # Child process cap reached, or kubectl could not be started
+                metrics.ERRORS_TOTAL.inc(component="kubectl")
+                errors.append(f"{target}: {e}")
+
+    if only_unhealthy:
+        rows = [row for row in rows if is_unhealthy(row)]
+    rows.sort(key=lambda row: (row["context"], row["namespace"], row["pod"]))
+    return {"rows": rows, "errors": errors}
+
+
+def format_pod_table(result, max_rows=50):
+    """Render a batch_get_pods result as a fixed-width table"""
+    rows = result["rows"]
+    columns = ["context", "namespace", "pod", "phase", "ready", "restarts", "reason"]
+    if not any(row["context"] for row in rows):
+        columns.remove("context")
+
+    lines = []
+    if rows:
+        shown = rows[:max_rows]
+        widths = {col: max(len(col), *(len(str(row[col])) for row in shown)) for col in columns}
+        lines.append("  ".join(col.upper().ljust(widths[col]) for col in columns).rstrip())
+        for row in shown:
+            lines.append("  ".join(str(row[col]).ljust(widths[col]) for col in columns).rstrip())
+        if len(rows) > max_rows:
+            lines.append(f"... {len(rows) - max_rows} more")
+    else:
+        lines.append("No matching pods")
+    for error in result["errors"]:
+        lines.append(f"⚠️ {error}")
+    return "\n".join(lines)
+
+
+def run_batch_pod_query(channel_id, only_unhealthy=True):
+    """Fan out across all namespaces of every context and post one table"""
+    contexts = get_contexts()
+    result = batch_get_pods(contexts=contexts if len(contexts) > 1 else None, only_unhealthy=only_unhealthy)
+    shared.slack_client.chat_postMessage(channel=channel_id, text=f"```\n{format_pod_table(result)}\n```", coalesce=True)
+
+
+
+def _compile_pattern(pattern, ignore_case):
+    """Regex if it parses, otherwise a literal keyword"""
+    flags = re.IGNORECASE if ignore_case else 0
     try:
-        logging.info("Running command: %s", command)
-        output = subprocess.check_output(command, shell=True, stderr=subprocess.STDOUT, text=True)
-        shared.slack_client.chat_postMessage(channel=channel_id, text=f"```\n{output}\n```")
-    except subprocess.CalledProcessError as e:
-        shared.slack_client.chat_postMessage(channel=channel_id, text=f"Error executing command:\n```\n{e.output}\n```")
\ No newline at end of file
+        return re.compile(pattern, flags)
+    except re.error:
+        return re.compile(re.escape(pattern), flags)
+
+
+@tracing.traced("kubectl logs stream")
+def _stream_pod_logs(pod, namespace, regex, since, max_matches, deadline):
+    """Grep one pod's logs line by line; only the last max_matches hits are held in memory"""
+    command = ["kubectl", "logs", pod, "-n", namespace, "--all-containers", "--timestamps"]
+    if since:
+        command.append(f"--since={since}")
+
+    matches = deque(maxlen=max_matches)
+    counts = {"lines": 0, "matches": 0}
+    process = process_runner.popen(
+        command, timeout=max(deadline - time.monotonic(), 0),
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, errors="replace")
+    try:
+        with metrics.KUBECTL_SECONDS.time(subcommand="logs stream"):
+            for line in process.stdout:
+                counts["lines"] += 1
+                if regex.search(line):
+                    counts["matches"] += 1
+                    matches.append(line.rstrip("\n"))
+            stderr = process.stderr.read()
+            returncode = process.wait()
+    finally:
+        process.stdout.close()
+        process.stderr.close()
+
+    if returncode and returncode > 0:
+        raise subprocess.CalledProcessError(returncode, command, stderr=stderr)
+    timed_out = returncode is not None and returncode < 0
+    return list(matches), counts, timed_out
+
+
+@tracing.traced("kubectl log search")
+def search_pod_logs(selector, pattern, namespace="default", since="1h", ignore_case=True,
+                    max_matches=50, max_workers=K8S_FANOUT_CONCURRENCY, timeout=K8S_FANOUT_TIMEOUT):
+    """
+    Stream logs from every pod matching a label selector concurrently and grep them
+    Returns match counts per pod and up to max_matches matching lines overall,
+    newest per pod first in pod order.
+    """
+    regex = _compile_pattern(pattern, ignore_case)
+    command = ["kubectl", "get", "pods", "-n", namespace, "-l", selector, "-o", "jsonpath={.items[*].metadata.name}"]
+    try:
+        listing = process_runner.run(command, check=True, timeout=timeout)
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+        metrics.ERRORS_TOTAL.inc(component="kubectl")
+        return {"error": f"Could not list pods for selector {selector}: {getattr(e, 'stderr', '') or e}"}
+
+    pods = listing.stdout.split()
+    result = {
+        "selector": selector,
+        "namespace": namespace,
+        "pattern": regex.pattern,
+        "pods_matched": len(pods),
+        "pods_searched": min(len(pods), K8S_LOG_SEARCH_MAX_PODS),
+        "lines_scanned": 0,
+        "total_matches": 0,
+        "matches_per_pod": {},
+        "matches": [],
+        "errors": [],
+    }
+    if not pods:
+        return result
+
+    per_pod = max(1, min(K8S_LOG_SEARCH_MAX_PER_POD, max_matches))
+    pod_matches, partial = {}, []
+    # One deadline for the whole query, so queued pods cannot extend it
+    deadline = time.monotonic() + timeout
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(pods))) as executor:
+        futures = {executor.submit(contextvars.copy_context().run, _stream_pod_logs,
+                                   pod, namespace, regex, since, per_pod, deadline): pod
+                   for pod in pods[:K8S_LOG_SEARCH_MAX_PODS]}
+        for future in as_completed(futures):
+            pod = futures[future]
+            try:
+                lines, counts, timed_out = future.result()
+            except subprocess.CalledProcessError as e:
+                metrics.ERRORS_TOTAL.inc(component="kubectl")
+                result["errors"].append(f"{pod}: {(e.stderr or '').strip() or e}")
+                continue
+            except subprocess.TimeoutExpired:
+                metrics.ERRORS_TOTAL.inc(component="kubectl")
+                result["errors"].append(f"{pod}: timed out after {timeout:g}s")
+                continue
+            except (RuntimeError, OSError) as e:
+                # Child process cap reached, or kubectl could not be started
+                metrics.ERRORS_TOTAL.inc(component="kubectl")
+                result["errors"].append(f"{pod}: {e}")
+                continue
+            if timed_out:
+                partial.append(pod)
+            result["lines_scanned"] += counts["lines"]
+            result["total_matches"] += counts["matches"]
+            if counts["matches"]:
+                result["matches_per_pod"][pod] = counts["matches"]
+                pod_matches[pod] = lines
+
+    if partial:
+        result["errors"].append(f"{len(partial)} pod(s) stopped at the {timeout:g}s deadline, results are partial")
+
+    # Round-robin across pods so one noisy replica cannot crowd out the others
+    queues = [deque(f"{pod}: {line}" for line in reversed(pod_matches[pod])) for pod in sorted(pod_matches)]
+    while queues and len(result["matches"]) < max_matches:
+        for queue in list(queues):
+            if len(result["matches"]) >= max_matches:
+                break
+            result["matches"].append(queue.popleft())
+            if not queue:
+                queues.remove(queue)
+    return result
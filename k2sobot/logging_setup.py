@@ -0,0 +1,163 @@
+"""
+Non-blocking structured logging for K2SOBot
+Logging calls only put the record on a bounded queue. One listener thread
+formats and writes it, so a slow stdout or stderr never stalls a request
+handler. A full queue drops records rather than waiting. Messages are
+capped at K2SOBOT_LOG_MAX_CHARS. Noisy loggers can be sampled below
+WARNING. Output is the classic text format or one JSON object per line.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import time
+
+import metrics
+import tracing
+
+# Logging configuration
+LOG_LEVEL = os.getenv("K2SOBOT_LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("K2SOBOT_LOG_FORMAT", "text").lower()
+LOG_MAX_CHARS = int(os.getenv("K2SOBOT_LOG_MAX_CHARS", "2000"))
+LOG_QUEUE_SIZE = int(os.getenv("K2SOBOT_LOG_QUEUE_SIZE", "10000"))
+# Per-logger sample rates for records below WARNING, e.g. "gemini_integration=0.1,tools=0.5"
+LOG_SAMPLE = os.getenv("K2SOBOT_LOG_SAMPLE", "")
+
+TEXT_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+
+LOG_RECORDS_DROPPED_TOTAL = metrics.Counter(
+    "k2sobot_log_records_dropped_total", "Log records not written", ["reason"])
+
+
+def parse_sample_rates(spec):
+    """{logger name: rate} from "name=rate,name=rate" """
+    rates = {}
+    for item in spec.split(","):
+        name, _, rate = item.partition("=")
+        if name.strip() and rate.strip():
+            rates[name.strip()] = min(max(float(rate), 0.0), 1.0)
+    return rates
+
+
+def truncate(message, limit=LOG_MAX_CHARS):
+    if limit and len(message) > limit:
+        return f"{message[:limit]}… [{len(message) - limit} more chars]"
+    return message
+
+
+class SamplingFilter(logging.Filter):
+    """Keep a fraction of sub-WARNING records per logger (and its children)"""
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = rates
+        self._resolved = {}
+
+    def rate_for(self, name):
+        rate = self._resolved.get(name)
+        if rate is None:
+            rate, candidate = 1.0, name
+            while candidate:
+                if candidate in self.rates:
+                    rate = self.rates[candidate]
+                    break
+                candidate = candidate.rpartition(".")[0]
+            self._resolved[name] = rate
+        return rate
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or not self.rates:
+            return True
+        rate = self.rate_for(record.name)
+        if rate >= 1 or random.random() < rate:
+            return True
+        LOG_RECORDS_DROPPED_TOTAL.inc(reason="sampled")
+        return False
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """Enqueue capped records without formatting them and drop them when the queue is full"""
+
+    def __init__(self, log_queue, max_chars=LOG_MAX_CHARS, max_size=LOG_QUEUE_SIZE):
+        super().__init__(log_queue)
+        self.max_chars = max_chars
+        self.max_size = max_size
+
+    def prepare(self, record):
+        # Only merge args and cap the message here; formatting happens on the listener thread.
+        # The record is changed in place: this handler sits on the root logger, which sees it last.
+        record.msg = truncate(record.getMessage(), self.max_chars)
+        record.args = None
+        span = tracing.current_span()
+        if span is not None:
+            record.trace_id = span.trace.trace_id
+            record.span_id = span.span_id
+        return record
+
+    def enqueue(self, record):
+        # SimpleQueue is lock-free for producers; the bound is checked approximately
+        if self.queue.qsize() >= self.max_size:
+            LOG_RECORDS_DROPPED_TOTAL.inc(reason="queue_full")
+            return
+        self.queue.put(record)
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record"""
+
+    def format(self, record):
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "thread": record.threadName,
+        }
+        if getattr(record, "trace_id", None):
+            entry["trace_id"] = record.trace_id
+            entry["span_id"] = record.span_id
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+_listener = None
+
+
+def configure_logging(level=LOG_LEVEL, log_format=LOG_FORMAT, stream=None):
+    """Route all logging through the queue and start the writer thread"""
+    global _listener
+    stop_logging()
+
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(JsonFormatter() if log_format == "json" else logging.Formatter(TEXT_FORMAT))
+
+    log_queue = queue.SimpleQueue()
+    handler = NonBlockingQueueHandler(log_queue)
+    handler.addFilter(SamplingFilter(parse_sample_rates(LOG_SAMPLE)))
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    metrics.QUEUE_DEPTH.set_function(log_queue.qsize, queue="logging")
+    return _listener
+
+
+def stop_logging():
+    """Flush queued records and stop the writer thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(stop_logging)
@@ -1,26 +1,36 @@
+import hmac
 import json
-from threading import Thread
+from concurrent import futures
 from flask import Flask, Response, request
-from slack_sdk import WebClient
 from slackeventsapi import SlackEventAdapter
 import slack_blocks
 import logging
-import k8s, handlers, shared_state as shared
+import alerts, argo_feed, k8s, handlers, logging_setup, metrics, profiler, tracing, workers, shared_state as shared
+from slack_outbound import OutboundSlackClient
+from slack_http import PooledWebClient
 from gemini_integration import chat_with_gemini, is_gemini_available
-from config import SLACK_SIGNING_SECRET, SLACK_TOKEN, VERIFICATION_TOKEN
+from config import SLACK_SIGNING_SECRET, SLACK_TOKEN, VERIFICATION_TOKEN, SLACK_APP_TOKEN, SLACK_TRANSPORT, SLACK_API_URL, ADMIN_TOKEN
 
 # Import specific tools for commands
 from tools import get_current_time, get_random_joke
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+# Log records are queued and written by a background thread
+logging_setup.configure_logging()
 
 app = Flask(__name__)
 
-slack_client = WebClient(SLACK_TOKEN)
+# Chat writes are queued and rate limited; other calls pass through to WebClient
+web_client = PooledWebClient(SLACK_TOKEN, base_url=SLACK_API_URL)
+slack_client = OutboundSlackClient(web_client)
 BOT_ID = slack_client.api_call("auth.test")['user_id']
 
 shared.slack_client = slack_client
 
+# Proactive pod/event alerts, posted to ALERT_CHANNEL when it is set
+alerts.start()
+# Argo CD change feed; polls only while some channel is subscribed
+argo_feed.get_argo_feed()
+
 slack_events_adapter = SlackEventAdapter(
     SLACK_SIGNING_SECRET, "/slack/events", app
 )
@@ -29,8 +39,7 @@ shared.selected_actions = {}
 
 @slack_events_adapter.on("app_mention")
 def handle_mention(event_data):
-    thread = Thread(target=send_kubectl_options, kwargs={"value": event_data})
-    thread.start()
+    workers.submit(send_kubectl_options, value=event_data)
     return Response(status=200)
 
 @slack_events_adapter.on("message")
@@ -43,11 +52,19 @@ def handle_message(event_data):
     channel_id = message.get("channel", "")
     
     if channel_id.startswith("D"):
-        thread = Thread(target=handle_direct_message, kwargs={"event_data": event_data})
-        thread.start()
+        workers.submit(handle_direct_message, event_data=event_data)
     
     return Response(status=200)
 
+def dispatch_event(event_data):
+    """Route an Events API payload received over Socket Mode"""
+    event_type = event_data.get("event", {}).get("type")
+    if event_type == "app_mention":
+        handle_mention(event_data)
+    elif event_type == "message":
+        handle_message(event_data)
+
+@metrics.SLACK_EVENT_SECONDS.timed(event="message.im")
 def handle_direct_message(event_data):
     """Handle direct messages with Gemini"""
     message = event_data["event"]
@@ -58,40 +75,48 @@ def handle_direct_message(event_data):
     if not user_message:
         return
 
-    try:
-        user_message_lower = user_message.lower()
-
+    with tracing.start_trace("handle_direct_message", user_id=user_id, channel=channel_id) as root_span:
+        try:
+            if not is_gemini_available():
+                slack_client.chat_postMessage(
+                    channel=channel_id,
+                    text="Sorry, Gemini AI is not configured. Please contact the administrator."
+                )
+                return
 
-        if not is_gemini_available():
-            slack_client.chat_postMessage(
+            # Slack calls are recorded as spans by the outbound queue, where they are actually sent
+            thinking_msg = slack_client.chat_postMessage(
                 channel=channel_id,
-                text="Sorry, Gemini AI is not configured. Please contact the administrator."
+                text="🤔 Thinking..."
             )
-            return
 
-        thinking_msg = slack_client.chat_postMessage(
-            channel=channel_id,
-            text="🤔 Thinking..."
-        )
+            response = chat_with_gemini(user_message, user_id=user_id)
 
-        response = chat_with_gemini(user_message, user_id=user_id)
-        
-        try:
-            slack_client.chat_delete(channel=channel_id, ts=thinking_msg['ts'])
-        except:
-            pass
-        
-        slack_client.chat_postMessage(channel=channel_id, text=response)
-        
-        logging.info(f"✅ Responded to DM with native function calling")
-        
-    except Exception as e:
-        logging.error(f"❌ Error handling direct message: {e}", exc_info=True)
-        slack_client.chat_postMessage(
-            channel=channel_id,
-            text=f"Sorry, I encountered an error: {str(e)}"
-        )
+            try:
+                slack_client.chat_delete(channel=channel_id, ts=thinking_msg.result(timeout=30)['ts'])
+            except:
+                pass
+
+            # Debug mode: show where the time went
+            if tracing.TRACE_DEBUG and root_span is not None:
+                response += "\n\n" + tracing.format_breakdown(root_span)
+
+            reply = slack_client.chat_postMessage(channel=channel_id, text=response)
+            if root_span is not None:
+                # Keep a sampled trace open until the reply is sent so its Slack span is exported too
+                futures.wait([reply], timeout=30)
+
+            logging.info(f"✅ Responded to DM with native function calling")
+
+        except Exception as e:
+            metrics.ERRORS_TOTAL.inc(component="direct_message")
+            logging.error(f"❌ Error handling direct message: {e}", exc_info=True)
+            slack_client.chat_postMessage(
+                channel=channel_id,
+                text=f"Sorry, I encountered an error: {str(e)}"
+            )
 
+@metrics.SLACK_EVENT_SECONDS.timed(event="app_mention")
 def send_kubectl_options(value):
     event_data = value
     message = event_data["event"]
@@ -104,40 +129,88 @@ def send_kubectl_options(value):
 @app.route('/k2sobot', methods=['POST'])
 def message_count():
     data = request.form
+    send_slash_command_menu(data)
+    return Response(), 200
+
+@metrics.SLACK_EVENT_SECONDS.timed(event="slash_command")
+def send_slash_command_menu(data):
     user_id = data.get('user_id')
     channel_id = data.get('channel_id')
+    text = (data.get('text') or '').strip()
+    if text.split(maxsplit=1)[:1] == ['argo-feed']:
+        reply = argo_feed.get_argo_feed().handle_command(channel_id, text[len('argo-feed'):])
+        slack_client.chat_postMessage(channel=channel_id, text=reply)
+        return
     response_message = slack_blocks.build_kubectl_options_block(user_id, shared.available_commands)
     slack_client.chat_postMessage(channel=channel_id, blocks=response_message["blocks"])
-    return Response(), 200
 
 @app.route("/interactions", methods=["POST"])
 def handle_interactions():
     payload = json.loads(request.form.get("payload"))
+    workers.submit(dispatch_interaction, payload)
+    return Response(status=200)
+
+def dispatch_interaction(payload):
+    """Route a block action to its handler; shared by HTTP and Socket Mode"""
+    if not payload.get("actions"):
+        return
+
     channel_id = payload["channel"]["id"]
     action_id = payload["actions"][0]["action_id"]
 
-    if action_id == "kubectl_command_select":
-        handlers.handle_kubectl_command_select(payload, channel_id)
+    with metrics.INTERACTION_SECONDS.time(action_id=action_id):
+        if action_id == "kubectl_command_select":
+            handlers.handle_kubectl_command_select(payload, channel_id)
 
-    elif action_id == "kubectl_sub_command_select":
-        handlers.handle_kubectl_sub_command_select(payload, channel_id)
+        elif action_id == "kubectl_sub_command_select":
+            handlers.handle_kubectl_sub_command_select(payload, channel_id)
 
-    elif action_id == "kubectl_namespace_select":
-        handlers.handle_kubectl_namespace_select(payload, channel_id)
+        elif action_id == "kubectl_namespace_select":
+            handlers.handle_kubectl_namespace_select(payload, channel_id)
 
-    elif action_id == "kubectl_pod_select":
-        handlers.handle_kubectl_pod_select(payload, channel_id)
+        elif action_id == "kubectl_pod_select":
+            handlers.handle_kubectl_pod_select(payload, channel_id)
 
-    elif action_id == "kubectl_deployment_select":
-        handlers.handle_kubectl_deployment_select(payload, channel_id)
+        elif action_id == "kubectl_deployment_select":
+            handlers.handle_kubectl_deployment_select(payload, channel_id)
 
-    elif action_id == "argo_app_select":
-        handlers.handle_argo_app_select(payload, channel_id)
+        elif action_id == "argo_app_select":
+            handlers.handle_argo_app_select(payload, channel_id)
 
-    elif action_id == "argo_revision_select":
-        handlers.handle_argo_revision_select(payload, channel_id)
+        elif action_id == "argo_revision_select":
+            handlers.handle_argo_revision_select(payload, channel_id)
 
-    return Response(status=200)
+@app.route("/slack/options", methods=["POST"])
+def handle_options():
+    """Options load URL for external_select typeahead menus"""
+    payload = json.loads(request.form.get("payload"))
+    options = handlers.handle_block_suggestion(payload)
+    return Response(response=json.dumps(options), status=200, mimetype="application/json")
+
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    """Prometheus scrape endpoint"""
+    return Response(response=metrics.render(), status=200, content_type=metrics.CONTENT_TYPE)
+
+@app.route("/admin/profile", methods=["GET"])
+def profile_endpoint():
+    """Collapsed-stack CPU profile of the live process, for flamegraph.pl or speedscope"""
+    if not ADMIN_TOKEN:
+        return Response(status=404)
+    supplied = request.headers.get("Authorization", "").removeprefix("Bearer ")
+    if not hmac.compare_digest(supplied.encode(), ADMIN_TOKEN.encode()):
+        return Response(status=403)
+
+    seconds = request.args.get("seconds")
+    try:
+        if seconds is None and profiler.get_profiler().running:
+            # Everything the continuous profiler has collected; ?reset=1 starts a new window
+            output = profiler.get_profiler().collapsed(reset=request.args.get("reset") == "1")
+        else:
+            output = profiler.profile_for(float(seconds or 10))
+    except ValueError:
+        return Response(response="seconds must be a number", status=400)
+    return Response(response=output, status=200, mimetype="text/plain")
 
 @app.route("/health", methods=["GET"])
 def health_check():
@@ -168,8 +241,26 @@ def health_check():
             mimetype="application/json"
         )
 
+def start_socket_mode():
+    """Receive Slack traffic over Socket Mode instead of the HTTP routes"""
+    from socket_transport import SocketModeTransport
+
+    transport = SocketModeTransport(
+        app_token=SLACK_APP_TOKEN,
+        web_client=web_client,
+        on_event=dispatch_event,
+        on_interaction=lambda payload: workers.submit(dispatch_interaction, payload),
+        on_options=handlers.handle_block_suggestion,
+        on_slash_command=lambda payload: workers.submit(send_slash_command_menu, payload),
+    )
+    transport.start()
+    return transport
+
 if __name__ == "__main__":
-    app.run(debug=True, host="0.0.0.0", port=3000)
+    if SLACK_TRANSPORT == "socket":
+        start_socket_mode()
+    # Flask keeps serving /health and /metrics in Socket Mode; the reloader would open a second socket
+    app.run(debug=True, host="0.0.0.0", port=3000, use_reloader=SLACK_TRANSPORT != "socket")
     
     
     
\ No newline at end of file
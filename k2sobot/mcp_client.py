@@ -7,8 +7,12 @@ import json
 import logging
 import os
 import sys
+import time
 from typing import Dict, List, Any, Optional
 
+import metrics
+import tracing
+
 logger = logging.getLogger(__name__)
 
 class MCPClient:  # Keep the same name!
@@ -45,54 +49,60 @@ class MCPClient:  # Keep the same name!
             "params": params or {}
         }
         
-        try:
-            logger.debug(f"Calling {server_name}: {method}")
+        with tracing.span(f"mcp {method}", server=server_name):
+            try:
+                logger.debug(f"Calling {server_name}: {method}")
+                start = time.perf_counter()
             
-            # Prepare environment
-            env = {**os.environ.copy(), **server_config["env"]}
+                # Prepare environment
+                env = {**os.environ.copy(), **server_config["env"]}
             
-            # Call server with timeout
-            process = subprocess.Popen(
-                [server_config["command"]] + server_config["args"],
-                stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                env=env,
-                text=True
-            )
+                # Call server with timeout
+                process = subprocess.Popen(
+                    [server_config["command"]] + server_config["args"],
+                    stdin=subprocess.PIPE,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    env=env,
+                    text=True
+                )
             
-            # Send request and wait for response with timeout
-            stdout, stderr = process.communicate(
-                input=json.dumps(request) + "\n",
-                timeout=timeout
-            )
+                # Send request and wait for response with timeout
+                stdout, stderr = process.communicate(
+                    input=json.dumps(request) + "\n",
+                    timeout=timeout
+                )
+                metrics.MCP_CALL_SECONDS.observe(time.perf_counter() - start, server=server_name, method=method)
             
-            if stderr:
-                logger.debug(f"Server stderr: {stderr}")
+                if stderr:
+                    logger.debug(f"Server stderr: {stderr}")
             
-            if not stdout.strip():
-                raise Exception("Empty response from server")
+                if not stdout.strip():
+                    raise Exception("Empty response from server")
             
-            # Parse response (handle multiple lines)
-            lines = stdout.strip().split('\n')
-            for line in lines:
-                if line.strip():
-                    try:
-                        response = json.loads(line)
-                        if "error" in response:
-                            raise Exception(f"Server error: {response['error']}")
-                        return response
-                    except json.JSONDecodeError:
-                        continue
+                # Parse response (handle multiple lines)
+                lines = stdout.strip().split('\n')
+                for line in lines:
+                    if line.strip():
+                        try:
+                            response = json.loads(line)
+                            if "error" in response:
+                                raise Exception(f"Server error: {response['error']}")
+                            return response
+                        except json.JSONDecodeError:
+                            continue
             
-            raise Exception("No valid JSON response found")
+                raise Exception("No valid JSON response found")
             
-        except subprocess.TimeoutExpired:
-            process.kill()
-            raise Exception(f"MCP server '{server_name}' timeout after {timeout}s")
-        except Exception as e:
-            logger.error(f"MCP call failed: {e}")
-            raise
+            except subprocess.TimeoutExpired:
+                process.kill()
+                metrics.MCP_CALL_SECONDS.observe(time.perf_counter() - start, server=server_name, method=method)
+                metrics.ERRORS_TOTAL.inc(component="mcp")
+                raise Exception(f"MCP server '{server_name}' timeout after {timeout}s")
+            except Exception as e:
+                metrics.ERRORS_TOTAL.inc(component="mcp")
+                logger.error(f"MCP call failed: {e}")
+                raise
     
     def list_tools(self, server_name: str) -> List[Dict]:
         """List tools from a server"""
@@ -0,0 +1,288 @@
+"""
+Prometheus-style metrics for K2SOBot
+Counters and histograms keep one shard per thread, so recording a value never
+takes a lock. Shards are only merged when /metrics is scraped.
+"""
+import threading
+import time
+import weakref
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_registry = []
+_registry_lock = threading.Lock()
+
+
+class _Shard:
+    """Per-thread storage; holds a plain dict that only its owner thread writes"""
+
+    __slots__ = ("values", "__weakref__")
+
+    def __init__(self):
+        self.values = {}
+
+
+class _Metric:
+    """Base class for metrics with label support"""
+
+    type_name = "untyped"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        with _registry_lock:
+            _registry.append(self)
+
+    def _key(self, labels):
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _format_labels(self, key, extra=None):
+        pairs = list(zip(self.labelnames, key))
+        if extra:
+            pairs.append(extra)
+        if not pairs:
+            return ""
+        rendered = ",".join(f'{name}="{_escape(value)}"' for name, value in pairs)
+        return "{" + rendered + "}"
+
+    def collect(self):
+        """Return exposition lines for this metric"""
+        raise NotImplementedError
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}",
+        ]
+        lines.extend(self.collect())
+        return "\n".join(lines)
+
+
+class _ShardedMetric(_Metric):
+    """Metric whose hot path writes to a thread-local shard"""
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._local = threading.local()
+        self._live_shards = weakref.WeakSet()
+        self._retired = {}
+        self._lock = threading.Lock()
+
+    def _shard_values(self):
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = _Shard()
+            self._local.shard = shard
+            with self._lock:
+                self._live_shards.add(shard)
+            # Fold the values of finished threads into a single retired shard
+            weakref.finalize(shard, self._retire, shard.values)
+        return shard.values
+
+    def _retire(self, values):
+        with self._lock:
+            for key, value in list(values.items()):
+                self._merge(self._retired, key, value)
+
+    def _merge(self, target, key, value):
+        raise NotImplementedError
+
+    def _snapshot(self):
+        merged = {}
+        with self._lock:
+            for key, value in self._retired.items():
+                self._merge(merged, key, value)
+            shards = list(self._live_shards)
+        for shard in shards:
+            for key, value in list(shard.values.items()):
+                self._merge(merged, key, value)
+        return merged
+
+
+class Counter(_ShardedMetric):
+    """Monotonically increasing counter"""
+
+    type_name = "counter"
+
+    def inc(self, amount=1, **labels):
+        values = self._shard_values()
+        key = self._key(labels)
+        values[key] = values.get(key, 0) + amount
+
+    def _merge(self, target, key, value):
+        target[key] = target.get(key, 0) + value
+
+    def value(self, **labels):
+        return self._snapshot().get(self._key(labels), 0)
+
+    def collect(self):
+        return [
+            f"{self.name}{self._format_labels(key)} {_format_value(value)}"
+            for key, value in sorted(self._snapshot().items())
+        ]
+
+
+class Histogram(_ShardedMetric):
+    """Histogram with cumulative buckets, typically used for durations in seconds"""
+
+    type_name = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, amount, **labels):
+        values = self._shard_values()
+        key = self._key(labels)
+        entry = values.get(key)
+        if entry is None:
+            # [per-bucket counts (+Inf last), sum, count]
+            entry = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            values[key] = entry
+        entry[0][bisect_left(self.buckets, amount)] += 1
+        entry[1] += amount
+        entry[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Context manager that observes the elapsed wall time"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def timed(self, **labels):
+        """Decorator that observes the duration of each call"""
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.time(**labels):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def _merge(self, target, key, value):
+        entry = target.get(key)
+        if entry is None:
+            target[key] = [list(value[0]), value[1], value[2]]
+            return
+        entry[0] = [a + b for a, b in zip(entry[0], value[0])]
+        entry[1] += value[1]
+        entry[2] += value[2]
+
+    def summary(self, **labels):
+        """Return (count, sum) for one label set"""
+        entry = self._snapshot().get(self._key(labels))
+        if entry is None:
+            return 0, 0.0
+        return entry[2], entry[1]
+
+    def collect(self):
+        lines = []
+        for key, (counts, total, count) in sorted(self._snapshot().items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else _format_value(bound)
+                lines.append(f"{self.name}_bucket{self._format_labels(key, ('le', le))} {cumulative}")
+            lines.append(f"{self.name}_sum{self._format_labels(key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{self._format_labels(key)} {count}")
+        return lines
+
+
+class Gauge(_Metric):
+    """Value that can go up and down, or be computed at scrape time"""
+
+    type_name = "gauge"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+        self._functions = {}
+        self._lock = threading.Lock()
+
+    def set(self, value, **labels):
+        self._values[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set_function(self, func, **labels):
+        """Compute the value by calling func() on every scrape"""
+        self._functions[self._key(labels)] = func
+
+    def value(self, **labels):
+        key = self._key(labels)
+        if key in self._functions:
+            return self._functions[key]()
+        return self._values.get(key, 0)
+
+    def collect(self):
+        values = dict(self._values)
+        for key, func in list(self._functions.items()):
+            try:
+                values[key] = func()
+            except Exception:
+                continue
+        return [
+            f"{self.name}{self._format_labels(key)} {_format_value(value)}"
+            for key, value in sorted(values.items())
+        ]
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        if value == float("inf"):
+            return "+Inf"
+        return repr(value)
+    return str(value)
+
+
+def render():
+    """Render all registered metrics in the Prometheus text exposition format"""
+    with _registry_lock:
+        metrics = list(_registry)
+    return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Hot path metrics shared across modules
+SLACK_EVENT_SECONDS = Histogram(
+    "k2sobot_slack_event_seconds", "Time spent handling a Slack event", ["event"])
+INTERACTION_SECONDS = Histogram(
+    "k2sobot_interaction_seconds", "Time spent in the /interactions handler", ["action_id"])
+KUBECTL_SECONDS = Histogram(
+    "k2sobot_kubectl_seconds", "Duration of kubectl calls", ["subcommand"])
+ARGOCD_SECONDS = Histogram(
+    "k2sobot_argocd_seconds", "Duration of argocd calls", ["subcommand"])
+GEMINI_REQUEST_SECONDS = Histogram(
+    "k2sobot_gemini_request_seconds", "Round-trip time of Gemini API calls")
+TOOL_EXECUTION_SECONDS = Histogram(
+    "k2sobot_tool_execution_seconds", "Time spent executing a Gemini tool", ["tool"])
+MCP_CALL_SECONDS = Histogram(
+    "k2sobot_mcp_call_seconds", "Latency of MCP server calls", ["server", "method"])
+ERRORS_TOTAL = Counter(
+    "k2sobot_errors_total", "Errors by component", ["component"])
+CACHE_HITS_TOTAL = Counter(
+    "k2sobot_cache_hits_total", "Cache hits by cache name", ["cache"])
+CACHE_MISSES_TOTAL = Counter(
+    "k2sobot_cache_misses_total", "Cache misses by cache name", ["cache"])
+QUEUE_DEPTH = Gauge(
+    "k2sobot_queue_depth", "Number of items waiting in an internal queue", ["queue"])
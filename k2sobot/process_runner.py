@@ -0,0 +1,189 @@
+"""
+Unified subprocess runner for kubectl and argocd
+Every child runs in its own process group with a deadline; on timeout the
+whole group is killed, so helpers kubectl or argocd spawn die with it.
+Captured output is capped, the number of live children is bounded, and
+spawns, durations and timeouts are exported as metrics.
+"""
+import logging
+import os
+import signal
+import subprocess
+import threading
+import time
+import weakref
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Runner limits
+SUBPROCESS_DEFAULT_TIMEOUT = float(os.getenv("SUBPROCESS_DEFAULT_TIMEOUT", "30"))
+SUBPROCESS_MAX_OUTPUT = int(os.getenv("SUBPROCESS_MAX_OUTPUT", str(4 * 1024 * 1024)))
+SUBPROCESS_MAX_CHILDREN = int(os.getenv("SUBPROCESS_MAX_CHILDREN", "32"))
+# Seconds between SIGTERM and SIGKILL when a deadline passes
+SUBPROCESS_KILL_GRACE = float(os.getenv("SUBPROCESS_KILL_GRACE", "2"))
+
+SUBPROCESS_SPAWNED_TOTAL = metrics.Counter(
+    "k2sobot_subprocess_spawned_total", "Child processes started", ["program"])
+SUBPROCESS_TIMEOUTS_TOTAL = metrics.Counter(
+    "k2sobot_subprocess_timeouts_total", "Child processes killed at their deadline", ["program"])
+SUBPROCESS_TRUNCATED_TOTAL = metrics.Counter(
+    "k2sobot_subprocess_output_truncated_total", "Child outputs cut at the capture cap", ["program"])
+SUBPROCESS_SECONDS = metrics.Histogram(
+    "k2sobot_subprocess_seconds", "Child process wall time", ["program"])
+SUBPROCESS_LIVE = metrics.Gauge(
+    "k2sobot_subprocess_live", "Child processes currently running")
+
+_children = threading.BoundedSemaphore(SUBPROCESS_MAX_CHILDREN)
+_live = weakref.WeakSet()
+
+
+def live_children():
+    return sum(1 for process in list(_live) if process.poll() is None)
+
+
+SUBPROCESS_LIVE.set_function(live_children)
+
+
+def _program(argv):
+    return os.path.basename(argv[0])
+
+
+def kill_group(process, grace=SUBPROCESS_KILL_GRACE):
+    """SIGTERM the child's process group, then SIGKILL it if it lingers"""
+    for sig in (signal.SIGTERM, signal.SIGKILL):
+        try:
+            os.killpg(process.pid, sig)
+        except (ProcessLookupError, PermissionError):
+            return
+        try:
+            process.wait(timeout=grace)
+            return
+        except subprocess.TimeoutExpired:
+            continue
+
+
+def popen(argv, timeout=None, **kwargs):
+    """
+    Start a long-running child in its own process group
+    The caller owns the process; with a timeout the group is killed when it expires.
+    Counts against SUBPROCESS_MAX_CHILDREN until the child exits.
+    """
+    program = _program(argv)
+    if not _children.acquire(timeout=SUBPROCESS_DEFAULT_TIMEOUT):
+        raise RuntimeError(f"Too many child processes running ({SUBPROCESS_MAX_CHILDREN})")
+    try:
+        process = subprocess.Popen(argv, start_new_session=True, **kwargs)
+    except Exception:
+        _children.release()
+        raise
+    SUBPROCESS_SPAWNED_TOTAL.inc(program=program)
+    _live.add(process)
+    started = time.monotonic()
+
+    def reap():
+        expired = False
+        try:
+            process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            expired = True
+            SUBPROCESS_TIMEOUTS_TOTAL.inc(program=program)
+            kill_group(process)
+            process.wait()
+        finally:
+            _children.release()
+            SUBPROCESS_SECONDS.observe(time.monotonic() - started, program=program)
+        process.timed_out = expired
+
+    process.timed_out = False
+    threading.Thread(target=reap, name=f"reap-{program}", daemon=True).start()
+    return process
+
+
+def _drain(pipe, limit, chunks, state):
+    """Read a pipe to EOF, keeping at most limit bytes"""
+    kept = 0
+    for chunk in iter(lambda: pipe.read(65536), b""):
+        if kept < limit:
+            chunks.append(chunk[:limit - kept])
+            kept += len(chunks[-1])
+        state["total"] += len(chunk)
+    pipe.close()
+
+
+def run(argv, timeout=SUBPROCESS_DEFAULT_TIMEOUT, check=False, max_output=SUBPROCESS_MAX_OUTPUT,
+        merge_stderr=False, input=None):
+    """
+    subprocess.run replacement: text output capped at max_output bytes per stream
+    (result.truncated tells whether anything was cut).
+    Raises subprocess.TimeoutExpired (after killing the process group, or when no
+    child slot frees up in time; it always carries .truncated) or,
+    with check=True, subprocess.CalledProcessError.
+    """
+    program = _program(argv)
+    deadline = time.monotonic() + timeout
+    if not _children.acquire(timeout=timeout):
+        SUBPROCESS_TIMEOUTS_TOTAL.inc(program=program)
+        error = subprocess.TimeoutExpired(argv, timeout, output="", stderr="too many child processes running")
+        error.truncated = False
+        raise error
+
+    started = time.monotonic()
+    try:
+        process = subprocess.Popen(
+            argv, start_new_session=True,
+            stdin=subprocess.PIPE if input is not None else subprocess.DEVNULL,
+            stdout=subprocess.PIPE, stderr=subprocess.STDOUT if merge_stderr else subprocess.PIPE)
+        SUBPROCESS_SPAWNED_TOTAL.inc(program=program)
+        _live.add(process)
+
+        streams = {"stdout": process.stdout} if merge_stderr else {"stdout": process.stdout, "stderr": process.stderr}
+        captured = {name: ([], {"total": 0}) for name in streams}
+        readers = [
+            threading.Thread(target=_drain, args=(pipe, max_output, *captured[name]), daemon=True)
+            for name, pipe in streams.items()
+        ]
+        for reader in readers:
+            reader.start()
+        if input is not None:
+            try:
+                process.stdin.write(input.encode("utf-8"))
+            except BrokenPipeError:
+                pass
+            process.stdin.close()
+
+        timed_out = False
+        try:
+            process.wait(timeout=max(deadline - time.monotonic(), 0))
+        except subprocess.TimeoutExpired:
+            timed_out = True
+            SUBPROCESS_TIMEOUTS_TOTAL.inc(program=program)
+            logger.warning(f"⏱️ {program} exceeded {timeout:g}s, killing its process group")
+            kill_group(process)
+            process.wait()
+        for reader in readers:
+            reader.join(timeout=SUBPROCESS_KILL_GRACE)
+    finally:
+        _children.release()
+        SUBPROCESS_SECONDS.observe(time.monotonic() - started, program=program)
+
+    output, truncated = {}, False
+    for name, (chunks, state) in captured.items():
+        text = b"".join(chunks).decode("utf-8", errors="replace")
+        if state["total"] > max_output:
+            truncated = True
+            SUBPROCESS_TRUNCATED_TOTAL.inc(program=program)
+            text += f"\n... [truncated, {state['total'] - max_output} more bytes]"
+        output[name] = text
+    stdout, stderr = output["stdout"], output.get("stderr")
+
+    if timed_out:
+        error = subprocess.TimeoutExpired(argv, timeout, output=stdout, stderr=stderr or "")
+        error.truncated = truncated
+        raise error
+    if check and process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, argv, output=stdout, stderr=stderr)
+    result = subprocess.CompletedProcess(argv, process.returncode, stdout, stderr)
+    result.truncated = truncated
+    return result
@@ -0,0 +1,141 @@
+"""
+Sampling CPU profiler for a live K2SOBot process
+A background thread snapshots every thread's Python stack at a fixed
+interval and counts identical stacks. Output is in collapsed-stack format
+("frame;frame;frame count" per line), which flamegraph.pl, speedscope and
+inferno read directly.
+
+Run it continuously with K2SOBOT_PROFILE=true, or on demand through
+GET /admin/profile?seconds=N (enabled only when K2SOBOT_ADMIN_TOKEN is set).
+"""
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Profiler configuration
+PROFILE_ENABLED = os.getenv("K2SOBOT_PROFILE", "false").lower() == "true"
+PROFILE_INTERVAL = float(os.getenv("K2SOBOT_PROFILE_INTERVAL", "0.01"))
+PROFILE_MAX_SECONDS = 120
+
+PROFILE_SAMPLES_TOTAL = metrics.Counter(
+    "k2sobot_profile_samples_total", "Stack samples taken by the sampling profiler")
+
+
+def _frame_label(code):
+    # Keyed by the function's first line so samples anywhere in it aggregate
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ":")
+
+
+class SamplingProfiler:
+    """Counts collapsed Python stacks across all threads"""
+
+    def __init__(self, interval=PROFILE_INTERVAL):
+        self.interval = interval
+        self._stacks = Counter()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._labels = {}
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return self
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="k2sobot-profiler", daemon=True)
+        self._thread.start()
+        logger.info(f"🔥 Sampling profiler started ({1 / self.interval:.0f} Hz)")
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def snapshot(self, reset=False):
+        """Stack counts collected so far"""
+        with self._lock:
+            stacks = Counter(self._stacks)
+            if reset:
+                self._stacks.clear()
+        return stacks
+
+    def collapsed(self, reset=False):
+        """Collected samples in collapsed-stack format, hottest first"""
+        return format_collapsed(self.snapshot(reset))
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            self.sample(skip=own)
+
+    def sample(self, skip=None):
+        """Record one stack per thread"""
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        samples = []
+        for ident, frame in sys._current_frames().items():
+            if ident == skip:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                label = self._labels.get(code)
+                if label is None:
+                    label = self._labels[code] = _frame_label(code)
+                stack.append(label)
+                frame = frame.f_back
+            stack.append(_thread_group(names.get(ident, "unknown")))
+            samples.append(";".join(reversed(stack)))
+        with self._lock:
+            self._stacks.update(samples)
+        PROFILE_SAMPLES_TOTAL.inc(len(samples))
+
+
+def _thread_group(name):
+    """Pool threads (k2sobot-worker_3) share one root so their stacks merge"""
+    return name.rstrip("0123456789").rstrip("_-") or name
+
+
+def format_collapsed(stacks):
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+def profile_for(seconds, interval=PROFILE_INTERVAL):
+    """Sample for the given number of seconds and return collapsed stacks"""
+    seconds = min(max(float(seconds), 0.1), PROFILE_MAX_SECONDS)
+    if _profiler.running:
+        # Diff the continuous profiler instead of running a second sampler
+        before = _profiler.snapshot()
+        time.sleep(seconds)
+        return format_collapsed(_profiler.snapshot() - before)
+
+    profiler = SamplingProfiler(interval).start()
+    try:
+        time.sleep(seconds)
+    finally:
+        profiler.stop()
+    return profiler.collapsed()
+
+
+# Global profiler instance
+_profiler = SamplingProfiler()
+
+
+def get_profiler():
+    """Get the global sampling profiler instance"""
+    return _profiler
+
+
+if PROFILE_ENABLED:
+    _profiler.start()
@@ -0,0 +1,149 @@
+"""
+In-memory typeahead index for Kubernetes resource names
+Backs the external_select menus: names are kept sorted case-insensitively so
+prefix matches are a bisect, and a trigram index narrows substring matches.
+Options requests never wait on kubectl for long: expired lists are served
+while a background refresh runs.
+"""
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+
+import k8s
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# How long fetched resource lists are served from memory
+K2SOBOT_RESOURCE_CACHE_TTL = float(os.getenv("K2SOBOT_RESOURCE_CACHE_TTL", "30"))
+# How long an options request waits for a list that was never fetched (Slack allows 3s)
+K2SOBOT_RESOURCE_LOAD_WAIT = float(os.getenv("K2SOBOT_RESOURCE_LOAD_WAIT", "2"))
+
+LOOKUP_SECONDS = metrics.Histogram(
+    "k2sobot_resource_lookup_seconds", "Typeahead lookup time", ["kind"],
+    buckets=(0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.1))
+
+
+class ResourceIndex:
+    """Sorted name list supporting prefix and substring search"""
+
+    def __init__(self, names):
+        unique = sorted(set(names), key=str.lower)
+        self.names = unique
+        self._lower = [name.lower() for name in unique]
+        # trigram -> positions of the names containing it
+        self._trigrams = {}
+        for position, lower in enumerate(self._lower):
+            for start in range(len(lower) - 2):
+                self._trigrams.setdefault(lower[start:start + 3], set()).add(position)
+
+    def __len__(self):
+        return len(self.names)
+
+    def _candidates(self, query):
+        """Positions that may contain query, in sorted order"""
+        if len(query) < 3:
+            return range(len(self.names))
+        sets = sorted((self._trigrams.get(query[i:i + 3], set()) for i in range(len(query) - 2)), key=len)
+        return sorted(sets[0].intersection(*sets[1:]))
+
+    def search(self, query, limit=100):
+        """Return (matches, total) where prefix matches rank before substring matches"""
+        query = (query or "").strip().lower()
+        if not query:
+            return self.names[:limit], len(self.names)
+
+        lo = bisect_left(self._lower, query)
+        hi = bisect_left(self._lower, query + "\uffff", lo)
+        matches = self.names[lo:hi]
+        matches += [
+            self.names[position] for position in self._candidates(query)
+            if query in self._lower[position] and not self._lower[position].startswith(query)
+        ]
+        return matches[:limit], len(matches)
+
+
+class ResourceCache:
+    """TTL cache of ResourceIndex objects keyed by (kind, namespace)"""
+
+    def __init__(self, ttl=K2SOBOT_RESOURCE_CACHE_TTL):
+        self.ttl = ttl
+        self._entries = {}
+        self._loading = {}
+        self._lock = threading.Lock()
+        self._loaders = {
+            "namespaces": lambda namespace: k8s.get_available_namespaces(),
+            "pods": k8s.get_available_pods,
+            "deployments": k8s.get_deployments,
+        }
+
+    def put(self, kind, namespace, names):
+        """Store a freshly fetched list so typeahead does not refetch it"""
+        index = ResourceIndex(names)
+        with self._lock:
+            self._entries[(kind, namespace or "")] = (index, time.monotonic())
+        return index
+
+    def get(self, kind, namespace="", wait=K2SOBOT_RESOURCE_LOAD_WAIT):
+        """Get the index for a resource kind without blocking on kubectl
+
+        An expired index is returned as is while it is refreshed in the
+        background. A list that was never fetched is waited for up to `wait`
+        seconds, after which an empty index is returned and the load carries on.
+        """
+        key = (kind, namespace or "")
+        entry = self._entries.get(key)
+        if entry is not None and time.monotonic() - entry[1] < self.ttl:
+            metrics.CACHE_HITS_TOTAL.inc(cache="resources")
+            return entry[0]
+
+        metrics.CACHE_MISSES_TOTAL.inc(cache="resources")
+        if kind not in self._loaders:
+            return ResourceIndex([])
+        loaded = self._refresh(kind, namespace or "")
+        if entry is not None:
+            return entry[0]
+        if not loaded.wait(wait):
+            logger.warning(f"⚠️ {kind} list for '{namespace}' not loaded within {wait}s, answering with no options")
+            return ResourceIndex([])
+        entry = self._entries.get(key)
+        return entry[0] if entry is not None else ResourceIndex([])
+
+    def _refresh(self, kind, namespace):
+        """Start a background load unless one is already running; returns its done event"""
+        key = (kind, namespace)
+        with self._lock:
+            loaded = self._loading.get(key)
+            if loaded is not None:
+                return loaded
+            loaded = self._loading[key] = threading.Event()
+        threading.Thread(target=self._load, args=(kind, namespace, loaded),
+                         name=f"resource-load-{kind}", daemon=True).start()
+        return loaded
+
+    def _load(self, kind, namespace, loaded):
+        try:
+            self.put(kind, namespace, self._loaders[kind](namespace))
+        except Exception as e:
+            metrics.ERRORS_TOTAL.inc(component="resource_index")
+            logger.error(f"❌ Failed to load {kind} for '{namespace}': {e}")
+        finally:
+            with self._lock:
+                del self._loading[(kind, namespace)]
+            loaded.set()
+
+    def search(self, kind, namespace, query, limit=100):
+        index = self.get(kind, namespace)
+        with LOOKUP_SECONDS.time(kind=kind):
+            return index.search(query, limit=limit)
+
+
+# Global resource cache instance
+_cache = ResourceCache()
+
+
+def get_resource_cache():
+    """Get the global resource cache instance"""
+    return _cache
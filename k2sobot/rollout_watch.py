@@ -0,0 +1,398 @@
+"""
+Rollout progress watcher for K2SOBot
+After a rollout restart or an Argo rollback, one Slack message is kept up to
+date with replica, sync and health progress, then a final summary is posted.
+All watches on a namespace share a single `kubectl get deployments --watch`
+stream, and all Argo watches (and the argo_feed) share a single
+`argocd app list` poll.
+"""
+import json
+import logging
+import os
+import subprocess
+import threading
+import time
+from datetime import datetime, timezone
+from functools import partial
+
+import argo
+import metrics
+import process_runner
+import shared_state as shared
+
+logger = logging.getLogger(__name__)
+
+# Minimum seconds between chat_update calls for one watch
+ROLLOUT_UPDATE_INTERVAL = float(os.getenv("ROLLOUT_UPDATE_INTERVAL", "5"))
+# Give up on a rollout after this many seconds
+ROLLOUT_WATCH_TIMEOUT = float(os.getenv("ROLLOUT_WATCH_TIMEOUT", "600"))
+# Seconds between shared argocd app list polls
+ARGO_WATCH_INTERVAL = float(os.getenv("ARGO_WATCH_INTERVAL", "5"))
+# Longest pause between retries when a watch stream or poll keeps failing
+WATCH_RETRY_MAX = float(os.getenv("WATCH_RETRY_MAX", "60"))
+
+ROLLOUT_WATCHES = metrics.Gauge("k2sobot_rollout_watches", "Rollout watches in progress", ["kind"])
+WATCH_STREAMS = metrics.Gauge("k2sobot_watch_streams", "Shared watch streams and polls running", ["kind"])
+
+
+def iter_json_objects(stream):
+    """Decode the stream of pretty-printed JSON objects `kubectl --watch -o json` writes"""
+    decoder = json.JSONDecoder()
+    buffer = []
+    for line in stream:
+        buffer.append(line)
+        # Objects end with a closing brace at column 0
+        if not line.startswith("}"):
+            continue
+        try:
+            obj, _ = decoder.raw_decode("".join(buffer))
+        except ValueError:
+            continue
+        buffer = []
+        yield obj
+
+
+def retry_delay(failures):
+    """Seconds to wait after the given number of consecutive failures"""
+    return min(WATCH_RETRY_MAX, 2 ** max(failures - 1, 0))
+
+
+class DeploymentInformer:
+    """One kubectl watch stream per namespace, fanned out to every subscriber"""
+
+    def __init__(self, namespace):
+        self.namespace = namespace
+        self.deployments = {}
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        self._process = None
+        self._thread = None
+
+    def subscribe(self, name, callback):
+        """Follow one deployment; if the stream has already seen it, callback gets that state at once
+
+        The cached state is passed with initial=True: it may predate the operation
+        being watched, so it must not be taken as the operation's result.
+        """
+        with self._lock:
+            self._subscribers.setdefault(name, set()).add(callback)
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name=f"informer-{self.namespace}", daemon=True)
+                self._thread.start()
+            cached = self.deployments.get(name)
+        if cached is not None:
+            self._notify(callback, cached, initial=True)
+
+    def unsubscribe(self, name, callback):
+        with self._lock:
+            callbacks = self._subscribers.get(name, set())
+            callbacks.discard(callback)
+            if not callbacks:
+                self._subscribers.pop(name, None)
+            if not self._subscribers and self._process is not None:
+                self._process.kill()
+
+    def _run(self):
+        WATCH_STREAMS.inc(kind="deployments")
+        failures = 0
+        try:
+            while True:
+                with self._lock:
+                    if not self._subscribers:
+                        self._thread = None
+                        # Nothing refreshes the cache while no stream runs, so do not replay it later
+                        self.deployments = {}
+                        return
+                    try:
+                        self._process = process_runner.popen(
+                            ["kubectl", "get", "deployments", "-n", self.namespace, "--watch", "-o", "json"],
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+                    except (RuntimeError, OSError) as e:
+                        # Child process cap reached, or kubectl could not be started
+                        self._process = None
+                        failures += 1
+                        metrics.ERRORS_TOTAL.inc(component="rollout_watch")
+                        logger.warning(f"⚠️ Deployment watch for {self.namespace} not started: {e}")
+                if self._process is None:
+                    time.sleep(retry_delay(failures))
+                    continue
+                failures = 0
+                for deployment in iter_json_objects(self._process.stdout):
+                    self._publish(deployment)
+                self._process.wait()
+                # kubectl watches end after a server timeout; reconnect while anyone listens
+                time.sleep(1)
+        finally:
+            with self._lock:
+                # After an unexpected error, let the next subscribe start a fresh stream
+                if self._thread is threading.current_thread():
+                    self._thread = None
+                    self.deployments = {}
+            WATCH_STREAMS.dec(kind="deployments")
+
+    def _publish(self, deployment):
+        name = deployment.get("metadata", {}).get("name")
+        with self._lock:
+            self.deployments[name] = deployment
+            callbacks = list(self._subscribers.get(name, ()))
+        for callback in callbacks:
+            self._notify(callback, deployment)
+
+    @staticmethod
+    def _notify(callback, deployment, **kwargs):
+        try:
+            callback(deployment, **kwargs)
+        except Exception as e:
+            metrics.ERRORS_TOTAL.inc(component="rollout_watch")
+            logger.error(f"❌ Rollout watch callback failed: {e}", exc_info=True)
+
+
+class ArgoPoller:
+    """One argocd app list poll shared by every Argo watch"""
+
+    def __init__(self, interval=ARGO_WATCH_INTERVAL):
+        self.interval = interval
+        self._subscribers = {}
+        # callback -> seconds between polls it needs; called with every successful full list
+        self._list_subscribers = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def subscribe(self, app_name, callback):
+        with self._lock:
+            self._subscribers.setdefault(app_name, set()).add(callback)
+            self._ensure_running()
+
+    def subscribe_all(self, callback, interval):
+        """Receive the whole application list after each poll"""
+        with self._lock:
+            self._list_subscribers[callback] = interval
+            self._ensure_running()
+
+    def unsubscribe_all(self, callback):
+        with self._lock:
+            self._list_subscribers.pop(callback, None)
+
+    def _ensure_running(self):
+        """Called with the lock held"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="argo-poller", daemon=True)
+            self._thread.start()
+
+    def unsubscribe(self, app_name, callback):
+        with self._lock:
+            callbacks = self._subscribers.get(app_name, set())
+            callbacks.discard(callback)
+            if not callbacks:
+                self._subscribers.pop(app_name, None)
+
+    def _run(self):
+        WATCH_STREAMS.inc(kind="argo")
+        failures = 0
+        try:
+            while True:
+                with self._lock:
+                    if not self._subscribers and not self._list_subscribers:
+                        self._thread = None
+                        return
+                apps = self._poll()
+                failures = 0 if apps is not None else failures + 1
+                for app in apps or []:
+                    name = app.get("metadata", {}).get("name")
+                    with self._lock:
+                        callbacks = list(self._subscribers.get(name, ()))
+                    for callback in callbacks:
+                        try:
+                            callback(app)
+                        except Exception as e:
+                            metrics.ERRORS_TOTAL.inc(component="rollout_watch")
+                            logger.error(f"❌ Argo watch callback failed: {e}", exc_info=True)
+                with self._lock:
+                    list_callbacks = list(self._list_subscribers)
+                    # Rollout watches need the short interval; the feed alone can poll less often
+                    interval = self.interval if self._subscribers else min(self._list_subscribers.values(), default=self.interval)
+                if apps is not None:
+                    for callback in list_callbacks:
+                        try:
+                            callback(apps)
+                        except Exception as e:
+                            metrics.ERRORS_TOTAL.inc(component="rollout_watch")
+                            logger.error(f"❌ Argo list callback failed: {e}", exc_info=True)
+                time.sleep(max(interval, retry_delay(failures)) if failures else interval)
+        finally:
+            with self._lock:
+                # After an unexpected error, let the next subscribe start a fresh poll
+                if self._thread is threading.current_thread():
+                    self._thread = None
+            WATCH_STREAMS.dec(kind="argo")
+
+    def _poll(self):
+        """The application list, or None if it could not be fetched"""
+        if not argo.ensure_argocd_login():
+            return None
+        try:
+            with metrics.ARGOCD_SECONDS.time(subcommand="app list -o json"):
+                result = process_runner.run(["argocd", "app", "list", "-o", "json"], check=True, timeout=30)
+            return json.loads(result.stdout) or []
+        except (subprocess.CalledProcessError, subprocess.TimeoutExpired, ValueError, RuntimeError, OSError) as e:
+            # RuntimeError/OSError: child process cap reached, or argocd could not be started
+            metrics.ERRORS_TOTAL.inc(component="argocd")
+            logger.error(f"❌ Argo poll failed: {e}")
+            return None
+
+
+def deployment_progress(deployment):
+    """Return (done, failed, text) for a Deployment, following kubectl rollout status"""
+    spec = deployment.get("spec", {})
+    status = deployment.get("status", {})
+    desired = spec.get("replicas", 1)
+    updated = status.get("updatedReplicas", 0)
+    ready = status.get("readyReplicas", 0)
+    available = status.get("availableReplicas", 0)
+    text = f"updated {updated}/{desired}, ready {ready}/{desired}, available {available}/{desired}"
+
+    for condition in status.get("conditions", []):
+        if condition.get("type") == "Progressing" and condition.get("reason") == "ProgressDeadlineExceeded":
+            return True, True, f"{text} — {condition.get('message', 'progress deadline exceeded')}"
+
+    observed = status.get("observedGeneration", 0) >= deployment.get("metadata", {}).get("generation", 0)
+    done = (observed and updated == desired and available == desired
+            and status.get("replicas", desired) == desired and not status.get("unavailableReplicas"))
+    return done, False, text
+
+
+def application_progress(app, since=""):
+    """Return (done, failed, text) for an Argo CD Application; operations started before since are ignored"""
+    status = app.get("status", {})
+    sync = status.get("sync", {}).get("status", "Unknown")
+    health = status.get("health", {}).get("status", "Unknown")
+    operation = status.get("operationState", {})
+    phase = operation.get("phase", "")
+    text = f"sync {sync}, health {health}" + (f", operation {phase}" if phase else "")
+
+    if operation.get("startedAt", "") < since:
+        return False, False, f"{text}, waiting for the new operation to start"
+    if phase in ("Failed", "Error"):
+        return True, True, f"{text} — {operation.get('message', '')}"
+    if phase == "Succeeded" and health == "Healthy":
+        return True, False, text
+    if phase == "Succeeded" and health == "Degraded":
+        return True, True, text
+    return False, False, text
+
+
+class RolloutWatch:
+    """Keeps one Slack message updated while a single rollout progresses"""
+
+    def __init__(self, channel_id, kind, title, progress, unsubscribe, timeout=ROLLOUT_WATCH_TIMEOUT):
+        self.channel_id = channel_id
+        self.kind = kind
+        self.title = title
+        self.progress = progress
+        self.unsubscribe = unsubscribe
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+        self._last_update = 0.0
+        self._last_text = None
+        self._finished = False
+
+        # Never wait on Slack here: the watch starts inside the mutation job
+        self._message = shared.slack_client.chat_postMessage(channel=channel_id, text=f"⏳ {title}: waiting for status...")
+        ROLLOUT_WATCHES.inc(kind=kind)
+        self._timer = threading.Timer(timeout, self._expire)
+        self._timer.daemon = True
+        self._timer.start()
+
+    @property
+    def ts(self):
+        """ts of the status message, or None while it is unsent or if posting it failed"""
+        if not self._message.done() or self._message.exception() is not None:
+            return None
+        return self._message.result()["ts"]
+
+    def on_update(self, obj, initial=False):
+        """Apply a status update; an initial snapshot can show progress but never finish the watch"""
+        done, failed, text = self.progress(obj)
+        with self._lock:
+            if self._finished or (done and initial):
+                return
+            if done:
+                self._finish("❌" if failed else "✅", text)
+                return
+            now = time.monotonic()
+            ts = self.ts
+            # Without a status message there are no live updates, only the final summary
+            if ts is None or text == self._last_text or now - self._last_update < ROLLOUT_UPDATE_INTERVAL:
+                return
+            self._last_update, self._last_text = now, text
+        elapsed = int(time.monotonic() - self.started)
+        shared.slack_client.chat_update(channel=self.channel_id, ts=ts, text=f"⏳ {self.title}: {text} ({elapsed}s)")
+
+    def cancel(self, text):
+        """Stop watching because the operation never started; no summary is posted"""
+        with self._lock:
+            if not self._finished:
+                self._finish("❌", text, summary=False)
+
+    def _edit(self, message, text):
+        if message.exception() is None:
+            shared.slack_client.chat_update(channel=self.channel_id, ts=message.result()["ts"], text=text)
+
+    def _expire(self):
+        with self._lock:
+            if not self._finished:
+                self._finish("⚠️", f"no result after {int(ROLLOUT_WATCH_TIMEOUT)}s, last seen: {self._last_text or 'nothing'}")
+
+    def _finish(self, icon, text, summary=True):
+        """Called with the lock held"""
+        self._finished = True
+        self._timer.cancel()
+        self.unsubscribe(self.on_update)
+        ROLLOUT_WATCHES.dec(kind=self.kind)
+        elapsed = int(time.monotonic() - self.started)
+        # Runs now if the status message is out, otherwise once it lands
+        final = f"{icon} {self.title}: {text}"
+        self._message.add_done_callback(lambda message: self._edit(message, final))
+        if summary:
+            shared.slack_client.chat_postMessage(
+                channel=self.channel_id, text=f"{icon} {self.title} finished after {elapsed}s: {text}")
+
+
+_informers = {}
+_informers_lock = threading.Lock()
+_argo_poller = ArgoPoller()
+
+
+def get_argo_poller():
+    """Get the shared argocd app list poller"""
+    return _argo_poller
+
+
+def get_deployment_informer(namespace):
+    """Get the shared informer for a namespace"""
+    with _informers_lock:
+        informer = _informers.get(namespace)
+        if informer is None:
+            informer = _informers[namespace] = DeploymentInformer(namespace)
+        return informer
+
+
+def watch_deployment(channel_id, namespace, deployment):
+    """Follow a deployment rollout in Slack"""
+    informer = get_deployment_informer(namespace)
+    watch = RolloutWatch(
+        channel_id, "deployment", f"Rollout of `{deployment}` in `{namespace}`",
+        deployment_progress, lambda callback: informer.unsubscribe(deployment, callback))
+    informer.subscribe(deployment, watch.on_update)
+    return watch
+
+
+def watch_application(channel_id, app_name, title=None):
+    """Follow an Argo CD sync or rollback in Slack; call before starting the operation"""
+    since = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    watch = RolloutWatch(
+        channel_id, "argo", title or f"Sync of `{app_name}`",
+        partial(application_progress, since=since), lambda callback: _argo_poller.unsubscribe(app_name, callback))
+    _argo_poller.subscribe(app_name, watch.on_update)
+    return watch
@@ -5,7 +5,7 @@ selected_actions = {}
 slack_client = None
 available_commands = ["get", "describe", "logs", "rollout restart", "argo"]
 available_sub_commands = {
-    "get": ["pods", "nodes", "services"],
+    "get": ["pods", "nodes", "services", "unhealthy pods"],
     "describe": ["pods"],
     "logs": ["pods"],
     "rollout restart": ["deployments"],
@@ -1,267 +1,240 @@
-def build_kubectl_options_block(user_id, available_commands):
-    return {
-        "blocks": [
-            {
-                "type": "section",
-                        "text": {
-                            "type": "mrkdwn",
-                            "text": f"\nHello <@{user_id}>! Please select a command:\n\n"
-                        },
-                "accessory": {
-                            "type": "image",
-                            "image_url": "https://raw.githubusercontent.com/kubernetes/kubernetes/master/logo/logo.png",
-                            "alt_text": "computer thumbnail"
-                        },
-            },
-            {
-                "type": "actions",
-                        "elements": [
-                            {
-                                "type": "static_select",
-                                "placeholder": {
-                                    "type": "plain_text",
-                                    "text": "Select a command"
-                                },
-                                "options": [
-                                    {
-                                        "text": {
-                                            "type": "plain_text",
-                                            "text": command
-                                        },
-                                        "value": command
-                                    }
-                                    for command in available_commands
-                                ],
-                                "action_id": "kubectl_command_select"
-                            }
-                        ]
-            }
-        ]
-    }
+"""
+Slack Block Kit builders
+Menus are BlockTemplates: the static structure is serialized to JSON once and
+each call only splices in its dynamic fields, so builders return
+{"blocks": "<json>"} ready to hand to chat_postMessage.
+"""
+import json
+from functools import lru_cache
 
+# Slack rejects static_select menus with more than 100 options
+STATIC_SELECT_LIMIT = 100
 
-def build_kubectl_sub_command_block(available_sub_commands, selected_command):
-    return {
-        "blocks": [
-           {
-               "type": "section",
-               "text": {
-                   "type": "mrkdwn",
-                   "text": "Please select a sub-command:"
-               }
-           },
-            {
-               "type": "actions",
-               "elements": [
-                   {
-                       "type": "static_select",
-                       "placeholder": {
-                           "type": "plain_text",
-                           "text": "Select a sub-command"
-                       },
-                       "options": [
-                           {
-                               "text": {
-                                   "type": "plain_text",
-                                   "text": sub_command
-                               },
-                               "value": sub_command
-                           }
-                           for sub_command in available_sub_commands.get(selected_command, [])
-                       ],
-                       "action_id": "kubectl_sub_command_select"
-                   }
-               ]
-           }
-        ]
-    }
+_SLOT_MARKER = "\x00slot\x00"
 
 
-def build_pod_command_block(available_pods):
-    return {
-        "blocks": [
-            {
-                "type": "section",
-                "text": {
-                    "type": "mrkdwn",
-                            "text": "Please select a pod:"
-                }
+class RawJSON(str):
+    """Already serialized JSON, spliced into a template as-is"""
+
+
+class Slot:
+    """Placeholder for a dynamic value in a BlockTemplate"""
+
+    def __init__(self, name):
+        self.name = name
+
+
+class BlockTemplate:
+    """Block structure serialized once, with Slots filled in by render()"""
+
+    def __init__(self, blocks):
+        self.slots = []
+
+        def mark(obj):
+            if isinstance(obj, Slot):
+                self.slots.append(obj.name)
+                return _SLOT_MARKER
+            raise TypeError(f"Cannot serialize {type(obj).__name__} in a block template")
+
+        serialized = json.dumps(blocks, separators=(",", ":"), default=mark)
+        self._fragments = serialized.split(json.dumps(_SLOT_MARKER))
+
+    def render(self, **values):
+        """Return the template as a JSON string with every Slot replaced"""
+        parts = [self._fragments[0]]
+        for name, fragment in zip(self.slots, self._fragments[1:]):
+            value = values[name]
+            parts.append(value if isinstance(value, RawJSON) else json.dumps(value))
+            parts.append(fragment)
+        return "".join(parts)
+
+
+@lru_cache(maxsize=256)
+def _options_json(items, label_format="{}"):
+    """Serialized static_select options, cached per distinct item list"""
+    return RawJSON(json.dumps([
+        {
+            "text": {
+                "type": "plain_text",
+                "text": label_format.format(item)
             },
+            "value": item
+        }
+        for item in items
+    ], separators=(",", ":")))
+
+
+def _menu_template(prompt, placeholder, action_id, accessory=None, block_id=False):
+    """Section prompt followed by a single static_select menu"""
+    section = {
+        "type": "section",
+        "text": {
+            "type": "mrkdwn",
+            "text": prompt
+        }
+    }
+    if accessory:
+        section["accessory"] = accessory
+    actions = {
+        "type": "actions",
+        "elements": [
             {
-                "type": "actions",
-                "elements": [
-                    {
-                        "type": "static_select",
-                                "placeholder": {
-                                    "type": "plain_text",
-                                    "text": "Select a pod"
-                                },
-                        "options": [
-                                    {
-                                        "text": {
-                                            "type": "plain_text",
-                                            "text": pod
-                                        },
-                                        "value": pod
-                                    }
-                                    for pod in available_pods
-                                ],
-                        "action_id": "kubectl_pod_select"
-                    }
-                ]
+                "type": "static_select",
+                "placeholder": {
+                    "type": "plain_text",
+                    "text": placeholder
+                },
+                "options": Slot("options"),
+                "action_id": action_id
             }
         ]
     }
+    if block_id:
+        actions["block_id"] = Slot("block_id")
+    return BlockTemplate([section, actions])
 
 
-def build_deployments_command_block(available_deployments):
-    return {
-        "blocks": [
-            {
-                "type": "section",
-                "text": {
-                    "type": "mrkdwn",
-                            "text": "Please select a deployment:"
+def _typeahead_template(prompt, action_id):
+    """Section prompt followed by an external_select served from /slack/options"""
+    return BlockTemplate([
+        {
+            "type": "section",
+            "text": {
+                "type": "mrkdwn",
+                "text": prompt
+            }
+        },
+        {
+            "type": "actions",
+            # The block_id carries the namespace to the options endpoint
+            "block_id": Slot("block_id"),
+            "elements": [
+                {
+                    "type": "external_select",
+                    "placeholder": {
+                        "type": "plain_text",
+                        "text": Slot("placeholder")
+                    },
+                    "min_query_length": 0,
+                    "action_id": action_id
                 }
+            ]
+        }
+    ])
+
+
+KUBECTL_OPTIONS_TEMPLATE = _menu_template(
+    Slot("greeting"), "Select a command", "kubectl_command_select",
+    accessory={
+        "type": "image",
+        "image_url": "https://raw.githubusercontent.com/kubernetes/kubernetes/master/logo/logo.png",
+        "alt_text": "computer thumbnail"
+    })
+
+SUB_COMMAND_TEMPLATE = _menu_template(
+    "Please select a sub-command:", "Select a sub-command", "kubectl_sub_command_select")
+
+ARGO_APPLICATIONS_TEMPLATE = _menu_template(
+    "🚀 Please select an ArgoCD application:", "Select an application", "argo_app_select",
+    accessory={
+        "type": "image",
+        "image_url": "https://raw.githubusercontent.com/argoproj/argo-cd/master/docs/assets/logo.png",
+        "alt_text": "ArgoCD logo"
+    })
+
+ARGO_REVISIONS_TEMPLATE = _menu_template(
+    "🔄 Please select a revision to rollback to:", "Select a revision", "argo_revision_select")
+
+# Resource menus: (static_select template, external_select template, placeholder)
+RESOURCE_TEMPLATES = {
+    action_id: (
+        _menu_template(prompt, placeholder, action_id, block_id=True),
+        _typeahead_template(prompt, action_id),
+        placeholder,
+    )
+    for action_id, prompt, placeholder in [
+        ("kubectl_pod_select", "Please select a pod:", "Select a pod"),
+        ("kubectl_deployment_select", "Please select a deployment:", "Select a deployment"),
+        ("kubectl_namespace_select", "Please select a namespace:", "Select a namespace"),
+    ]
+}
+
+
+def _resource_menu(action_id, items, context=""):
+    """Static menu for short lists, typeahead (external_select) for long ones"""
+    static_template, typeahead_template, placeholder = RESOURCE_TEMPLATES[action_id]
+    block_id = f"{action_id}:{context}"
+    if len(items) <= STATIC_SELECT_LIMIT:
+        blocks = static_template.render(block_id=block_id, options=_options_json(tuple(items)))
+    else:
+        blocks = typeahead_template.render(
+            block_id=block_id,
+            placeholder=f"{placeholder} ({len(items)} available, type to filter)")
+    return {"blocks": blocks}
+
+
+def build_options_response(names, total):
+    """Response body for an external_select options request"""
+    options = [
+        {
+            "text": {
+                "type": "plain_text",
+                "text": name
             },
-            {
-                "type": "actions",
-                "elements": [
-                    {
-                        "type": "static_select",
-                                "placeholder": {
-                                    "type": "plain_text",
-                                    "text": "Select a deployment"
-                                },
-                        "options": [
-                                    {
-                                        "text": {
-                                            "type": "plain_text",
-                                            "text": deployment
-                                        },
-                                        "value": deployment
-                                    }
-                                    for deployment in available_deployments
-                                ],
-                        "action_id": "kubectl_deployment_select"
-                    }
-                ]
-            }
-        ]
+            "value": name
+        }
+        for name in names
+    ]
+    if total > len(names):
+        return {
+            "option_groups": [
+                {
+                    "label": {
+                        "type": "plain_text",
+                        "text": f"First {len(names)} of {total} matches, keep typing"[:75]
+                    },
+                    "options": options
+                }
+            ]
+        }
+    return {"options": options}
+
+
+def build_kubectl_options_block(user_id, available_commands):
+    return {
+        "blocks": KUBECTL_OPTIONS_TEMPLATE.render(
+            greeting=f"\nHello <@{user_id}>! Please select a command:\n\n",
+            options=_options_json(tuple(available_commands)))
     }
 
 
-def build_namesapces_block(available_namespaces):
+def build_kubectl_sub_command_block(available_sub_commands, selected_command):
     return {
-        "blocks": [
-            {
-                "type": "section",
-                "text": {
-                        "type": "mrkdwn",
-                        "text": "Please select a namespace:"
-                }
-            },
-            {
-                "type": "actions",
-                "elements": [
-                        {
-                            "type": "static_select",
-                            "placeholder": {
-                                "type": "plain_text",
-                                "text": "Select a namespace"
-                            },
-                            "options": [
-                                {
-                                    "text": {
-                                        "type": "plain_text",
-                                        "text": namespace
-                                    },
-                                    "value": namespace
-                                }
-                                for namespace in available_namespaces
-                            ],
-                            "action_id": "kubectl_namespace_select"
-                        }
-                ]
-            }
-        ]
+        "blocks": SUB_COMMAND_TEMPLATE.render(
+            options=_options_json(tuple(available_sub_commands.get(selected_command, []))))
     }
 
 
+def build_pod_command_block(available_pods, namespace=""):
+    return _resource_menu("kubectl_pod_select", available_pods, namespace)
+
+
+def build_deployments_command_block(available_deployments, namespace=""):
+    return _resource_menu("kubectl_deployment_select", available_deployments, namespace)
+
+
+def build_namesapces_block(available_namespaces):
+    return _resource_menu("kubectl_namespace_select", available_namespaces)
+
+
 def build_argo_applications_block(available_applications):
     return {
-        "blocks": [
-            {
-                "type": "section",
-                "text": {
-                    "type": "mrkdwn",
-                    "text": "🚀 Please select an ArgoCD application:"
-                },
-                "accessory": {
-                    "type": "image",
-                    "image_url": "https://raw.githubusercontent.com/argoproj/argo-cd/master/docs/assets/logo.png",
-                    "alt_text": "ArgoCD logo"
-                }
-            },
-            {
-                "type": "actions",
-                "elements": [
-                    {
-                        "type": "static_select",
-                        "placeholder": {
-                            "type": "plain_text",
-                            "text": "Select an application"
-                        },
-                        "options": [
-                            {
-                                "text": {
-                                    "type": "plain_text",
-                                    "text": app
-                                },
-                                "value": app
-                            }
-                            for app in available_applications
-                        ],
-                        "action_id": "argo_app_select"
-                    }
-                ]
-            }
-        ]
+        "blocks": ARGO_APPLICATIONS_TEMPLATE.render(options=_options_json(tuple(available_applications)))
     }
 
 
 def build_argo_revisions_block(available_revisions):
     return {
-        "blocks": [
-            {
-                "type": "section",
-                "text": {
-                    "type": "mrkdwn",
-                    "text": "🔄 Please select a revision to rollback to:"
-                }
-            },
-            {
-                "type": "actions",
-                "elements": [
-                    {
-                        "type": "static_select",
-                        "placeholder": {
-                            "type": "plain_text",
-                            "text": "Select a revision"
-                        },
-                        "options": [
-                            {
-                                "text": {
-                                    "type": "plain_text",
-                                    "text": f"Revision {revision}"
-                                },
-                                "value": revision
-                            }
-                            for revision in available_revisions
-                        ],
-                        "action_id": "argo_revision_select"
-                    }
-                ]
-            }
-        ]
+        "blocks": ARGO_REVISIONS_TEMPLATE.render(
+            options=_options_json(tuple(available_revisions), "Revision {}"))
     }
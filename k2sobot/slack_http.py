@@ -0,0 +1,125 @@
+"""
+Pooled keep-alive HTTP transport for the Slack Web API
+slack_sdk's WebClient opens a new urllib connection (and TLS handshake) per
+call. PooledWebClient sends the same requests over one process-wide
+requests.Session so connections to slack.com are reused across threads.
+
+It overrides a private WebClient method, so slack-sdk is pinned in
+requirements.txt and test_unit.py sends calls through the override.
+"""
+import inspect
+import logging
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from slack_sdk import WebClient
+from slack_sdk.errors import SlackRequestError
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Connection pool configuration
+SLACK_HTTP_POOL_CONNECTIONS = int(os.getenv("SLACK_HTTP_POOL_CONNECTIONS", "4"))
+SLACK_HTTP_POOL_MAXSIZE = int(os.getenv("SLACK_HTTP_POOL_MAXSIZE", "10"))
+
+_session = None
+_adapter = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Get the process-wide Slack HTTP session, creating it on first use"""
+    global _session, _adapter
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                adapter = HTTPAdapter(
+                    pool_connections=SLACK_HTTP_POOL_CONNECTIONS,
+                    pool_maxsize=SLACK_HTTP_POOL_MAXSIZE,
+                    max_retries=0,  # retries are handled by WebClient retry handlers and the outbound queue
+                )
+                session = requests.Session()
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _adapter = adapter
+                _session = session
+                logger.info(
+                    f"✅ Slack HTTP pool ready (pools={SLACK_HTTP_POOL_CONNECTIONS}, maxsize={SLACK_HTTP_POOL_MAXSIZE})")
+    return _session
+
+
+def pool_stats():
+    """Return (connections opened, requests sent) across all live pools"""
+    if _adapter is None:
+        return 0, 0
+    pools = _adapter.poolmanager.pools
+    connections = requests_sent = 0
+    for key in list(pools.keys()):
+        try:
+            pool = pools[key]
+        except KeyError:
+            continue
+        connections += pool.num_connections
+        requests_sent += pool.num_requests
+    return connections, requests_sent
+
+
+def _reuse_ratio():
+    connections, requests_sent = pool_stats()
+    if requests_sent == 0:
+        return 0.0
+    return 1.0 - connections / requests_sent
+
+
+SLACK_HTTP_CONNECTIONS = metrics.Gauge(
+    "k2sobot_slack_http_connections_opened", "Connections opened by the Slack HTTP pool")
+SLACK_HTTP_REQUESTS = metrics.Gauge(
+    "k2sobot_slack_http_requests", "Requests sent through the Slack HTTP pool")
+SLACK_HTTP_REUSE_RATIO = metrics.Gauge(
+    "k2sobot_slack_http_connection_reuse_ratio", "Share of Slack requests that reused a pooled connection")
+SLACK_HTTP_CONNECTIONS.set_function(lambda: pool_stats()[0])
+SLACK_HTTP_REQUESTS.set_function(lambda: pool_stats()[1])
+SLACK_HTTP_REUSE_RATIO.set_function(_reuse_ratio)
+
+
+def _transport_hook_supported():
+    """Check that WebClient still has the private hook PooledWebClient overrides"""
+    hook = getattr(WebClient, "_perform_urllib_http_request_internal", None)
+    if hook is None:
+        return False
+    return list(inspect.signature(hook).parameters) == ["self", "url", "req"]
+
+
+class PooledWebClient(WebClient):
+    """WebClient that sends requests over the shared keep-alive session"""
+
+    def __init__(self, *args, session=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if _transport_hook_supported():
+            self.session = session or get_session()
+        else:
+            # Keep Slack working on slack_sdk's own transport rather than break every call
+            self.session = None
+            logger.error("❌ This slack_sdk version does not match PooledWebClient, Slack calls will not be pooled")
+
+    def _perform_urllib_http_request_internal(self, url, req):
+        if self.session is None:
+            return super()._perform_urllib_http_request_internal(url, req)
+        if not url.lower().startswith("http"):
+            raise SlackRequestError(f"Invalid URL detected: {url}")
+
+        # requests only accepts str header values (slack_sdk sets Content-Length as int)
+        headers = {name: str(value) for name, value in req.header_items()}
+        proxies = {"http": self.proxy, "https": self.proxy} if self.proxy else None
+
+        resp = self.session.post(
+            url, data=req.data, headers=headers, timeout=self.timeout, proxies=proxies)
+
+        if resp.headers.get("Content-Type", "").startswith("application/gzip"):
+            # admin.analytics.getFile
+            return {"status": resp.status_code, "headers": resp.headers, "body": resp.content}
+        body = resp.content.decode(resp.encoding or "utf-8")
+        return {"status": resp.status_code, "headers": resp.headers, "body": body}
@@ -0,0 +1,299 @@
+"""
+Rate-limit aware outbound Slack layer
+Wraps a slack_sdk WebClient so that handlers enqueue chat writes instead of
+blocking on Slack. Sends go through per-method and per-channel token buckets,
+honour Retry-After on 429s, and rapid text posts to one channel can be
+coalesced when the caller opts in with coalesce=True.
+"""
+import logging
+import os
+import queue
+import threading
+import time
+import zlib
+from collections import deque
+from concurrent.futures import Future
+
+from slack_sdk.errors import SlackApiError
+
+import metrics
+import tracing
+
+logger = logging.getLogger(__name__)
+
+# Outbound configuration
+SLACK_SEND_WORKERS = int(os.getenv("SLACK_SEND_WORKERS", "4"))
+SLACK_SEND_QUEUE_SIZE = int(os.getenv("SLACK_SEND_QUEUE_SIZE", "1000"))
+SLACK_ENQUEUE_TIMEOUT = float(os.getenv("SLACK_ENQUEUE_TIMEOUT", "0.5"))
+SLACK_MAX_RETRIES = int(os.getenv("SLACK_MAX_RETRIES", "3"))
+SLACK_CHANNEL_RATE = float(os.getenv("SLACK_CHANNEL_RATE", "1.0"))
+SLACK_CHANNEL_BURST = int(os.getenv("SLACK_CHANNEL_BURST", "4"))
+SLACK_COALESCE_MAX_CHARS = int(os.getenv("SLACK_COALESCE_MAX_CHARS", "3000"))
+
+# (tokens per second, burst) per Web API method, following Slack's rate limit tiers.
+# chat.postMessage has no workspace-wide tier, only about one message per second
+# per channel, so it is limited by the per-channel buckets alone.
+METHOD_RATES = {
+    "chat.update": (50 / 60, 5),
+    "chat.delete": (50 / 60, 5),
+}
+DEFAULT_METHOD_RATE = (50 / 60, 5)
+PER_CHANNEL_METHODS = {"chat.postMessage"}
+
+# Client attribute name -> Web API method for the writes that go through the queue
+QUEUED_METHODS = {
+    "chat_postMessage": "chat.postMessage",
+    "chat_update": "chat.update",
+    "chat_delete": "chat.delete",
+}
+
+SLACK_API_SECONDS = metrics.Histogram(
+    "k2sobot_slack_api_seconds", "Latency of outbound Slack Web API calls", ["method"])
+SLACK_RATE_LIMITED_TOTAL = metrics.Counter(
+    "k2sobot_slack_rate_limited_total", "429 responses received from Slack", ["method"])
+SLACK_DROPPED_TOTAL = metrics.Counter(
+    "k2sobot_slack_dropped_total", "Outbound Slack calls dropped because the queue was full", ["method"])
+SLACK_COALESCED_TOTAL = metrics.Counter(
+    "k2sobot_slack_coalesced_total", "Posts merged into a previous post to the same channel")
+
+
+class TokenBucket:
+    """Non-blocking token bucket that can be paused after a 429"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def try_acquire(self):
+        """Take a token and return 0, or return the seconds until one is available"""
+        with self._lock:
+            now = time.monotonic()
+            if now < self._paused_until:
+                return self._paused_until - now
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def pause(self, seconds):
+        """Hold all callers for the given number of seconds"""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+class _SendJob:
+    """One queued Web API call and the futures waiting for its response"""
+
+    __slots__ = ("attr", "method", "kwargs", "futures", "coalesce", "span", "enqueued", "attempts")
+
+    def __init__(self, attr, kwargs):
+        self.attr = attr
+        self.method = QUEUED_METHODS[attr]
+        # Not a Slack argument: the caller allows this post to be merged with its neighbours
+        self.coalesce = kwargs.pop("coalesce", False)
+        self.kwargs = kwargs
+        self.futures = [Future()]
+        # The send is recorded under the caller's span, with the time spent queued
+        self.span = tracing.current_span()
+        self.enqueued = time.monotonic()
+        self.attempts = 0
+
+    @property
+    def channel(self):
+        return self.kwargs.get("channel")
+
+    def can_coalesce(self):
+        """Only opted-in plain top-level text posts can be merged.
+
+        A merged post shares its ts with the others, so callers that update or
+        delete their message must never opt in.
+        """
+        return (
+            self.coalesce
+            and self.attr == "chat_postMessage"
+            and set(self.kwargs) <= {"channel", "text"}
+            and isinstance(self.kwargs.get("text"), str)
+        )
+
+
+class OutboundSlackClient:
+    """Drop-in wrapper for WebClient with a bounded asynchronous send queue
+
+    chat_postMessage, chat_update and chat_delete return a Future that resolves
+    to the SlackResponse; every other attribute is passed through to the
+    wrapped client. Calls for the same channel are always sent in order.
+    Pass coalesce=True to chat_postMessage for fire-and-forget notices that may
+    be merged into one message with other such posts to the channel.
+    """
+
+    def __init__(self, client, workers=SLACK_SEND_WORKERS, queue_size=SLACK_SEND_QUEUE_SIZE):
+        self.client = client
+        self._queues = [queue.Queue(maxsize=max(1, queue_size // workers)) for _ in range(workers)]
+        self._method_buckets = {
+            method: TokenBucket(rate, burst) for method, (rate, burst) in METHOD_RATES.items()
+        }
+        self._channel_buckets = {}
+        self._buckets_lock = threading.Lock()
+
+        for index, send_queue in enumerate(self._queues):
+            worker = threading.Thread(
+                target=self._worker, args=(send_queue,), name=f"slack-outbound-{index}", daemon=True)
+            worker.start()
+
+        metrics.QUEUE_DEPTH.set_function(self.queue_depth, queue="slack_outbound")
+
+    def __getattr__(self, name):
+        if name in QUEUED_METHODS:
+            return lambda **kwargs: self._enqueue(name, kwargs)
+        return getattr(self.client, name)
+
+    def queue_depth(self):
+        """Calls queued or waiting for a rate limit token, not yet sent"""
+        return sum(send_queue.unfinished_tasks for send_queue in self._queues)
+
+    def flush(self, timeout=None):
+        """Wait until every queued call has been sent; returns False on timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.queue_depth():
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def _enqueue(self, attr, kwargs):
+        job = _SendJob(attr, kwargs)
+        # Shard by channel so per-channel ordering is kept
+        channel = job.channel or ""
+        send_queue = self._queues[zlib.crc32(channel.encode()) % len(self._queues)]
+        try:
+            send_queue.put(job, timeout=SLACK_ENQUEUE_TIMEOUT)
+        except queue.Full:
+            SLACK_DROPPED_TOTAL.inc(method=job.method)
+            logger.error(f"❌ Slack send queue full, dropping {job.method} to {channel}")
+            job.futures[0].set_exception(RuntimeError("Slack send queue is full"))
+        return job.futures[0]
+
+    def _worker(self, send_queue):
+        # Jobs wait here, per channel, until their bucket has a token. A throttled or
+        # rate-limited channel is skipped over, so other channels on this shard keep flowing.
+        pending = {}
+        wait = None
+        while True:
+            if sum(len(jobs) for jobs in pending.values()) < send_queue.maxsize:
+                self._take(send_queue, pending, wait)
+            elif wait:
+                time.sleep(wait)
+            wait = self._send_ready(send_queue, pending)
+
+    def _take(self, send_queue, pending, wait):
+        """Move queued jobs to the pending lists, waiting up to `wait` seconds (forever if None) for the first"""
+        try:
+            job = send_queue.get(timeout=wait) if wait is None or wait > 0 else send_queue.get_nowait()
+        except queue.Empty:
+            return
+        for _ in range(send_queue.maxsize):
+            self._add_pending(pending, job)
+            try:
+                job = send_queue.get_nowait()
+            except queue.Empty:
+                return
+        self._add_pending(pending, job)
+
+    def _add_pending(self, pending, job):
+        jobs = pending.setdefault(job.channel, deque())
+        previous = jobs[-1] if jobs else None
+        if (
+            previous is not None
+            and previous.can_coalesce()
+            and job.can_coalesce()
+            and len(previous.kwargs["text"]) + len(job.kwargs["text"]) < SLACK_COALESCE_MAX_CHARS
+        ):
+            previous.kwargs["text"] += "\n" + job.kwargs["text"]
+            previous.futures.extend(job.futures)
+            SLACK_COALESCED_TOTAL.inc()
+            return
+        jobs.append(job)
+
+    def _send_ready(self, send_queue, pending):
+        """Send the next job of each channel that has a token; return seconds until the next is due"""
+        wait = None
+        for channel in list(pending):
+            jobs = pending[channel]
+            delay = self._bucket(jobs[0]).try_acquire()
+            if delay == 0 and self._send(jobs[0]):
+                job = jobs.popleft()
+                # Merged posts were queued separately, so each one is marked done
+                for _ in job.futures:
+                    send_queue.task_done()
+                if not jobs:
+                    del pending[channel]
+                    continue
+            wait = delay if wait is None else min(wait, delay)
+        return wait
+
+    def _channel_bucket(self, channel):
+        bucket = self._channel_buckets.get(channel)
+        if bucket is None:
+            with self._buckets_lock:
+                bucket = self._channel_buckets.setdefault(
+                    channel, TokenBucket(SLACK_CHANNEL_RATE, SLACK_CHANNEL_BURST))
+        return bucket
+
+    def _method_bucket(self, method):
+        bucket = self._method_buckets.get(method)
+        if bucket is None:
+            with self._buckets_lock:
+                bucket = self._method_buckets.setdefault(method, TokenBucket(*DEFAULT_METHOD_RATE))
+        return bucket
+
+    def _bucket(self, job):
+        if job.method in PER_CHANNEL_METHODS:
+            return self._channel_bucket(job.channel)
+        return self._method_bucket(job.method)
+
+    def _send(self, job):
+        """Make one attempt; returns False when the job should be retried after a 429"""
+        queued_ms = round((time.monotonic() - job.enqueued) * 1000, 3)
+        with tracing.child_span(job.span, f"slack {job.method}", channel=job.channel, queued_ms=queued_ms,
+                                attempt=job.attempts + 1):
+            try:
+                with SLACK_API_SECONDS.time(method=job.method):
+                    response = getattr(self.client, job.attr)(**job.kwargs)
+            except SlackApiError as e:
+                if e.response.status_code == 429 and job.attempts < SLACK_MAX_RETRIES:
+                    job.attempts += 1
+                    retry_after = _retry_after(e.response)
+                    SLACK_RATE_LIMITED_TOTAL.inc(method=job.method)
+                    logger.warning(f"⏳ Slack rate limited {job.method} to {job.channel}, retrying in {retry_after}s")
+                    # The job stays at the head of its channel's pending list until the bucket reopens
+                    self._bucket(job).pause(retry_after)
+                    return False
+                self._fail(job, e)
+                return True
+            except Exception as e:
+                self._fail(job, e)
+                return True
+        for future in job.futures:
+            future.set_result(response)
+        return True
+
+    def _fail(self, job, error):
+        metrics.ERRORS_TOTAL.inc(component="slack")
+        logger.error(f"❌ Slack {job.method} to {job.channel} failed: {error}")
+        for future in job.futures:
+            future.set_exception(error)
+
+
+def _retry_after(response):
+    headers = response.headers or {}
+    value = headers.get("Retry-After") or headers.get("retry-after") or 1
+    try:
+        return max(1.0, float(value))
+    except (TypeError, ValueError):
+        return 1.0
@@ -0,0 +1,62 @@
+"""
+Socket Mode transport for K2SOBot
+Receives events, interactions and slash commands over one persistent WebSocket
+instead of the HTTP Events API. Envelopes are acknowledged immediately and
+handed to the same handlers the Flask routes use.
+"""
+import logging
+
+from slack_sdk.socket_mode import SocketModeClient
+from slack_sdk.socket_mode.response import SocketModeResponse
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+SOCKET_MODE_REQUESTS_TOTAL = metrics.Counter(
+    "k2sobot_socket_mode_requests_total", "Socket Mode envelopes received", ["type"])
+
+
+class SocketModeTransport:
+    """Feeds Socket Mode envelopes to the bot's event, interaction and command handlers"""
+
+    def __init__(self, app_token, web_client, on_event, on_interaction, on_slash_command, on_options=None):
+        self.client = SocketModeClient(app_token=app_token, web_client=web_client)
+        self.on_event = on_event
+        self.on_interaction = on_interaction
+        self.on_slash_command = on_slash_command
+        self.on_options = on_options
+
+    def start(self):
+        """Open the WebSocket; envelopes are processed on the client's own threads"""
+        self.client.socket_mode_request_listeners.append(self._handle_request)
+        self.client.connect()
+        logger.info("✅ Socket Mode transport connected")
+
+    def close(self):
+        self.client.close()
+
+    def _handle_request(self, client, req):
+        SOCKET_MODE_REQUESTS_TOTAL.inc(type=req.type)
+
+        # Typeahead options have to travel back in the ack itself
+        if req.type == "interactive" and req.payload.get("type") == "block_suggestion":
+            options = self.on_options(req.payload) if self.on_options else {"options": []}
+            client.send_socket_mode_response(SocketModeResponse(envelope_id=req.envelope_id, payload=options))
+            return
+
+        # Ack first so Slack never waits on our handlers
+        client.send_socket_mode_response(SocketModeResponse(envelope_id=req.envelope_id))
+
+        try:
+            if req.type == "events_api":
+                self.on_event(req.payload)
+            elif req.type == "interactive":
+                self.on_interaction(req.payload)
+            elif req.type == "slash_commands":
+                self.on_slash_command(req.payload)
+            else:
+                logger.debug(f"Ignoring Socket Mode envelope of type {req.type}")
+        except Exception as e:
+            metrics.ERRORS_TOTAL.inc(component="socket_mode")
+            logger.error(f"❌ Error handling Socket Mode {req.type} envelope: {e}", exc_info=True)
@@ -0,0 +1,1049 @@
+# test_unit.py
+import contextvars
+import gc
+import io
+import json
+import os
+import re
+import subprocess
+import tempfile
+import threading
+import time
+import unittest
+from concurrent.futures import Future
+from types import SimpleNamespace
+from unittest import mock
+
+from slack_sdk import WebClient
+from slack_sdk.errors import SlackApiError
+
+import command_executor
+import gemini_gateway
+import chat_sessions
+import gemini_integration
+import alerts
+import argo_feed
+import handlers
+import intent_router
+import jobs
+import k8s
+import metrics
+import process_runner
+import resource_index
+import rollout_watch
+import shared_state as shared
+import slack_blocks
+import slack_http
+import slack_outbound
+import tool_output
+import tracing
+
+from socket_transport import SocketModeTransport
+from testing.fake_socket_mode import FakeSocketModeServer
+
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not met in time")
+        time.sleep(0.005)
+
+
+_SAMPLE = re.compile(r'^(\w+)(?:\{(.*)\})? (\S+)$')
+_LABEL = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+
+def parse_exposition(text):
+    """Parse text exposition lines into {(name, ((label, value), ...)): float}"""
+    samples = {}
+    for line in text.splitlines():
+        if not line or line.startswith("#"):
+            continue
+        name, labels, value = _SAMPLE.match(line).groups()
+        pairs = tuple(
+            (label, re.sub(r"\\(.)", lambda m: "\n" if m.group(1) == "n" else m.group(1), raw))
+            for label, raw in _LABEL.findall(labels or ""))
+        samples[(name, pairs)] = float(value)
+    return samples
+
+
+class TestMetrics(unittest.TestCase):
+
+    def test_counter_merges_thread_shards(self):
+        counter = metrics.Counter("test_shards_total", "Shard merge test", ["kind"])
+        barrier = threading.Barrier(4)
+
+        def work():
+            barrier.wait()
+            for _ in range(1000):
+                counter.inc(kind="a")
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        counter.inc(5, kind="b")
+        gc.collect()
+        # Threads above have exited; their counts live on in the retired shard
+        self.assertEqual(counter.value(kind="a"), 4000)
+        self.assertEqual(parse_exposition(counter.render())[("test_shards_total", (("kind", "b"),))], 5)
+
+    def test_histogram_exposition(self):
+        histogram = metrics.Histogram("test_latency_seconds", "Histogram format test", ["route"], buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 0.5, 3.0):
+            histogram.observe(value, route="/x")
+        text = histogram.render()
+        self.assertIn("# TYPE test_latency_seconds histogram", text)
+        samples = parse_exposition(text)
+        bucket = lambda le: samples[("test_latency_seconds_bucket", (("route", "/x"), ("le", le)))]  # noqa: E731
+        self.assertEqual([bucket("0.1"), bucket("1.0"), bucket("+Inf")], [1, 3, 4])
+        self.assertEqual(samples[("test_latency_seconds_count", (("route", "/x"),))], 4)
+        self.assertAlmostEqual(samples[("test_latency_seconds_sum", (("route", "/x"),))], 4.05)
+
+    def test_label_values_are_escaped(self):
+        gauge = metrics.Gauge("test_escape", "Label escaping test", ["name"])
+        awkward = 'say "hi"\\there\nnext'
+        gauge.set(1, name=awkward)
+        self.assertIn('name="say \\"hi\\"\\\\there\\nnext"', gauge.render())
+        self.assertEqual(parse_exposition(gauge.render()), {("test_escape", (("name", awkward),)): 1})
+
+    def test_registry_renders_every_metric(self):
+        text = metrics.render()
+        self.assertTrue(text.endswith("\n"))
+        self.assertIn("# TYPE k2sobot_errors_total counter", text)
+        parse_exposition(text)
+
+
+class CollectingExporter:
+    def __init__(self):
+        self.traces = []
+
+    def export(self, spans):
+        self.traces.append(list(spans))
+
+
+class TestTracing(unittest.TestCase):
+
+    def setUp(self):
+        self.exporter = CollectingExporter()
+        patch = mock.patch.object(tracing, "_exporter", self.exporter)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def test_sampling_decision(self):
+        with mock.patch.object(tracing, "TRACE_SAMPLE_RATE", 0.25), mock.patch.object(tracing, "TRACE_DEBUG", False):
+            with mock.patch.object(tracing.random, "random", return_value=0.3):
+                with tracing.start_trace("dm") as root:
+                    self.assertIsNone(root)
+                    with tracing.span("gemini") as child:
+                        self.assertIsNone(child)
+            with mock.patch.object(tracing.random, "random", return_value=0.2):
+                with tracing.start_trace("dm") as root:
+                    self.assertIsNotNone(root)
+            with mock.patch.object(tracing, "TRACE_DEBUG", True), \
+                    mock.patch.object(tracing.random, "random", return_value=0.9):
+                with tracing.start_trace("dm") as root:
+                    self.assertIsNotNone(root)
+        self.assertEqual(len(self.exporter.traces), 2)
+
+    def test_spans_link_across_threads(self):
+        with tracing.start_trace("dm", user="U1") as root:
+            with tracing.span("tool") as tool:
+                # Handoff the way k8s.py does it: run the worker in a copy of the context
+                context = contextvars.copy_context()
+                worker = threading.Thread(target=context.run, args=(self._in_worker,))
+                worker.start()
+                worker.join()
+            # Handoff the way slack_outbound does it: an explicit parent captured earlier
+            thread = threading.Thread(target=self._child_of, args=(root,))
+            thread.start()
+            thread.join()
+            self.assertIs(tracing.current_span(), root)
+        self.assertIsNone(tracing.current_span())
+
+        spans = {span.name: span for span in self.exporter.traces[0]}
+        self.assertEqual(set(spans), {"dm", "tool", "kubectl", "slack"})
+        self.assertIsNone(spans["dm"].parent_id)
+        self.assertEqual(spans["tool"].parent_id, spans["dm"].span_id)
+        self.assertEqual(spans["kubectl"].parent_id, spans["tool"].span_id)
+        self.assertEqual(spans["slack"].parent_id, spans["dm"].span_id)
+        self.assertEqual(len({span.trace.trace_id for span in spans.values()}), 1)
+        self.assertTrue(all(span.end_ns >= span.start_ns for span in spans.values()))
+
+    def _in_worker(self):
+        with tracing.span("kubectl"):
+            pass
+
+    def _child_of(self, parent):
+        with tracing.child_span(parent, "slack", channel="C1"):
+            pass
+
+    def test_errors_are_recorded(self):
+        with self.assertRaises(ValueError):
+            with tracing.start_trace("dm"):
+                with tracing.span("tool"):
+                    raise ValueError("boom")
+        self.assertEqual([span.error for span in self.exporter.traces[0]], ["boom", "boom"])
+
+    def finished_trace(self):
+        with tracing.start_trace("dm", user="U1", sampled=True) as root:
+            with tracing.span("kubectl", attempts=2, seconds=0.5):
+                pass
+        return root
+
+    def test_stdout_exporter_writes_one_span_per_line(self):
+        stream = io.StringIO()
+        root = self.finished_trace()
+        tracing.StdoutJsonExporter(stream).export(root.trace.spans)
+        records = [json.loads(line) for line in stream.getvalue().splitlines()]
+        self.assertEqual([record["name"] for record in records], ["kubectl", "dm"])
+        self.assertEqual(set(records[0]), {"trace_id", "span_id", "parent_id", "name", "start_ns", "end_ns",
+                                           "duration_ms", "attributes", "error"})
+        self.assertEqual(records[0]["parent_id"], records[1]["span_id"])
+        self.assertEqual(records[1]["attributes"], {"user": "U1", "sampled": True})
+
+    def test_otlp_file_exporter_writes_export_requests(self):
+        root = self.finished_trace()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "traces", "spans.jsonl")
+            exporter = tracing.OtlpFileExporter(path)
+            exporter.export(root.trace.spans)
+            exporter.export(root.trace.spans)
+            with open(path) as f:
+                requests = [json.loads(line) for line in f]
+        self.assertEqual(len(requests), 2)
+        resource_spans = requests[0]["resourceSpans"][0]
+        self.assertEqual(resource_spans["resource"]["attributes"],
+                         [{"key": "service.name", "value": {"stringValue": "k2sobot"}}])
+        child, parent = resource_spans["scopeSpans"][0]["spans"]
+        self.assertEqual(child["parentSpanId"], parent["spanId"])
+        self.assertNotIn("parentSpanId", parent)
+        self.assertEqual(child["attributes"], [{"key": "attempts", "value": {"intValue": "2"}},
+                                               {"key": "seconds", "value": {"doubleValue": 0.5}}])
+        self.assertEqual(parent["attributes"][1], {"key": "sampled", "value": {"boolValue": True}})
+        self.assertEqual(child["status"], {"code": 1})
+        self.assertIsInstance(child["startTimeUnixNano"], str)
+        self.assertEqual(len(child["traceId"]), 32)
+        self.assertEqual(len(child["spanId"]), 16)
+
+
+class _GatedSlack:
+    """WebClient stand-in whose first call blocks until released, so later calls queue up behind it"""
+
+    def __init__(self, failures=0):
+        self.calls = []
+        self.release = threading.Event()
+        self.failures = failures
+
+    def chat_postMessage(self, **kwargs):
+        self.calls.append(kwargs)
+        if len(self.calls) == 1:
+            self.release.wait(2)
+        if self.failures:
+            self.failures -= 1
+            response = SimpleNamespace(status_code=429, headers={"Retry-After": "0"})
+            raise SlackApiError("ratelimited", response)
+        return {"ok": True, "ts": str(len(self.calls))}
+
+    chat_update = chat_postMessage
+
+
+class TestSlackOutbound(unittest.TestCase):
+
+    def send_behind_gate(self, posts, failures=0):
+        fake = _GatedSlack(failures)
+        client = slack_outbound.OutboundSlackClient(fake, workers=1)
+        futures = [client.chat_postMessage(channel="C1", text="first")]
+        wait_until(lambda: fake.calls)
+        futures += [client.chat_postMessage(channel="C1", **post) for post in posts]
+        fake.release.set()
+        results = [future.result(timeout=2) for future in futures]
+        return fake.calls, results
+
+    def test_opted_in_posts_are_coalesced(self):
+        calls, results = self.send_behind_gate([
+            {"text": "a", "coalesce": True}, {"text": "b", "coalesce": True}, {"text": "c", "coalesce": True}])
+        self.assertEqual([call["text"] for call in calls], ["first", "a\nb\nc"])
+        self.assertEqual(results[1], results[3])
+        self.assertNotIn("coalesce", calls[1])
+
+    def test_posts_are_not_coalesced_by_default(self):
+        calls, results = self.send_behind_gate([{"text": "a"}, {"text": "b", "coalesce": True}, {"text": "c"}])
+        self.assertEqual([call["text"] for call in calls], ["first", "a", "b", "c"])
+        self.assertEqual(len({result["ts"] for result in results}), 4)
+
+    def test_rate_limited_posts_are_retried(self):
+        with mock.patch.object(slack_outbound, "_retry_after", return_value=0.01):
+            calls, results = self.send_behind_gate([], failures=2)
+        self.assertEqual(len(calls), 3)
+        self.assertTrue(results[0]["ok"])
+
+    def test_posts_to_different_channels_are_not_throttled_together(self):
+        client = slack_outbound.OutboundSlackClient(mock.Mock(**{"chat_postMessage.return_value": {"ok": True}}))
+        started = time.monotonic()
+        futures = [client.chat_postMessage(channel=f"C{i}", text="x") for i in range(40)]
+        for future in futures:
+            future.result(timeout=2)
+        self.assertLess(time.monotonic() - started, 1.0)
+
+    def test_throttled_channel_does_not_hold_up_its_shard(self):
+        fake = mock.Mock(**{"chat_postMessage.return_value": {"ok": True}})
+        with mock.patch.object(slack_outbound, "SLACK_CHANNEL_BURST", 1), \
+                mock.patch.object(slack_outbound, "SLACK_CHANNEL_RATE", 0.5):
+            client = slack_outbound.OutboundSlackClient(fake, workers=1)
+            throttled = [client.chat_postMessage(channel="C1", text=str(i)) for i in range(3)]
+            started = time.monotonic()
+            client.chat_postMessage(channel="C2", text="other").result(timeout=1)
+        self.assertLess(time.monotonic() - started, 0.5)
+        self.assertTrue(throttled[0].done())
+        self.assertFalse(throttled[1].done())
+        self.assertEqual(client.queue_depth(), 2)
+
+    def test_rate_limited_channel_does_not_hold_up_its_shard(self):
+        fake = _GatedSlack(failures=1)
+        fake.release.set()
+        with mock.patch.object(slack_outbound, "_retry_after", return_value=0.5):
+            client = slack_outbound.OutboundSlackClient(fake, workers=1)
+            limited = client.chat_postMessage(channel="C1", text="first")
+            later = client.chat_postMessage(channel="C1", text="second")
+            wait_until(lambda: fake.calls)
+            client.chat_postMessage(channel="C2", text="other").result(timeout=0.4)
+            self.assertFalse(limited.done())
+            self.assertTrue(client.flush(timeout=2))
+        self.assertEqual([call["text"] for call in fake.calls], ["first", "other", "first", "second"])
+        self.assertTrue(later.result()["ok"])
+
+
+class TestPooledWebClient(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeSocketModeServer().start()
+        self.addCleanup(self.server.stop)
+        # A fresh process-wide pool so the counts only cover this test
+        patch = mock.patch.multiple(slack_http, _session=None, _adapter=None)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def test_calls_reuse_one_connection(self):
+        client = slack_http.PooledWebClient("xoxb-test", base_url=self.server.api_url)
+        self.assertTrue(client.auth_test()["ok"])
+        for text in ("one", "two"):
+            response = client.chat_postMessage(channel="C1", text=text)
+            self.assertEqual(response["channel"], "C1")
+        self.assertEqual([call[0] for call in self.server.api_calls], ["auth.test", "chat.postMessage", "chat.postMessage"])
+        self.assertEqual(self.server.api_calls[2][1]["text"], "two")
+        self.assertEqual(self.server.api_connections, 1)
+        self.assertEqual(slack_http.pool_stats(), (1, 3))
+
+    def test_falls_back_when_the_hook_changes(self):
+        with mock.patch.object(slack_http, "_transport_hook_supported", return_value=False):
+            client = slack_http.PooledWebClient("xoxb-test", base_url=self.server.api_url)
+        self.assertIsNone(client.session)
+        client.chat_postMessage(channel="C1", text="one")
+        client.chat_postMessage(channel="C1", text="two")
+        self.assertEqual(self.server.api_connections, 2)
+        self.assertEqual(slack_http.pool_stats(), (0, 0))
+
+    def test_installed_slack_sdk_matches_the_override(self):
+        self.assertTrue(slack_http._transport_hook_supported())
+
+
+class TestResourceIndex(unittest.TestCase):
+
+    def test_prefix_matches_rank_before_substring_matches(self):
+        index = resource_index.ResourceIndex(["web-api", "Api-Gateway", "payments-api-v2", "apiary", "worker", "web-api"])
+        self.assertEqual(index.search("api"), (["Api-Gateway", "apiary", "payments-api-v2", "web-api"], 4))
+        self.assertEqual(index.search("i-g"), (["Api-Gateway"], 1))
+        self.assertEqual(index.search("ap"), (["Api-Gateway", "apiary", "payments-api-v2", "web-api"], 4))
+        self.assertEqual(index.search("zzz"), ([], 0))
+        self.assertEqual(index.search(""), (["Api-Gateway", "apiary", "payments-api-v2", "web-api", "worker"], 5))
+
+    def test_options_are_capped_at_one_hundred(self):
+        cache = resource_index.ResourceCache()
+        cache.put("pods", "prod", [f"web-{i:04d}" for i in range(250)] + ["cache-web"])
+        with mock.patch.object(handlers, "get_resource_cache", return_value=cache):
+            response = handlers.handle_block_suggestion(
+                {"action_id": "kubectl_pod_select", "block_id": "kubectl_pod_select:prod", "value": "web"})
+            narrow = handlers.handle_block_suggestion(
+                {"action_id": "kubectl_pod_select", "block_id": "kubectl_pod_select:prod", "value": "web-0249"})
+        group = response["option_groups"][0]
+        self.assertEqual(len(group["options"]), 100)
+        self.assertEqual(group["label"]["text"], "First 100 of 251 matches, keep typing")
+        self.assertEqual(group["options"][0]["value"], "web-0000")
+        self.assertEqual(narrow, {"options": [{"text": {"type": "plain_text", "text": "web-0249"}, "value": "web-0249"}]})
+
+    def test_expired_lists_are_served_while_refreshing(self):
+        loaded, release = [], threading.Event()
+
+        def slow_loader(namespace):
+            release.wait(2)
+            loaded.append(namespace)
+            return ["web-new"]
+
+        cache = resource_index.ResourceCache(ttl=0)
+        cache._loaders["pods"] = slow_loader
+        cache.put("pods", "prod", ["web-old"])
+        started = time.monotonic()
+        self.assertEqual(cache.search("pods", "prod", "web"), (["web-old"], 1))
+        self.assertEqual(cache.search("pods", "prod", "web"), (["web-old"], 1))
+        self.assertLess(time.monotonic() - started, 0.5)
+        release.set()
+        wait_until(lambda: cache._entries[("pods", "prod")][0].names == ["web-new"])
+        self.assertEqual(loaded, ["prod"])
+
+    def test_cold_miss_waits_briefly(self):
+        release = threading.Event()
+        cache = resource_index.ResourceCache()
+        cache._loaders["pods"] = lambda namespace: release.wait(2) and ["web-1"]
+        self.assertEqual(cache.get("pods", "prod", wait=0.05).names, [])
+        release.set()
+        self.assertEqual(cache.get("pods", "prod", wait=1).names, ["web-1"])
+
+
+# Names that need escaping when spliced into the pre-serialized templates
+AWKWARD_NAMES = ['web "blue"', "back\\slash\\", "tab\tand\nnewline", "unicode-🚀-é", "</script>"]
+
+
+def _option(text, value=None):
+    return {"text": {"type": "plain_text", "text": text}, "value": text if value is None else value}
+
+
+def _static_select(placeholder, options, action_id):
+    return {"type": "static_select", "placeholder": {"type": "plain_text", "text": placeholder},
+            "options": options, "action_id": action_id}
+
+
+def _section(text, accessory=None):
+    section = {"type": "section", "text": {"type": "mrkdwn", "text": text}}
+    if accessory:
+        section["accessory"] = accessory
+    return section
+
+
+class TestSlackBlocks(unittest.TestCase):
+    """Rendered templates must equal what the dict-building builders produced"""
+
+    def rendered(self, menu):
+        self.assertIsInstance(menu["blocks"], str)
+        return json.loads(menu["blocks"])
+
+    def test_kubectl_menus(self):
+        self.assertEqual(self.rendered(slack_blocks.build_kubectl_options_block('U1"x', AWKWARD_NAMES)), [
+            _section('\nHello <@U1"x>! Please select a command:\n\n', {
+                "type": "image",
+                "image_url": "https://raw.githubusercontent.com/kubernetes/kubernetes/master/logo/logo.png",
+                "alt_text": "computer thumbnail"}),
+            {"type": "actions", "elements": [_static_select(
+                "Select a command", [_option(name) for name in AWKWARD_NAMES], "kubectl_command_select")]},
+        ])
+        self.assertEqual(self.rendered(slack_blocks.build_kubectl_sub_command_block({"get": AWKWARD_NAMES}, "get")), [
+            _section("Please select a sub-command:"),
+            {"type": "actions", "elements": [_static_select(
+                "Select a sub-command", [_option(name) for name in AWKWARD_NAMES], "kubectl_sub_command_select")]},
+        ])
+        self.assertEqual(self.rendered(slack_blocks.build_kubectl_sub_command_block({}, "get"))[1]["elements"][0]["options"], [])
+
+    def test_resource_menus(self):
+        cases = [
+            (slack_blocks.build_pod_command_block, ('ns "q"\\',), "kubectl_pod_select",
+             "Please select a pod:", "Select a pod"),
+            (slack_blocks.build_deployments_command_block, ("prod",), "kubectl_deployment_select",
+             "Please select a deployment:", "Select a deployment"),
+            (slack_blocks.build_namesapces_block, (), "kubectl_namespace_select",
+             "Please select a namespace:", "Select a namespace"),
+        ]
+        for build, context, action_id, prompt, placeholder in cases:
+            block_id = f"{action_id}:{context[0] if context else ''}"
+            self.assertEqual(self.rendered(build(AWKWARD_NAMES, *context)), [
+                _section(prompt),
+                {"type": "actions", "block_id": block_id,
+                 "elements": [_static_select(placeholder, [_option(name) for name in AWKWARD_NAMES], action_id)]},
+            ])
+            many = [f'pod-"{i}"' for i in range(slack_blocks.STATIC_SELECT_LIMIT + 1)]
+            self.assertEqual(self.rendered(build(many, *context)), [
+                _section(prompt),
+                {"type": "actions", "block_id": block_id, "elements": [{
+                    "type": "external_select",
+                    "placeholder": {"type": "plain_text", "text": f"{placeholder} (101 available, type to filter)"},
+                    "min_query_length": 0,
+                    "action_id": action_id}]},
+            ])
+
+    def test_argo_menus(self):
+        self.assertEqual(self.rendered(slack_blocks.build_argo_applications_block(AWKWARD_NAMES)), [
+            _section("🚀 Please select an ArgoCD application:", {
+                "type": "image",
+                "image_url": "https://raw.githubusercontent.com/argoproj/argo-cd/master/docs/assets/logo.png",
+                "alt_text": "ArgoCD logo"}),
+            {"type": "actions", "elements": [_static_select(
+                "Select an application", [_option(name) for name in AWKWARD_NAMES], "argo_app_select")]},
+        ])
+        revisions = ["12", '3"\\']
+        self.assertEqual(self.rendered(slack_blocks.build_argo_revisions_block(revisions)), [
+            _section("🔄 Please select a revision to rollback to:"),
+            {"type": "actions", "elements": [_static_select(
+                "Select a revision", [_option(f"Revision {r}", r) for r in revisions], "argo_revision_select")]},
+        ])
+
+
+TESTING_BIN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "testing", "bin")
+
+
+def fake_cluster(**env):
+    """Put the fake kubectl/argocd from testing/bin first on PATH for the duration of a test"""
+    values = {"PATH": TESTING_BIN + os.pathsep + os.environ.get("PATH", ""), "FAKE_CLI_LATENCY": "0",
+              "FAKE_K8S_NAMESPACES": "3", "FAKE_K8S_PODS": "3"}
+    values.update(env)
+    return mock.patch.dict(os.environ, values)
+
+
+class TestPodFanOut(unittest.TestCase):
+
+    def test_failed_and_timed_out_targets_are_reported(self):
+        with fake_cluster(FAKE_CLI_FAIL="broken", FAKE_CLI_HANG="slow"):
+            started = time.monotonic()
+            result = k8s.batch_get_pods(contexts=["slow", "ok", "broken"], timeout=1)
+        self.assertLess(time.monotonic() - started, 4)
+        self.assertEqual(sorted(result["errors"]), [
+            "broken/*: error: kubectl: broken is unavailable",
+            "slow/*: timed out after 1s",
+        ])
+        self.assertEqual(len(result["rows"]), 9)
+        self.assertEqual({row["context"] for row in result["rows"]}, {"ok"})
+
+    def test_rows_are_merged_in_order_and_filtered(self):
+        # The fake cluster crash-loops every seventh pod, starting with the fourth
+        with fake_cluster(FAKE_K8S_PODS="5"):
+            result = k8s.batch_get_pods(namespaces=["team-0", "default"], contexts=["b", "a"], only_unhealthy=True)
+        self.assertEqual([(row["context"], row["namespace"], row["pod"]) for row in result["rows"]], [
+            ("a", "default", "default-api-003-7d9f"), ("a", "team-0", "team-0-api-003-7d9f"),
+            ("b", "default", "default-api-003-7d9f"), ("b", "team-0", "team-0-api-003-7d9f"),
+        ])
+        self.assertEqual(result["errors"], [])
+        self.assertEqual(result["rows"][0]["reason"], "CrashLoopBackOff")
+
+
+class TestLogSearch(unittest.TestCase):
+
+    def test_matches_are_capped_per_pod_and_interleaved(self):
+        with fake_cluster(), mock.patch.object(k8s, "K8S_LOG_SEARCH_MAX_PER_POD", 2):
+            result = k8s.search_pod_logs("app=api", "error", max_matches=5)
+        self.assertEqual(result["errors"], [])
+        self.assertEqual(result["pods_searched"], 3)
+        # 200 fake log lines per pod, every fourth one an error
+        self.assertEqual(result["matches_per_pod"], {f"default-api-00{i}-7d9f": 50 for i in range(3)})
+        self.assertEqual(result["total_matches"], 150)
+        self.assertEqual([match.split(":")[0] for match in result["matches"]], [
+            "default-api-000-7d9f", "default-api-001-7d9f", "default-api-002-7d9f",
+            "default-api-000-7d9f", "default-api-001-7d9f",
+        ])
+        self.assertTrue(all(match.endswith("ERROR upstream connect error: connection refused")
+                            for match in result["matches"]))
+
+    def test_failing_and_hanging_pods_share_one_deadline(self):
+        with fake_cluster(FAKE_CLI_FAIL="default-api-000-7d9f", FAKE_CLI_HANG="default-api-001-7d9f", FAKE_K8S_PODS="4"):
+            started = time.monotonic()
+            # One worker: the pods queued behind the hanging one must not get a fresh timeout each
+            result = k8s.search_pod_logs("app=api", "error", max_workers=1, timeout=1)
+        self.assertLess(time.monotonic() - started, 2.5)
+        self.assertEqual(result["errors"], [
+            "default-api-000-7d9f: error: kubectl: default-api-000-7d9f is unavailable",
+            "3 pod(s) stopped at the 1s deadline, results are partial",
+        ])
+        self.assertEqual(result["pods_searched"], 4)
+
+    def test_listing_failure(self):
+        with fake_cluster(FAKE_CLI_FAIL="app=missing"):
+            result = k8s.search_pod_logs("app=missing", "error")
+        self.assertIn("Could not list pods for selector app=missing", result["error"])
+
+
+class TestToolOutput(unittest.TestCase):
+
+    def test_truncation_keeps_head_tail_and_errors(self):
+        lines = [f"line {i} ok" for i in range(500)]
+        lines[250] = "line 250 ERROR connection refused"
+        capped = tool_output.truncate_text("\n".join(lines), max_tokens=200)
+        self.assertLessEqual(tool_output.estimate_tokens(capped), 260)
+        for kept in ("line 0 ok", "line 499 ok", "ERROR connection refused"):
+            self.assertIn(kept, capped)
+
+    def test_small_results_are_returned_unchanged(self):
+        result = {"pods": ["a", "b"]}
+        self.assertIs(tool_output.cap_tool_output("get_pods", result), result)
+
+
+class RecordingSlack:
+    """Stands in for the outbound Slack client: records posts and answers with a ts"""
+
+    def __init__(self):
+        self.calls = []
+
+    def _record(self, method, kwargs):
+        self.calls.append((method, kwargs))
+        future = Future()
+        future.set_result({"ts": str(len(self.calls))})
+        return future
+
+    def chat_postMessage(self, **kwargs):
+        return self._record("chat_postMessage", kwargs)
+
+    def chat_update(self, **kwargs):
+        return self._record("chat_update", kwargs)
+
+
+class FakeWatchProcess:
+    """Stands in for a `kubectl --watch` child: emits objects, then blocks until killed"""
+
+    def __init__(self, objects):
+        self.killed = threading.Event()
+        self._lines = [line + "\n" for obj in objects for line in json.dumps(obj, indent=2).splitlines()]
+
+    @property
+    def stdout(self):
+        yield from self._lines
+        self.killed.wait(2)
+
+    def kill(self):
+        self.killed.set()
+
+    def wait(self):
+        return -9
+
+
+def _deployment(name, updated, ready, generation=2):
+    return {"metadata": {"name": name, "namespace": "prod", "generation": generation},
+            "spec": {"replicas": 2},
+            "status": {"observedGeneration": generation, "replicas": 2, "updatedReplicas": updated,
+                       "readyReplicas": ready, "availableReplicas": ready}}
+
+
+class TestRolloutWatch(unittest.TestCase):
+
+    def setUp(self):
+        self.slack = RecordingSlack()
+        for patch in (mock.patch.object(shared, "slack_client", self.slack, create=True),
+                      mock.patch.object(rollout_watch, "retry_delay", return_value=0.01)):
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def test_informer_retries_when_kubectl_cannot_start(self):
+        process = FakeWatchProcess([_deployment("web", 2, 2)])
+        popen = mock.Mock(side_effect=[RuntimeError("child process limit reached"), OSError("EMFILE"), process])
+        informer, seen = rollout_watch.DeploymentInformer("prod"), []
+        with mock.patch.object(process_runner, "popen", popen):
+            informer.subscribe("web", seen.append)
+            wait_until(lambda: seen)
+        self.assertEqual(popen.call_count, 3)
+        informer.unsubscribe("web", seen.append)
+        wait_until(lambda: informer._thread is None)
+        self.assertEqual(informer.deployments, {})
+
+    def test_informer_restarts_after_an_unexpected_error(self):
+        informer = rollout_watch.DeploymentInformer("prod")
+        # The thread dies with the error; keep its traceback out of the test output
+        with mock.patch.object(process_runner, "popen", side_effect=ValueError("bad argv")), \
+                mock.patch.object(threading, "excepthook"):
+            informer.subscribe("web", lambda deployment: None)
+            wait_until(lambda: informer._thread is None)
+        process, seen = FakeWatchProcess([_deployment("web", 1, 1)]), []
+        with mock.patch.object(process_runner, "popen", return_value=process):
+            informer.subscribe("web", seen.append)
+            wait_until(lambda: seen)
+        process.kill()
+
+    def test_late_subscriber_gets_the_cached_state_without_finishing(self):
+        process = FakeWatchProcess([_deployment("web", 2, 2)])
+        informer = rollout_watch.DeploymentInformer("prod")
+        first = []
+        with mock.patch.object(process_runner, "popen", return_value=process):
+            informer.subscribe("web", first.append)
+            wait_until(lambda: first)
+            watch = rollout_watch.RolloutWatch("C1", "deployment", "Rollout of `web`", rollout_watch.deployment_progress,
+                                               lambda callback: informer.unsubscribe("web", callback))
+            with mock.patch.object(rollout_watch, "ROLLOUT_UPDATE_INTERVAL", 0):
+                informer.subscribe("web", watch.on_update)
+                informer._publish(_deployment("web", 1, 1, generation=3))
+        # The cached state looked finished but came from before the restart: only the live update counts
+        self.assertFalse(watch._finished)
+        self.assertEqual([method for method, _ in self.slack.calls], ["chat_postMessage", "chat_update"])
+        self.assertIn("updated 1/2", self.slack.calls[1][1]["text"])
+        watch.cancel("test over")
+        informer.unsubscribe("web", first.append)
+
+    def test_argo_poller_survives_failed_polls(self):
+        poller, lists = rollout_watch.ArgoPoller(interval=0.01), []
+        run = mock.Mock(side_effect=[RuntimeError("child process limit reached"), OSError("argocd not found"),
+                                     SimpleNamespace(stdout=json.dumps([{"metadata": {"name": "payments"}}]))])
+        with mock.patch("argo.ensure_argocd_login", return_value=True), mock.patch.object(process_runner, "run", run):
+            poller.subscribe_all(lists.append, 0.01)
+            wait_until(lambda: lists)
+            poller.unsubscribe_all(lists.append)
+            wait_until(lambda: poller._thread is None)
+        self.assertEqual(lists[0], [{"metadata": {"name": "payments"}}])
+
+
+class TestJobQueue(unittest.TestCase):
+
+    def setUp(self):
+        self.queue = jobs.JobQueue(max_concurrent=2)
+        self.gate = threading.Event()
+        self.addCleanup(self.gate.set)
+
+    def blocked(self, result=None):
+        def run():
+            self.gate.wait(2)
+            return result
+        return run
+
+    def test_one_job_per_application_at_a_time(self):
+        first, _ = self.queue.submit("payments", "sync", self.blocked())
+        second, _ = self.queue.submit("payments", "rollback", self.blocked(), revision="3")
+        other, _ = self.queue.submit("checkout", "sync", self.blocked())
+        wait_until(lambda: other.status == "running")
+        self.assertEqual((first.status, second.status), ("running", "queued"))
+        self.gate.set()
+        second.future.result(timeout=2)
+        self.assertLessEqual(first.finished, second.started)
+
+    def test_identical_requests_join_the_queued_job(self):
+        job, coalesced = self.queue.submit("payments", "rollback", self.blocked(), revision="3", requested_by="U1")
+        again, joined = self.queue.submit("payments", "rollback", self.blocked(), revision="3", requested_by="U2")
+        self.assertFalse(coalesced)
+        self.assertTrue(joined)
+        self.assertIs(job, again)
+        self.assertEqual(job.requested_by, ["U1", "U2"])
+
+    def test_failed_operation_marks_the_job_failed(self):
+        def fail():
+            raise jobs.JobFailed("Error: auto-sync is enabled")
+        job, _ = self.queue.submit("payments", "rollback", fail, revision="3")
+        with self.assertRaises(jobs.JobFailed):
+            job.future.result(timeout=2)
+        self.assertEqual(job.status, "failed")
+        self.assertIn("auto-sync", job.describe())
+
+
+class TestCommandExecutor(unittest.TestCase):
+
+    def test_builds_argv_lists(self):
+        self.assertEqual(command_executor.kubectl_argv("logs", name="web-1", namespace="prod"),
+                         ["kubectl", "logs", "web-1", "-n", "prod"])
+        self.assertEqual(command_executor.argocd_argv("rollback", "payments", "12"),
+                         ["argocd", "app", "rollback", "payments", "12"])
+
+    def test_rejects_flag_like_values(self):
+        for call in (lambda: command_executor.argocd_argv("rollback", "payments", "--prune"),
+                     lambda: command_executor.argocd_argv("rollback", "--dry-run", "3"),
+                     lambda: command_executor.kubectl_argv("logs", name="-p", namespace="prod"),
+                     lambda: command_executor.kubectl_argv("get", "pods", namespace="--all-namespaces")):
+            with self.assertRaises(command_executor.CommandRejected):
+                call()
+
+    def test_rejects_verbs_and_resources_outside_the_allow_list(self):
+        with self.assertRaises(command_executor.CommandRejected):
+            command_executor.kubectl_argv("delete", "pods")
+        with self.assertRaises(command_executor.CommandRejected):
+            command_executor.kubectl_argv("get", "secrets")
+        with self.assertRaises(command_executor.CommandRejected):
+            command_executor.argocd_argv("delete", "payments")
+
+    def test_accepts_namespaced_application_names(self):
+        self.assertEqual(command_executor.argocd_argv("get", "argocd/payments")[-1], "argocd/payments")
+        for name in ("a/b/c", "/payments", "Payments", "payments;rm"):
+            with self.assertRaises(command_executor.CommandRejected):
+                command_executor.argocd_argv("get", name)
+
+
+class TestProcessRunner(unittest.TestCase):
+
+    def test_output_is_capped(self):
+        result = process_runner.run(["sh", "-c", "head -c 100000 /dev/zero | tr '\\0' x"], max_output=1000)
+        self.assertTrue(result.truncated)
+        self.assertLess(len(result.stdout), 1100)
+
+    def test_timeout_kills_the_process_group(self):
+        started = time.monotonic()
+        with self.assertRaises(subprocess.TimeoutExpired) as caught:
+            # The grandchild holds stdout open; it has to die with the group for run() to return
+            process_runner.run(["sh", "-c", "sleep 30 & sleep 30"], timeout=0.3)
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertFalse(caught.exception.truncated)
+
+    def test_child_cap_raises_timeout(self):
+        with mock.patch.object(process_runner, "_children", threading.BoundedSemaphore(1)) as slots:
+            slots.acquire()
+            with self.assertRaises(subprocess.TimeoutExpired) as caught:
+                process_runner.run(["true"], timeout=0.05)
+        self.assertFalse(caught.exception.truncated)
+
+    def test_child_cap_is_reported_by_execute(self):
+        with mock.patch.object(process_runner, "_children", threading.BoundedSemaphore(1)) as slots:
+            slots.acquire()
+            result = command_executor.execute(["true"], timeout=0.05)
+        self.assertTrue(result.timed_out)
+        self.assertFalse(result.truncated)
+        self.assertFalse(result.ok)
+
+
+class TestGeminiGateway(unittest.TestCase):
+
+    def test_users_are_served_round_robin(self):
+        gateway = gemini_gateway.GeminiGateway(max_concurrent=1, tpm_limit=0)
+        gate, order, threads = threading.Event(), [], []
+
+        def call(user, label, block=False):
+            def fn():
+                if block:
+                    gate.wait(2)
+                order.append(label)
+            thread = threading.Thread(target=gateway.call, args=(fn,), kwargs={"user_id": user})
+            thread.start()
+            threads.append(thread)
+
+        call("busy", "busy", block=True)
+        wait_until(lambda: gateway._in_flight == 1)
+        for user, label in (("alice", "a1"), ("alice", "a2"), ("alice", "a3"), ("bob", "b1")):
+            call(user, label)
+            wait_until(lambda: gateway.queue_depth() == len(threads) - 1)
+        gate.set()
+        for thread in threads:
+            thread.join(2)
+        self.assertEqual(order, ["busy", "a1", "b1", "a2", "a3"])
+
+    def test_token_budget_holds_back_requests(self):
+        gateway = gemini_gateway.GeminiGateway(max_concurrent=4, tpm_limit=1000)
+        gateway.call(lambda: None, user_id="alice", estimated_tokens=800)
+        with mock.patch.object(gemini_gateway, "GEMINI_QUEUE_TIMEOUT", 0.05):
+            with self.assertRaises(gemini_gateway.GatewayBusy):
+                gateway.call(lambda: None, user_id="bob", estimated_tokens=800)
+        self.assertEqual(gateway.queue_depth(), 0)
+
+
+class _FakeModel:
+    def start_chat(self, history):
+        return SimpleNamespace(history=list(history))
+
+
+class TestChatSessions(unittest.TestCase):
+
+    def test_least_recently_used_session_is_evicted(self):
+        cache, model = chat_sessions.ChatSessionCache(max_sessions=2), _FakeModel()
+        with cache.session("alice", model) as alice:
+            pass
+        with cache.session("bob", model):
+            pass
+        with cache.session("alice", model) as again:
+            self.assertIs(again, alice)
+        with cache.session("carol", model):
+            pass
+        self.assertEqual(list(cache._sessions), ["alice", "carol"])
+
+    def test_failed_turn_discards_the_session(self):
+        cache, model = chat_sessions.ChatSessionCache(), _FakeModel()
+        with self.assertRaises(RuntimeError):
+            with cache.session("alice", model):
+                raise RuntimeError("function call without a response")
+        self.assertEqual(len(cache), 0)
+
+    def test_new_model_or_idle_session_starts_a_fresh_chat(self):
+        cache, model = chat_sessions.ChatSessionCache(idle_timeout=60), _FakeModel()
+        with cache.session("alice", model) as first:
+            pass
+        with cache.session("alice", _FakeModel()) as rebuilt:
+            self.assertIsNot(rebuilt, first)
+        cache.idle_timeout = 0
+        with cache.session("alice", model) as expired:
+            self.assertIsNot(expired, rebuilt)
+
+
+class TestIntentRouter(unittest.TestCase):
+
+    def test_routes_unambiguous_messages(self):
+        router = intent_router.IntentRouter()
+        route, match = router.match("Hey, list the pods in namespace kube-system please")
+        self.assertEqual(route.tool, "get_pods")
+        self.assertEqual(route.args(match), {"namespace": "kube-system"})
+
+    def test_ambiguous_or_long_messages_go_to_the_model(self):
+        format_result = lambda result, **_: result  # noqa: E731
+        router = intent_router.IntentRouter(routes=[
+            intent_router.Route("get_pods", [r"(list )?pods"], format_result),
+            intent_router.Route("get_deployments", [r"(list )?(pods|deployments)"], format_result),
+        ])
+        self.assertIsNone(router.match("list pods"))
+        self.assertIsNone(intent_router.IntentRouter().match("list pods " + "and more " * 20))
+
+    def test_greetings_are_only_stripped_where_they_are_filler(self):
+        router = intent_router.IntentRouter()
+        for message, namespace in (("show pods in hi", "hi"), ("Hi k2so, can you show pods in hi?", "hi"),
+                                   ("list deployments in k2so please", "k2so")):
+            route, match = router.match(message)
+            self.assertEqual(route.args(match), {"namespace": namespace}, message)
+        self.assertEqual(intent_router.normalize("Hey, what time is it? Thanks!"), "what time is it")
+
+    def test_tools_are_discovered_once_for_the_model_and_the_router(self):
+        def discover():
+            time.sleep(0.05)
+            return ["tools"]
+
+        discover_mock = mock.Mock(side_effect=discover)
+        with mock.patch.object(gemini_integration, "_tools", None), \
+                mock.patch.object(gemini_integration, "discover_and_get_tools", discover_mock):
+            threads = [threading.Thread(target=gemini_integration.get_tools) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            with gemini_integration._model_lock:
+                self.assertEqual(gemini_integration._discover_tools(), ["tools"])
+        discover_mock.assert_called_once_with()
+
+
+class TestAlerts(unittest.TestCase):
+
+    def setUp(self):
+        self.manager = alerts.AlertManager(channel="C1", namespaces=["prod"], group_window=0)
+
+    @staticmethod
+    def pod_line(restarts, waiting="", terminated=""):
+        return f"prod\tweb-7d9f8c6b5-x2k4q\tRunning\t\tapp,{restarts},{waiting},{terminated};\n"
+
+    def firings(self):
+        return sum(incident.firings for incident in self.manager.incidents.values())
+
+    def test_unchanged_lines_fire_once(self):
+        for _ in range(3):
+            self.manager.observe_pod(self.pod_line(5, "CrashLoopBackOff"))
+        self.assertEqual(self.firings(), 1)
+        self.manager.observe_pod(self.pod_line(6, "CrashLoopBackOff"))
+        self.assertEqual(self.firings(), 2)
+        self.assertEqual(list(self.manager.incidents), [("crashloop", "prod", "web")])
+
+    def test_old_oom_does_not_alert_on_start(self):
+        self.manager.observe_pod(self.pod_line(3, terminated="OOMKilled"))
+        self.assertEqual(self.manager.incidents, {})
+        self.manager.observe_pod(self.pod_line(4, terminated="OOMKilled"))
+        self.assertEqual(list(self.manager.incidents), [("oomkilled", "prod", "web")])
+
+    def test_event_messages_with_newlines(self):
+        event = {"metadata": {"namespace": "prod"}, "reason": "FailedMount", "count": 2,
+                 "involvedObject": {"kind": "Pod", "name": "web-7d9f8c6b5-x2k4q"},
+                 "message": "MountVolume.SetUp failed:\n\tsecret \"db\" not found"}
+        self.manager.observe_event(event)
+        self.manager.observe_event(event)
+        incident = self.manager.incidents[("failed_mount", "prod", "web")]
+        self.assertEqual(incident.firings, 1)
+        self.assertEqual(incident.objects["web-7d9f8c6b5-x2k4q"], 'MountVolume.SetUp failed: secret "db" not found')
+
+    def test_incident_is_posted_then_updated(self):
+        slack = RecordingSlack()
+        with mock.patch.object(shared, "slack_client", slack, create=True):
+            self.manager.observe_pod(self.pod_line(5, "CrashLoopBackOff"))
+            self.manager.flush()
+            self.manager.update_interval = 0
+            self.manager.observe_pod(self.pod_line(6, "CrashLoopBackOff"))
+            self.manager.flush()
+        self.assertEqual([method for method, _ in slack.calls], ["chat_postMessage", "chat_update"])
+        self.assertEqual(slack.calls[1][1]["ts"], "1")
+
+    def test_watch_retries_when_kubectl_cannot_start(self):
+        process = FakeWatchProcess([{"reason": "BackOff"}])
+        observed, delays = [], []
+        popen = mock.Mock(side_effect=[OSError("kubectl not found"), RuntimeError("child process cap"), process])
+        with mock.patch.object(alerts.process_runner, "popen", popen), \
+                mock.patch.object(alerts, "retry_delay", lambda failures: delays.append(failures) or 0):
+            thread = threading.Thread(target=self.manager._watch,
+                                      args=("events", ["kubectl"], alerts.iter_json_objects, observed.append))
+            thread.start()
+            wait_until(lambda: observed)
+            self.manager.stop()
+            process.kill()
+            thread.join(2)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(delays, [1, 2])
+        self.assertEqual(observed, [{"reason": "BackOff"}])
+
+    def test_post_result_is_recorded_under_the_lock(self):
+        self.manager.observe_pod(self.pod_line(5, "CrashLoopBackOff"))
+        incident = self.manager.incidents[("crashloop", "prod", "web")]
+        future = Future()
+        future.set_result({"ts": "1"})
+        with self.manager._lock:
+            thread = threading.Thread(target=self.manager._posted, args=(incident, future))
+            thread.start()
+            thread.join(0.1)
+            self.assertIsNone(incident.ts)
+        thread.join(2)
+        self.assertEqual(incident.ts, "1")
+
+
+def _application(name, sync="Synced", health="Healthy", resources=()):
+    return {"metadata": {"name": name},
+            "status": {"sync": {"status": sync, "revision": "4f2c1e9d"}, "health": {"status": health},
+                       "operationState": {"phase": "Succeeded"},
+                       "resources": [{"kind": "Deployment", "name": r, "namespace": "prod", "status": "Synced",
+                                      "health": {"status": status}} for r, status in resources]}}
+
+
+class TestArgoFeed(unittest.TestCase):
+
+    def setUp(self):
+        self.slack = RecordingSlack()
+        patch = mock.patch.object(shared, "slack_client", self.slack, create=True)
+        patch.start()
+        self.addCleanup(patch.stop)
+        self.poller = mock.Mock()
+        self.feed = argo_feed.ArgoFeed(poller=self.poller, subscriptions={"C1": {"*"}, "C2": {"checkout"}})
+
+    def test_first_list_only_seeds_state(self):
+        self.assertEqual(self.feed.on_list([_application("payments")]), {})
+        self.assertEqual(self.slack.calls, [])
+
+    def test_only_changes_are_posted_per_channel(self):
+        self.feed.on_list([_application("payments"), _application("checkout", resources=[("web", "Healthy")])])
+        changed = self.feed.on_list([_application("payments"),
+                                     _application("checkout", health="Degraded", resources=[("web", "Degraded")])])
+        self.assertEqual(list(changed), ["checkout"])
+        self.assertIn("health Healthy → Degraded", changed["checkout"][0])
+        self.assertIn("`Deployment/web` health Healthy → Degraded", changed["checkout"][1])
+        self.assertEqual(sorted(call[1]["channel"] for call in self.slack.calls), ["C1", "C2"])
+
+    def test_last_unsubscribe_stops_polling(self):
+        self.feed.unsubscribe("C1")
+        self.poller.unsubscribe_all.assert_not_called()
+        self.feed.unsubscribe("C2", "checkout")
+        self.poller.unsubscribe_all.assert_called_once_with(self.feed.on_list)
+
+
+class TestSocketModeTransport(unittest.TestCase):
+
+    def test_envelopes_are_acked_and_dispatched(self):
+        server = FakeSocketModeServer().start()
+        self.addCleanup(server.stop)
+        events, commands = [], []
+        transport = SocketModeTransport(
+            "xapp-test", WebClient("xoxb-test", base_url=server.api_url),
+            on_event=events.append, on_interaction=events.append, on_slash_command=commands.append,
+            on_options=lambda payload: {"options": [{"text": {"type": "plain_text", "text": "prod"}, "value": "prod"}]})
+        transport.start()
+        self.addCleanup(transport.close)
+        server.wait_for_connection()
+
+        envelope_id = server.send_envelope("events_api", {"event": {"type": "app_mention", "text": "hi"}})
+        self.assertEqual(server.wait_for_ack(envelope_id)["envelope_id"], envelope_id)
+        envelope_id = server.send_envelope("slash_commands", {"command": "/k2sobot", "text": "argo-feed list"})
+        server.wait_for_ack(envelope_id)
+        wait_until(lambda: events and commands)
+        self.assertEqual(events[0]["event"]["text"], "hi")
+        self.assertEqual(commands[0]["text"], "argo-feed list")
+
+        envelope_id = server.send_envelope("interactive", {"type": "block_suggestion", "value": "pr"},
+                                           accepts_response_payload=True)
+        self.assertEqual(server.wait_for_ack(envelope_id)["payload"]["options"][0]["value"], "prod")
+
+
+if __name__ == '__main__':
+    unittest.main()
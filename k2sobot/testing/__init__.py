@@ -0,0 +1 @@
+"""Local stand-ins for external services used in tests and benchmarks"""
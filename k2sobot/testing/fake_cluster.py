@@ -0,0 +1,204 @@
+"""
+Fake kubectl and argocd CLIs
+testing/bin/kubectl and testing/bin/argocd call main() here. They answer the
+commands k2sobot runs from a small synthetic cluster, after sleeping
+FAKE_CLI_LATENCY seconds to stand in for the API server round trip. Put
+testing/bin first on PATH to use them.
+
+Sizing:
+    FAKE_K8S_NAMESPACES   namespaces in the cluster (default 8)
+    FAKE_K8S_PODS         pods per namespace (default 20)
+    FAKE_ARGO_APPS        Argo CD applications (default 12)
+
+Failures, for tests:
+    FAKE_CLI_FAIL         comma-separated names (namespace, context, pod, app...);
+                          a command with one of them as an argument exits 1
+    FAKE_CLI_HANG         same, but the command sleeps for a minute instead
+"""
+import json
+import os
+import sys
+import time
+
+FAKE_CLI_LATENCY = float(os.getenv("FAKE_CLI_LATENCY", "0.05"))
+FAKE_K8S_NAMESPACES = int(os.getenv("FAKE_K8S_NAMESPACES", "8"))
+FAKE_K8S_PODS = int(os.getenv("FAKE_K8S_PODS", "20"))
+FAKE_ARGO_APPS = int(os.getenv("FAKE_ARGO_APPS", "12"))
+FAKE_CLI_FAIL = set(filter(None, os.getenv("FAKE_CLI_FAIL", "").split(",")))
+FAKE_CLI_HANG = set(filter(None, os.getenv("FAKE_CLI_HANG", "").split(",")))
+
+LOG_LINES = [
+    "INFO  request served path=/api/orders status=200 duration=12ms",
+    "INFO  request served path=/healthz status=200 duration=1ms",
+    "WARN  slow query table=orders duration=850ms",
+    "ERROR upstream connect error: connection refused",
+]
+
+
+def namespaces():
+    return ["default", "kube-system"] + [f"team-{i}" for i in range(FAKE_K8S_NAMESPACES - 2)]
+
+
+def pods(namespace):
+    return [f"{namespace}-api-{i:03d}-7d9f" for i in range(FAKE_K8S_PODS)]
+
+
+def deployments(namespace):
+    return [f"{namespace}-api", f"{namespace}-worker"]
+
+
+def applications():
+    return [f"app-{i:02d}" for i in range(FAKE_ARGO_APPS)]
+
+
+def _pod_object(namespace, name, index):
+    crashing = index % 7 == 3
+    return {
+        "metadata": {"name": name, "namespace": namespace},
+        "status": {
+            "phase": "Running",
+            "containerStatuses": [{
+                "name": "app",
+                "ready": not crashing,
+                "restartCount": 12 if crashing else 0,
+                "state": {"waiting": {"reason": "CrashLoopBackOff"}} if crashing else {"running": {}},
+            }],
+        },
+    }
+
+
+def _pod_watch_line(pod):
+    statuses = "".join(
+        f"{c['name']},{c['restartCount']},{c['state'].get('waiting', {}).get('reason', '')},;"
+        for c in pod["status"]["containerStatuses"])
+    return f"{pod['metadata']['namespace']}\t{pod['metadata']['name']}\t{pod['status']['phase']}\t\t{statuses}\n"
+
+
+def _option(args, flag, default=None):
+    if flag in args:
+        index = args.index(flag)
+        if index + 1 < len(args):
+            return args[index + 1]
+    return default
+
+
+def _names(items, args):
+    text = " ".join(items)
+    # k2sobot quotes its jsonpath expressions, so kubectl echoes the quotes
+    if any(arg.startswith("jsonpath='") for arg in args):
+        return f"'{text}'"
+    return text
+
+
+def kubectl(args):
+    namespace = _option(args, "-n", "default")
+    words = [arg for arg in args if not arg.startswith("-")]
+
+    if words[:2] == ["config", "get-contexts"]:
+        return "fake-cluster\n"
+    if words[:2] == ["get", "namespaces"] or words[:2] == ["get", "ns"]:
+        return _names(namespaces(), args) if "-o" in args else "\n".join(namespaces())
+    if words[:2] == ["get", "deployments"]:
+        if "--watch" in args:
+            return "\n".join(json.dumps(_deployment(namespace, name), indent=2) for name in deployments(namespace)) + "\n"
+        return _names(deployments(namespace), args)
+    if words[:2] == ["get", "pods"]:
+        if "--watch" in args:
+            # Rendered as alerts.POD_TEMPLATE would be
+            spaces = namespaces() if "--all-namespaces" in args else [namespace]
+            return "".join(_pod_watch_line(_pod_object(ns, name, i)) for ns in spaces for i, name in enumerate(pods(ns)))
+        if _option(args, "-o") == "json":
+            spaces = namespaces() if "--all-namespaces" in args else [namespace]
+            items = [_pod_object(ns, name, i) for ns in spaces for i, name in enumerate(pods(ns))]
+            return json.dumps({"items": items})
+        if "-o" in args:
+            return _names(pods(namespace), args)
+        lines = ["NAME                          READY   STATUS    RESTARTS   AGE"]
+        lines += [f"{name:<30}1/1     Running   0          3d" for name in pods(namespace)]
+        return "\n".join(lines) + "\n"
+    if words[:2] == ["get", "pod"] and _option(args, "-o") == "json":
+        return json.dumps(_pod_object(namespace, words[2], 0))
+    if words[:2] == ["get", "events"]:
+        if "--watch" in args:
+            event = {"metadata": {"namespace": namespace}, "type": "Warning", "reason": "FailedScheduling", "count": 1,
+                     "involvedObject": {"kind": "Pod", "name": pods(namespace)[0]},
+                     "message": "0/3 nodes are available:\n3 Insufficient cpu."}
+            return json.dumps(event, indent=2) + "\n"
+        return json.dumps({"items": []})
+    if words[:2] == ["get", "nodes"]:
+        return "NAME     STATUS   ROLES           AGE   VERSION\nnode-1   Ready    control-plane   30d   v1.29.0\n"
+    if words[:2] == ["get", "services"]:
+        return f"NAME         TYPE        CLUSTER-IP   PORT(S)\n{namespace}-api   ClusterIP   10.0.0.10    80/TCP\n"
+    if words[:1] == ["describe"]:
+        name = words[2] if len(words) > 2 else "unknown"
+        return f"Name:         {name}\nNamespace:    {namespace}\nStatus:       Running\nEvents:       <none>\n"
+    if words[:1] == ["logs"]:
+        tail = int(_option(args, "--tail", "200"))
+        return "\n".join(LOG_LINES[i % len(LOG_LINES)] for i in range(tail)) + "\n"
+    if words[:2] == ["rollout", "restart"]:
+        return f"deployment.apps/{words[3]} restarted\n"
+    raise SystemExit(f"fake kubectl: unsupported command: {' '.join(args)}")
+
+
+def _deployment(namespace, name):
+    return {
+        "metadata": {"name": name, "namespace": namespace, "generation": 2},
+        "spec": {"replicas": 2},
+        "status": {"observedGeneration": 2, "replicas": 2, "updatedReplicas": 2,
+                   "readyReplicas": 2, "availableReplicas": 2},
+    }
+
+
+def _application(name):
+    return {
+        "metadata": {"name": name},
+        "status": {
+            "sync": {"status": "Synced", "revision": "4f2c1e9"},
+            "health": {"status": "Healthy"},
+            "operationState": {"phase": "Succeeded", "startedAt": "2024-01-01T00:00:00Z"},
+            "resources": [],
+        },
+    }
+
+
+def argocd(args):
+    words = [arg for arg in args if not arg.startswith("-")]
+    if words[:2] == ["account", "get-user-info"]:
+        return "Logged In: true\nUsername: admin\n"
+    if words[:1] == ["login"]:
+        return "'admin:login' logged in successfully\n"
+    if len(words) < 2 or words[0] != "app":
+        raise SystemExit(f"fake argocd: unsupported command: {' '.join(args)}")
+
+    verb, app = words[1], words[2] if len(words) > 2 else None
+    output = _option(args, "-o")
+    if verb == "list":
+        if output == "json":
+            return json.dumps([_application(name) for name in applications()])
+        return "\n".join(applications()) + "\n"
+    if verb == "get":
+        if output == "json":
+            return json.dumps(_application(app))
+        return f"Name:               {app}\nSync Status:        Synced to HEAD (4f2c1e9)\nHealth Status:      Healthy\n"
+    if verb == "history":
+        if output == "id":
+            return "\n".join(str(i) for i in range(10, 0, -1)) + "\n"
+        return "ID  DATE                           REVISION\n" + "\n".join(
+            f"{i:<3} 2024-01-{i:02d} 10:00:00 +0000 UTC  {i:07x}" for i in range(10, 0, -1)) + "\n"
+    if verb in ("sync", "rollback"):
+        return f"Name: {app}\nOperation: {verb.capitalize()}\nPhase: Succeeded\n"
+    raise SystemExit(f"fake argocd: unsupported command: {' '.join(args)}")
+
+
+def main(program):
+    time.sleep(FAKE_CLI_LATENCY)
+    args = set(sys.argv[1:])
+    if args & FAKE_CLI_HANG:
+        time.sleep(60)
+    failing = args & FAKE_CLI_FAIL
+    if failing:
+        sys.stderr.write(f"error: {program}: {', '.join(sorted(failing))} is unavailable\n")
+        raise SystemExit(1)
+    output = {"kubectl": kubectl, "argocd": argocd}[program](sys.argv[1:])
+    sys.stdout.write(output)
+    sys.stdout.flush()
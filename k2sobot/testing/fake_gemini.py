@@ -0,0 +1,103 @@
+"""
+Local fake Gemini API server
+Answers generateContent over the REST transport with scripted responses, so
+gemini_integration runs its real request/response path without the network.
+Point the bot at it with GEMINI_API_ENDPOINT=server.endpoint.
+
+A user message matching one of the script's patterns gets a functionCall for
+that tool; a functionResponse gets a short text answer; anything else gets a
+plain text reply. Each response waits latency seconds first.
+
+Example:
+    server = FakeGeminiServer(latency=0.4).start()
+    os.environ["GEMINI_API_ENDPOINT"] = server.endpoint
+"""
+import http.server
+import json
+import re
+import threading
+import time
+
+# (pattern over the user's text, tool to call, arguments)
+DEFAULT_SCRIPT = [
+    (r"\bpods?\b.*\b(in|namespace)\s+(?P<namespace>[a-z0-9-]+)", "get_pods", ("namespace",)),
+    (r"\bnamespaces?\b", "get_namespaces", ()),
+    (r"\bdeployments?\b", "get_deployments", ()),
+    (r"\b(argo|applications?|apps)\b", "get_applications", ()),
+    (r"\bunhealthy\b|\bcrash", "find_pods", ()),
+]
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        server = self.server.fake
+        body = json.loads(self.rfile.read(int(self.headers.get("content-length", 0) or 0)) or b"{}")
+        with server._lock:
+            server.requests += 1
+        if server.latency:
+            time.sleep(server.latency)
+
+        data = json.dumps(server.respond(body.get("contents", []))).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _ThreadingServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+
+class FakeGeminiServer:
+    """Scripted stand-in for generativelanguage.googleapis.com"""
+
+    def __init__(self, script=DEFAULT_SCRIPT, latency=0.0, host="127.0.0.1", port=0):
+        self.script = [(re.compile(pattern, re.IGNORECASE), tool, args) for pattern, tool, args in script]
+        self.latency = latency
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = _ThreadingServer((host, port), _Handler)
+        self._server.fake = self
+        self.host, self.port = self._server.server_address[:2]
+
+    @property
+    def endpoint(self):
+        """api_endpoint to give the REST transport"""
+        return f"http://{self.host}:{self.port}"
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, name="fake-gemini", daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def respond(self, contents):
+        """Build a generateContent response for the conversation so far"""
+        last = contents[-1]["parts"][0] if contents and contents[-1].get("parts") else {}
+        if "functionResponse" in last:
+            name = last["functionResponse"].get("name", "")
+            result = json.dumps(last["functionResponse"].get("response", {}))
+            return _response({"text": f"Here is what `{name}` returned:\n{result[:1500]}"})
+
+        text = last.get("text", "")
+        for pattern, tool, arg_names in self.script:
+            match = pattern.search(text)
+            if match:
+                args = {name: match.group(name) for name in arg_names}
+                return _response({"functionCall": {"name": tool, "args": args}})
+        return _response({"text": f"You said: {text[:200]}"})
+
+
+def _response(part):
+    return {
+        "candidates": [{"content": {"role": "model", "parts": [part]}, "finishReason": "STOP", "index": 0}],
+        "usageMetadata": {"promptTokenCount": 900, "candidatesTokenCount": 60, "totalTokenCount": 960},
+    }
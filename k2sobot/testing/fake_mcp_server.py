@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""
+Fake MCP server for local benchmarks
+Speaks the one-request-per-process JSON-RPC protocol MCPClient uses over
+stdio: tools/list returns a single echo tool and tools/call echoes its
+arguments back.
+"""
+import json
+import sys
+
+TOOLS = [{
+    "name": "echo",
+    "description": "Echo the arguments back",
+    "inputSchema": {"type": "object", "properties": {"text": {"type": "string"}}},
+}]
+
+
+def handle(request):
+    method = request.get("method")
+    if method == "tools/list":
+        result = {"tools": TOOLS}
+    elif method == "tools/call":
+        arguments = request.get("params", {}).get("arguments", {})
+        result = {"content": [{"type": "text", "text": json.dumps(arguments)}]}
+    else:
+        return {"jsonrpc": "2.0", "id": request.get("id"), "error": {"code": -32601, "message": f"Unknown method {method}"}}
+    return {"jsonrpc": "2.0", "id": request.get("id"), "result": result}
+
+
+if __name__ == "__main__":
+    for line in sys.stdin:
+        if line.strip():
+            sys.stdout.write(json.dumps(handle(json.loads(line))) + "\n")
+            sys.stdout.flush()
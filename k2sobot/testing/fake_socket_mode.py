@@ -0,0 +1,239 @@
+"""
+Local fake Slack Socket Mode server
+Serves apps.connections.open plus a minimal WebSocket endpoint on one port, so
+SocketModeTransport can be exercised without Slack. Any other Web API method
+answers {"ok": true} and is recorded in api_calls. Web API connections are
+kept alive, and api_connections counts how many were opened.
+
+Example:
+    server = FakeSocketModeServer()
+    server.start()
+    web_client = WebClient("xoxb-test", base_url=server.api_url)
+    transport = SocketModeTransport("xapp-test", web_client, on_event, on_interaction, on_slash_command)
+    transport.start()
+    server.wait_for_connection()
+    envelope_id = server.send_envelope("events_api", {"event": {"type": "app_mention", ...}})
+    ack = server.wait_for_ack(envelope_id)
+"""
+import base64
+import hashlib
+import json
+import queue
+import socket
+import socketserver
+import struct
+import threading
+import uuid
+from urllib.parse import parse_qsl
+
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+OPCODE_TEXT = 0x1
+OPCODE_CLOSE = 0x8
+OPCODE_PING = 0x9
+OPCODE_PONG = 0xA
+
+
+class _WebSocketConnection:
+    """Server side of one WebSocket connection"""
+
+    def __init__(self, sock):
+        self.sock = sock
+        self._send_lock = threading.Lock()
+        self.closed = False
+
+    def send_frame(self, opcode, data=b""):
+        header = bytes([0x80 | opcode])
+        length = len(data)
+        if length < 126:
+            header += bytes([length])
+        elif length < 65536:
+            header += bytes([126]) + struct.pack("!H", length)
+        else:
+            header += bytes([127]) + struct.pack("!Q", length)
+        with self._send_lock:
+            self.sock.sendall(header + data)
+
+    def send_text(self, text):
+        self.send_frame(OPCODE_TEXT, text.encode("utf-8"))
+
+    def read_frame(self, rfile):
+        """Return (opcode, payload) or (None, b"") when the peer went away"""
+        head = rfile.read(2)
+        if len(head) < 2:
+            return None, b""
+        opcode = head[0] & 0x0F
+        masked = head[1] & 0x80
+        length = head[1] & 0x7F
+        if length == 126:
+            length = struct.unpack("!H", rfile.read(2))[0]
+        elif length == 127:
+            length = struct.unpack("!Q", rfile.read(8))[0]
+        mask = rfile.read(4) if masked else b""
+        payload = rfile.read(length)
+        if masked:
+            payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+        return opcode, payload
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        counted = False
+        while True:
+            request_line = self.rfile.readline().decode("latin-1").strip()
+            if not request_line:
+                return
+            _, path, _ = request_line.split(" ", 2)
+            headers = {}
+            while True:
+                line = self.rfile.readline().decode("latin-1")
+                if line in ("\r\n", "\n", ""):
+                    break
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+
+            if headers.get("upgrade", "").lower() == "websocket":
+                self._handle_websocket(headers)
+                return
+            if not counted:
+                self.server.fake.api_connections += 1
+                counted = True
+            body = self.rfile.read(int(headers.get("content-length", 0) or 0))
+            keep_alive = headers.get("connection", "").lower() != "close"
+            self._handle_api_call(path, headers, body, keep_alive)
+            if not keep_alive:
+                return
+
+    def _handle_api_call(self, path, headers, body, keep_alive):
+        server = self.server.fake
+        method = path.split("?")[0].rsplit("/", 1)[-1]
+        if headers.get("content-type", "").startswith("application/json"):
+            params = json.loads(body or b"{}")
+        else:
+            params = dict(parse_qsl(body.decode("utf-8")))
+        server.api_calls.append((method, params))
+
+        if method == "apps.connections.open":
+            response = {"ok": True, "url": f"ws://{server.host}:{server.port}/link/?ticket={uuid.uuid4()}"}
+        elif method == "auth.test":
+            response = {"ok": True, "user_id": "UFAKEBOT", "bot_id": "BFAKEBOT", "team_id": "TFAKE"}
+        else:
+            response = {"ok": True, "channel": params.get("channel"), "ts": f"{len(server.api_calls)}.000000"}
+
+        data = json.dumps(response).encode("utf-8")
+        self.wfile.write(
+            b"HTTP/1.1 200 OK\r\n"
+            b"Content-Type: application/json; charset=utf-8\r\n"
+            + f"Content-Length: {len(data)}\r\n".encode("ascii")
+            + (b"Connection: keep-alive\r\n\r\n" if keep_alive else b"Connection: close\r\n\r\n")
+            + data
+        )
+
+    def _handle_websocket(self, headers):
+        server = self.server.fake
+        accept = base64.b64encode(
+            hashlib.sha1((headers["sec-websocket-key"] + WEBSOCKET_GUID).encode("ascii")).digest()
+        ).decode("ascii")
+        self.wfile.write(
+            b"HTTP/1.1 101 Switching Protocols\r\n"
+            b"Upgrade: websocket\r\n"
+            b"Connection: Upgrade\r\n"
+            + f"Sec-WebSocket-Accept: {accept}\r\n\r\n".encode("ascii")
+        )
+        connection = _WebSocketConnection(self.connection)
+        connection.send_text(json.dumps({
+            "type": "hello",
+            "num_connections": 1,
+            "connection_info": {"app_id": "AFAKEAPP"},
+        }))
+        server._connected(connection)
+
+        while not connection.closed:
+            try:
+                opcode, payload = connection.read_frame(self.rfile)
+            except (OSError, struct.error):
+                break
+            if opcode is None:
+                break
+            if opcode == OPCODE_PING:
+                connection.send_frame(OPCODE_PONG, payload)
+            elif opcode == OPCODE_TEXT:
+                server.acks.put(json.loads(payload.decode("utf-8")))
+            elif opcode == OPCODE_CLOSE:
+                connection.send_frame(OPCODE_CLOSE, payload[:2])
+                break
+        connection.closed = True
+
+
+class _ThreadingServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class FakeSocketModeServer:
+    """Fake Slack Web API + Socket Mode WebSocket endpoint"""
+
+    def __init__(self, host="127.0.0.1", port=0):
+        self._server = _ThreadingServer((host, port), _Handler)
+        self._server.fake = self
+        self.host, self.port = self._server.server_address[:2]
+        self.api_calls = []
+        self.api_connections = 0
+        self.acks = queue.Queue()
+        self._connection = None
+        self._connected_event = threading.Event()
+        self._pending_acks = {}
+
+    @property
+    def api_url(self):
+        """base_url to give a WebClient"""
+        return f"http://{self.host}:{self.port}/api/"
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, name="fake-socket-mode", daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._connection is not None and not self._connection.closed:
+            try:
+                self._connection.send_frame(OPCODE_CLOSE, struct.pack("!H", 1000))
+            except OSError:
+                pass
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _connected(self, connection):
+        self._connection = connection
+        self._connected_event.set()
+
+    def wait_for_connection(self, timeout=5):
+        if not self._connected_event.wait(timeout):
+            raise TimeoutError("Socket Mode client did not connect")
+
+    def send_envelope(self, envelope_type, payload, envelope_id=None, accepts_response_payload=False):
+        """Push an envelope (events_api, interactive, slash_commands) to the connected client"""
+        if self._connection is None:
+            raise RuntimeError("No Socket Mode client connected")
+        envelope_id = envelope_id or str(uuid.uuid4())
+        self._connection.send_text(json.dumps({
+            "envelope_id": envelope_id,
+            "type": envelope_type,
+            "payload": payload,
+            "accepts_response_payload": accepts_response_payload,
+            "retry_attempt": 0,
+            "retry_reason": "",
+        }))
+        return envelope_id
+
+    def wait_for_ack(self, envelope_id, timeout=5):
+        """Block until the client acknowledges the envelope; returns the ack message"""
+        if envelope_id in self._pending_acks:
+            return self._pending_acks.pop(envelope_id)
+        try:
+            while True:
+                ack = self.acks.get(timeout=timeout)
+                if ack.get("envelope_id") == envelope_id:
+                    return ack
+                self._pending_acks[ack.get("envelope_id")] = ack
+        except queue.Empty:
+            raise TimeoutError(f"No ack for envelope {envelope_id}")
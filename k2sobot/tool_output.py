@@ -0,0 +1,115 @@
+"""
+Token caps for tool results sent back to Gemini
+Oversized results are cut down to a per-tool budget. Text keeps its first and
+last lines plus the lines most likely to matter (errors, warnings, failures);
+dicts and lists are trimmed field by field so their structure survives.
+"""
+import json
+import logging
+import os
+import re
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Default budget for one tool result, in estimated tokens
+K2SOBOT_TOOL_OUTPUT_MAX_TOKENS = int(os.getenv("K2SOBOT_TOOL_OUTPUT_MAX_TOKENS", "1500"))
+
+# Per-tool overrides, e.g. {"get_pod_logs": 2500}
+TOOL_OUTPUT_LIMITS = {}
+
+# Rough token estimate: Gemini averages about four characters per token
+CHARS_PER_TOKEN = 4
+
+# Lines always kept at each end of truncated text
+HEAD_LINES = 5
+TAIL_LINES = 10
+
+RELEVANT_LINE = re.compile(
+    r"error|exception|fail|fatal|panic|traceback|warn|denied|refused|timeout|timed out|"
+    r"oomkilled|killed|backoff|crashloop|unhealthy|degraded|outofsync|evicted|not ready",
+    re.IGNORECASE)
+
+TOOL_OUTPUT_TRUNCATED_TOTAL = metrics.Counter(
+    "k2sobot_tool_output_truncated_total", "Tool results truncated to fit the token cap", ["tool"])
+
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def truncate_text(text, max_tokens):
+    """Cut text to max_tokens, keeping head, tail and relevant lines in their original order"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+
+    budget = max_tokens * CHARS_PER_TOKEN
+    lines = text.splitlines()
+    if len(lines) <= 1:
+        return text[:budget] + f" ... [{len(text) - budget} chars truncated]"
+
+    # Priority: head, tail, then relevant lines newest first, then everything else newest first
+    head = range(min(HEAD_LINES, len(lines)))
+    tail = range(max(len(lines) - TAIL_LINES, 0), len(lines))
+    middle = range(len(lines) - 1, -1, -1)
+    relevant = [i for i in middle if RELEVANT_LINE.search(lines[i])]
+    ordered = list(head) + list(reversed(tail)) + relevant + list(middle)
+
+    keep, used = set(), 0
+    for i in ordered:
+        if i in keep:
+            continue
+        cost = len(lines[i]) + 1
+        if used + cost > budget:
+            continue
+        keep.add(i)
+        used += cost
+
+    result, skipped = [], 0
+    for i, line in enumerate(lines):
+        if i in keep:
+            if skipped:
+                result.append(f"... [{skipped} lines omitted]")
+                skipped = 0
+            result.append(line)
+        else:
+            skipped += 1
+    if skipped:
+        result.append(f"... [{skipped} lines omitted]")
+    return "\n".join(result)
+
+
+def _cap_value(value, max_tokens):
+    if isinstance(value, str):
+        return truncate_text(value, max_tokens)
+    if estimate_tokens(json.dumps(value, default=str)) <= max_tokens:
+        return value
+
+    if isinstance(value, dict):
+        # Split the budget evenly; small fields keep everything
+        share = max(max_tokens // max(len(value), 1), 20)
+        return {key: _cap_value(item, share) for key, item in value.items()}
+
+    if isinstance(value, (list, tuple)):
+        kept, used = [], 0
+        for item in value:
+            cost = estimate_tokens(json.dumps(item, default=str))
+            if used + cost > max_tokens:
+                kept.append(f"... [{len(value) - len(kept)} more items omitted]")
+                break
+            kept.append(item)
+            used += cost
+        return kept
+
+    return value
+
+
+def cap_tool_output(tool_name, result):
+    """Return result trimmed to the tool's token budget"""
+    max_tokens = TOOL_OUTPUT_LIMITS.get(tool_name, K2SOBOT_TOOL_OUTPUT_MAX_TOKENS)
+    capped = _cap_value(result, max_tokens)
+    if capped is not result and capped != result:
+        TOOL_OUTPUT_TRUNCATED_TOTAL.inc(tool=tool_name)
+        logger.info(f"✂️ Truncated {tool_name} output to ~{max_tokens} tokens")
+    return capped
@@ -1,11 +1,17 @@
 """
 ArgoCD tools - thin wrapper around argo.py
 """
+import json
 import logging
 import subprocess
 import os
+from concurrent.futures import TimeoutError as FuturesTimeout
 from functools import wraps
 import argo
+import command_executor
+import jobs
+import metrics
+import process_runner
 
 logger = logging.getLogger(__name__)
 
@@ -15,12 +21,16 @@ ARGOCD_USERNAME = os.getenv("ARGOCD_USERNAME", "admin")
 ARGOCD_PASSWORD = os.getenv("ARGOCD_PASSWORD", "BNoWRv-jt3UtMMaS")
 ARGOCD_INSECURE = os.getenv("ARGOCD_INSECURE", "true").lower() == "true"
 
+# How long the sync tool waits for its job before reporting it as still running
+SYNC_WAIT_TIMEOUT = float(os.getenv("SYNC_WAIT_TIMEOUT", "60"))
+
 def ensure_argocd_login():
     """Ensure ArgoCD is logged in before executing commands"""
     try:
         # Check if already logged in
         check_command = ["argocd", "account", "get-user-info"]
-        result = subprocess.run(check_command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=10)
+        with metrics.ARGOCD_SECONDS.time(subcommand="account get-user-info"):
+            result = process_runner.run(check_command, timeout=10)
 
         if result.returncode == 0 and "Logged In: true" in result.stdout:
             logger.info("ArgoCD already authenticated")
@@ -33,7 +43,8 @@ def ensure_argocd_login():
         if ARGOCD_INSECURE:
             login_command.append("--insecure")
 
-        login_result = subprocess.run(login_command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=15)
+        with metrics.ARGOCD_SECONDS.time(subcommand="login"):
+            login_result = process_runner.run(login_command, timeout=15)
 
         if login_result.returncode == 0:
             logger.info("ArgoCD login successful")
@@ -70,47 +81,112 @@ def get_application_revisions(app_name):
 
 
 @require_argocd_auth
-def get_application_status(app_name):
-    """Get ArgoCD application status"""
+def get_application_status(app_name, full=False):
+    """Get ArgoCD application sync/health status and any out-of-sync or unhealthy resources; set full=True for raw argocd output"""
     try:
-        command = ["argocd", "app", "get", app_name]
-        result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=True, timeout=15)
-        return result.stdout.strip()
+        command = command_executor.argocd_argv("get", app_name)
+        if not full:
+            command += ["-o", "json"]
+        with metrics.ARGOCD_SECONDS.time(subcommand="app get"):
+            result = process_runner.run(command, check=True, timeout=15)
+        if full:
+            return result.stdout.strip()
+        return _summarize_application(json.loads(result.stdout))
     except subprocess.TimeoutExpired:
         return "Error: Timeout getting application status"
     except subprocess.CalledProcessError as e:
+        metrics.ERRORS_TOTAL.inc(component="argocd")
         return f"Error: {e.stderr}"
     except Exception as e:
         return f"Error: {str(e)}"
 
 
+def _summarize_application(app, max_resources=20):
+    """Compact view of an ArgoCD Application object"""
+    spec = app.get("spec", {})
+    status = app.get("status", {})
+    source = spec.get("source", {})
+    operation = status.get("operationState", {})
+    problems = [
+        f"{r.get('kind')}/{r.get('name')}: sync={r.get('status')} health={r.get('health', {}).get('status', '-')}"
+        + (f" ({r['health']['message']})" if r.get("health", {}).get("message") else "")
+        for r in status.get("resources", [])
+        if r.get("status") != "Synced" or r.get("health", {}).get("status", "Healthy") != "Healthy"
+    ]
+    return {
+        "name": app.get("metadata", {}).get("name"),
+        "sync_status": status.get("sync", {}).get("status"),
+        "health_status": status.get("health", {}).get("status"),
+        "revision": status.get("sync", {}).get("revision"),
+        "source": f"{source.get('repoURL')} {source.get('path', '')}@{source.get('targetRevision', 'HEAD')}",
+        "destination": f"{spec.get('destination', {}).get('server')}/{spec.get('destination', {}).get('namespace')}",
+        "last_operation": f"{operation.get('phase')}: {operation.get('message', '')}" if operation else None,
+        "conditions": [f"{c.get('type')}: {c.get('message')}" for c in status.get("conditions", [])],
+        "problem_resources": problems[:max_resources],
+        "problem_resource_count": len(problems),
+    }
+
+
 @require_argocd_auth
 def get_application_history(app_name):
     """Get ArgoCD application revision history"""
     try:
-        command = ["argocd", "app", "history", app_name]
-        result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=True, timeout=15)
+        command = command_executor.argocd_argv("history", app_name)
+        with metrics.ARGOCD_SECONDS.time(subcommand="app history"):
+            result = process_runner.run(command, check=True, timeout=15)
         return result.stdout.strip()
     except subprocess.TimeoutExpired:
         return "Error: Timeout getting application history"
     except subprocess.CalledProcessError as e:
+        metrics.ERRORS_TOTAL.inc(component="argocd")
         return f"Error: {e.stderr}"
     except Exception as e:
         return f"Error: {str(e)}"
 
 
-@require_argocd_auth
 def sync_application(app_name, revision=None):
-    """Sync ArgoCD application with optional revision"""
+    """Sync ArgoCD application with optional revision. Runs as a queued job: one operation per application at a time, identical requests share one job"""
+    job, coalesced = jobs.submit(app_name, "sync", lambda: _sync_job(app_name, revision), revision=revision)
+    try:
+        output = job.future.result(timeout=SYNC_WAIT_TIMEOUT)
+    except FuturesTimeout:
+        return f"{job.describe()}. Check progress with get_job_status('{job.id}')."
+    except Exception:
+        return job.describe()
+    prefix = f"(Joined an identical request already in progress, job {job.id})\n" if coalesced else ""
+    return prefix + output
+
+
+def get_job_status(job_id=""):
+    """Get the status of ArgoCD sync/rollback jobs; leave job_id empty to list recent jobs"""
+    queue = jobs.get_job_queue()
+    if job_id:
+        job = queue.get(job_id)
+        return job.describe() if job else f"No job with id {job_id}"
+    return [job.describe() for job in queue.list_jobs()[:20]] or "No recent jobs"
+
+
+def _sync_job(app_name, revision=None):
+    """Job body: fails the job when the sync reports an error, so its status is truthful"""
+    output = _run_sync(app_name, revision)
+    if output.startswith("Error"):
+        raise jobs.JobFailed(output)
+    return output
+
+
+@require_argocd_auth
+def _run_sync(app_name, revision=None):
     try:
-        command = ["argocd", "app", "sync", app_name]
+        command = command_executor.argocd_argv("sync", app_name)
         if revision:
-            command.extend(["--revision", revision])
-        result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=True, timeout=30)
+            command.extend(["--revision", command_executor.validate_revision(revision)])
+        with metrics.ARGOCD_SECONDS.time(subcommand="app sync"):
+            result = process_runner.run(command, check=True, timeout=30)
         return result.stdout.strip()
     except subprocess.TimeoutExpired:
         return "Error: Timeout syncing application"
     except subprocess.CalledProcessError as e:
+        metrics.ERRORS_TOTAL.inc(component="argocd")
         return f"Error: {e.stderr}"
     except Exception as e:
-        return f"Error: {str(e)}"
\ No newline at end of file
+        return f"Error: {str(e)}"
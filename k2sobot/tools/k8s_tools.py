@@ -1,9 +1,13 @@
 """
 Kubernetes tools - thin wrapper around k8s.py
 """
+import json
 import logging
 import subprocess
 import k8s
+import metrics
+import process_runner
+import tool_output
 
 logger = logging.getLogger(__name__)
 
@@ -23,29 +27,123 @@ def get_deployments(namespace="default"):
     return k8s.get_deployments(namespace)
 
 
-def get_pod_logs(pod_name, namespace="default", lines=50):
-    """Get logs from a pod"""
+def find_pods(namespaces="", contexts="", only_unhealthy=True):
+    """Find pods across many namespaces and clusters at once, e.g. crashlooping or not-ready pods anywhere.
+    namespaces and contexts are comma-separated lists; leave empty for all namespaces / current context, or use "all" for every kubeconfig context."""
+    namespace_list = [n.strip() for n in namespaces.split(",") if n.strip()]
+    if contexts.strip() == "all":
+        context_list = k8s.get_contexts()
+    else:
+        context_list = [c.strip() for c in contexts.split(",") if c.strip()]
+    result = k8s.batch_get_pods(namespace_list or None, context_list or None, only_unhealthy=only_unhealthy)
+    return k8s.format_pod_table(result)
+
+
+def get_pod_logs(pod_name, namespace="default", lines=50, full=False):
+    """Get logs from a pod. Returns error lines and the last lines by default; set full=True for the raw log text"""
     try:
         cmd = ["kubectl", "logs", pod_name, "-n", namespace, "--tail", str(lines)]
-        result = subprocess.run(cmd, capture_output=True, text=True, check=True, timeout=15)
-        return result.stdout
+        with metrics.KUBECTL_SECONDS.time(subcommand="logs"):
+            result = process_runner.run(cmd, check=True, timeout=15)
+        if full:
+            return result.stdout
+        return _summarize_logs(result.stdout)
     except subprocess.TimeoutExpired:
         return "Error: Timeout getting logs"
     except subprocess.CalledProcessError as e:
+        metrics.ERRORS_TOTAL.inc(component="kubectl")
         return f"Error: {e.stderr}"
     except Exception as e:
         return f"Error: {str(e)}"
 
 
-def describe_pod(pod_name, namespace="default"):
-    """Get detailed pod information"""
+def search_logs(label_selector, pattern, namespace="default", since="1h", max_matches=50):
+    """Search logs of all pods matching a label selector (e.g. app=api) at once for a regex or keyword.
+    since is a duration like 15m or 2h. Returns match counts per pod and matching lines."""
+    return k8s.search_pod_logs(label_selector, pattern, namespace=namespace, since=since, max_matches=int(max_matches))
+
+
+def describe_pod(pod_name, namespace="default", full=False):
+    """Get pod status, container states, failing conditions and recent events; set full=True for raw kubectl describe output"""
     try:
-        cmd = ["kubectl", "describe", "pod", pod_name, "-n", namespace]
-        result = subprocess.run(cmd, capture_output=True, text=True, check=True, timeout=15)
-        return result.stdout
+        if full:
+            cmd = ["kubectl", "describe", "pod", pod_name, "-n", namespace]
+            with metrics.KUBECTL_SECONDS.time(subcommand="describe"):
+                result = process_runner.run(cmd, check=True, timeout=15)
+            return result.stdout
+
+        cmd = ["kubectl", "get", "pod", pod_name, "-n", namespace, "-o", "json"]
+        with metrics.KUBECTL_SECONDS.time(subcommand="get pod -o json"):
+            pod = json.loads(process_runner.run(cmd, check=True, timeout=15).stdout)
+        cmd = ["kubectl", "get", "events", "-n", namespace, "-o", "json",
+               "--field-selector", f"involvedObject.kind=Pod,involvedObject.name={pod_name}"]
+        with metrics.KUBECTL_SECONDS.time(subcommand="get events"):
+            events = json.loads(process_runner.run(cmd, check=True, timeout=15).stdout)
+        return _summarize_pod(pod, events.get("items", []))
     except subprocess.TimeoutExpired:
         return "Error: Timeout describing pod"
     except subprocess.CalledProcessError as e:
+        metrics.ERRORS_TOTAL.inc(component="kubectl")
         return f"Error: {e.stderr}"
     except Exception as e:
         return f"Error: {str(e)}"
+
+
+def _container_state(container):
+    state = container.get("state", {})
+    for name in ("waiting", "terminated", "running"):
+        if name in state:
+            detail = state[name] or {}
+            reason = detail.get("reason")
+            return f"{name} ({reason})" if reason else name
+    return "unknown"
+
+
+def _summarize_pod(pod, events, max_events=10):
+    """Compact view of a pod object and its events"""
+    status = pod.get("status", {})
+    containers = []
+    for container in status.get("containerStatuses", []):
+        summary = {
+            "name": container["name"],
+            "image": container.get("image"),
+            "ready": container.get("ready", False),
+            "restarts": container.get("restartCount", 0),
+            "state": _container_state(container),
+        }
+        terminated = container.get("lastState", {}).get("terminated")
+        if terminated:
+            summary["last_termination"] = f"{terminated.get('reason', '')} exit={terminated.get('exitCode')}"
+        containers.append(summary)
+
+    events = sorted(events, key=lambda e: e.get("lastTimestamp") or e.get("eventTime") or "")
+    return {
+        "name": pod["metadata"]["name"],
+        "namespace": pod["metadata"].get("namespace"),
+        "node": pod.get("spec", {}).get("nodeName"),
+        "phase": status.get("phase"),
+        "reason": status.get("reason") or status.get("message"),
+        "containers": containers,
+        # Only conditions that are not satisfied are worth the tokens
+        "failing_conditions": [
+            f"{c['type']}: {c.get('reason') or c.get('message') or c['status']}"
+            for c in status.get("conditions", []) if c.get("status") != "True"
+        ],
+        "recent_events": [
+            f"{e.get('type')} {e.get('reason')}: {e.get('message', '').strip()}"
+            + (f" (x{e['count']})" if e.get("count", 1) > 1 else "")
+            for e in events[-max_events:]
+        ],
+    }
+
+
+def _summarize_logs(text, max_errors=20, tail=20):
+    """Error lines plus the log tail"""
+    lines = text.splitlines()
+    errors = [line for line in lines if tool_output.RELEVANT_LINE.search(line)]
+    return {
+        "total_lines": len(lines),
+        "error_lines": errors[-max_errors:],
+        "error_line_count": len(errors),
+        "last_lines": lines[-tail:],
+    }
@@ -5,6 +5,8 @@ import os
 import importlib.util
 from pathlib import Path
 import logging
+import metrics
+import tracing
 
 logger = logging.getLogger(__name__)
 
@@ -86,8 +88,10 @@ class ToolRegistry:
 
         try:
             func = self._function_map[function_name]
-            return func(**kwargs) if kwargs else func()
+            with tracing.span(f"tool {function_name}"):
+                return func(**kwargs) if kwargs else func()
         except Exception as e:
+            metrics.ERRORS_TOTAL.inc(component="tool")
             logger.error(f"Error executing {function_name}: {e}")
             return {"error": str(e)}
 
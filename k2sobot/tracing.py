@@ -0,0 +1,272 @@
+"""
+Lightweight span-based request tracing for K2SOBot
+A trace follows one request (e.g. a DM) through Gemini, tools and subprocess calls.
+Spans are collected in memory and handed to the configured exporter when the
+root span finishes.
+"""
+import contextvars
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+logger = logging.getLogger(__name__)
+
+# Tracing configuration
+TRACE_EXPORTER = os.getenv("K2SOBOT_TRACE_EXPORTER", "none").lower()
+TRACE_FILE = os.getenv("K2SOBOT_TRACE_FILE", "logs/traces.jsonl")
+TRACE_SAMPLE_RATE = float(os.getenv("K2SOBOT_TRACE_SAMPLE_RATE", "1.0"))
+TRACE_DEBUG = os.getenv("K2SOBOT_TRACE_DEBUG", "false").lower() == "true"
+
+SERVICE_NAME = "k2sobot"
+
+_current_span = contextvars.ContextVar("k2sobot_current_span", default=None)
+
+
+class Span:
+    """A timed operation within a trace"""
+
+    __slots__ = ("name", "trace", "span_id", "parent_id", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, name, trace, parent_id=None, attributes=None):
+        self.name = name
+        self.trace = trace
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = dict(attributes or {})
+        self.error = None
+
+    @property
+    def duration(self):
+        """Duration in seconds (up to now if the span is still open)"""
+        end_ns = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end_ns - self.start_ns) / 1e9
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": round(self.duration * 1000, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class Trace:
+    """All spans that belong to one request"""
+
+    def __init__(self):
+        self.trace_id = f"{random.getrandbits(128):032x}"
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+
+class StdoutJsonExporter:
+    """Write one JSON object per span to stdout"""
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+        self._lock = threading.Lock()
+
+    def export(self, spans):
+        lines = "".join(json.dumps(span.to_dict()) + "\n" for span in spans)
+        with self._lock:
+            self.stream.write(lines)
+            self.stream.flush()
+
+
+class OtlpFileExporter:
+    """Append traces to a file as OTLP/JSON ExportTraceServiceRequest lines"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def export(self, spans):
+        request = {
+            "resourceSpans": [{
+                "resource": {"attributes": [_otlp_attribute("service.name", SERVICE_NAME)]},
+                "scopeSpans": [{
+                    "scope": {"name": __name__},
+                    "spans": [self._to_otlp(span) for span in spans],
+                }],
+            }]
+        }
+        line = json.dumps(request) + "\n"
+        with self._lock:
+            with open(self.path, "a") as f:
+                f.write(line)
+
+    def _to_otlp(self, span):
+        otlp_span = {
+            "traceId": span.trace.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            "kind": 1,  # SPAN_KIND_INTERNAL
+            "startTimeUnixNano": str(span.start_ns),
+            "endTimeUnixNano": str(span.end_ns),
+            "attributes": [_otlp_attribute(k, v) for k, v in span.attributes.items()],
+            "status": {"code": 2, "message": span.error} if span.error else {"code": 1},
+        }
+        if span.parent_id:
+            otlp_span["parentSpanId"] = span.parent_id
+        return otlp_span
+
+
+def _otlp_attribute(key, value):
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+_exporter_factories = {
+    "stdout": StdoutJsonExporter,
+    "otlp-file": lambda: OtlpFileExporter(TRACE_FILE),
+}
+
+_exporter = None
+_exporter_lock = threading.Lock()
+
+
+def register_exporter(name, factory):
+    """Register an exporter factory selectable via K2SOBOT_TRACE_EXPORTER"""
+    _exporter_factories[name] = factory
+
+
+def set_exporter(exporter):
+    """Install an exporter instance (anything with an export(spans) method)"""
+    global _exporter
+    _exporter = exporter
+
+
+def get_exporter():
+    """Get the configured exporter, or None when exporting is disabled"""
+    global _exporter
+    if _exporter is None and TRACE_EXPORTER in _exporter_factories:
+        with _exporter_lock:
+            if _exporter is None:
+                _exporter = _exporter_factories[TRACE_EXPORTER]()
+                logger.info(f"✅ Tracing enabled with '{TRACE_EXPORTER}' exporter")
+    return _exporter
+
+
+def is_enabled():
+    """Tracing runs when an exporter is configured or debug mode is on"""
+    return TRACE_DEBUG or get_exporter() is not None
+
+
+def _should_sample():
+    return TRACE_DEBUG or random.random() < TRACE_SAMPLE_RATE
+
+
+def current_span():
+    return _current_span.get()
+
+
+@contextmanager
+def start_trace(name, **attributes):
+    """Start a new root span; yields None when the request is not sampled"""
+    if not is_enabled() or not _should_sample():
+        yield None
+        return
+
+    trace = Trace()
+    root = Span(name, trace, attributes=attributes)
+    token = _current_span.set(root)
+    try:
+        yield root
+    except Exception as e:
+        root.error = str(e)
+        raise
+    finally:
+        root.end_ns = time.time_ns()
+        _current_span.reset(token)
+        trace.add(root)
+        _export(trace)
+
+
+@contextmanager
+def span(name, **attributes):
+    """Record a child span of the current span; no-op outside a sampled trace"""
+    with child_span(_current_span.get(), name, **attributes) as child:
+        yield child
+
+
+@contextmanager
+def child_span(parent, name, **attributes):
+    """Record a child span of an explicit parent, e.g. one captured on another thread"""
+    if parent is None:
+        yield None
+        return
+
+    child = Span(name, parent.trace, parent_id=parent.span_id, attributes=attributes)
+    token = _current_span.set(child)
+    try:
+        yield child
+    except Exception as e:
+        child.error = str(e)
+        raise
+    finally:
+        child.end_ns = time.time_ns()
+        _current_span.reset(token)
+        parent.trace.add(child)
+
+
+def traced(name):
+    """Decorator that wraps each call in a child span"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _export(trace):
+    exporter = get_exporter()
+    if exporter is None:
+        return
+    try:
+        exporter.export(trace.spans)
+    except Exception as e:
+        logger.warning(f"Failed to export trace {trace.trace_id}: {e}")
+
+
+def format_breakdown(root):
+    """Summarize a trace as a short Slack-friendly timing breakdown"""
+    if root is None:
+        return ""
+    totals = {}
+    for child in list(root.trace.spans):
+        if child is root or child.end_ns is None:
+            continue
+        totals[child.name] = totals.get(child.name, 0.0) + child.duration
+    parts = [f"{name} {seconds:.2f}s" for name, seconds in sorted(totals.items(), key=lambda item: -item[1])]
+    breakdown = ", ".join(parts) if parts else "no spans"
+    return f"_⏱️ {root.duration:.2f}s total — {breakdown} (trace `{root.trace.trace_id[:8]}`)_"
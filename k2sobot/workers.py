@@ -0,0 +1,69 @@
+"""
+Bounded worker pool for inbound Slack work
+Event, interaction and slash command handlers run here instead of on ad-hoc
+threads, so a burst of events queues up instead of spawning unbounded threads.
+"""
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Worker pool configuration
+K2SOBOT_WORKERS = int(os.getenv("K2SOBOT_WORKERS", "16"))
+K2SOBOT_WORKER_QUEUE_SIZE = int(os.getenv("K2SOBOT_WORKER_QUEUE_SIZE", "200"))
+
+WORKER_REJECTED_TOTAL = metrics.Counter(
+    "k2sobot_worker_rejected_total", "Handler calls rejected because the worker queue was full")
+
+
+class WorkerPool:
+    """Thread pool with a bounded backlog"""
+
+    def __init__(self, workers=K2SOBOT_WORKERS, queue_size=K2SOBOT_WORKER_QUEUE_SIZE, name="k2sobot-worker"):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._queued = 0
+        self._lock = threading.Lock()
+
+    def queue_depth(self):
+        return self._queued
+
+    def submit(self, fn, *args, **kwargs):
+        """Run fn in the pool; returns a Future, or None if the backlog is full"""
+        if not self._slots.acquire(blocking=False):
+            WORKER_REJECTED_TOTAL.inc()
+            logger.error(f"❌ Worker queue full, rejecting {getattr(fn, '__name__', fn)}")
+            return None
+        with self._lock:
+            self._queued += 1
+        return self._executor.submit(self._run, fn, args, kwargs)
+
+    def _run(self, fn, args, kwargs):
+        with self._lock:
+            self._queued -= 1
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            metrics.ERRORS_TOTAL.inc(component="worker")
+            logger.error(f"❌ Error in {getattr(fn, '__name__', fn)}: {e}", exc_info=True)
+        finally:
+            self._slots.release()
+
+
+# Global worker pool instance
+_pool = WorkerPool()
+metrics.QUEUE_DEPTH.set_function(_pool.queue_depth, queue="workers")
+
+
+def get_worker_pool():
+    """Get the global worker pool instance"""
+    return _pool
+
+
+def submit(fn, *args, **kwargs):
+    """Convenience function to run a handler on the global worker pool"""
+    return _pool.submit(fn, *args, **kwargs)